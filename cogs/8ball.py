@@ -1,38 +1,19 @@
 import discord
 from discord.ext import commands
-import sqlite3
 import random
-
-DB_PATH = "Leveling/main.db"
+from cogs.utils.db import db
 
 class Quotes(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.create_table()
-
-    def create_table(self):
-        conn = sqlite3.connect(DB_PATH)
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS quotes (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                guild_id INTEGER,
-                content TEXT,
-                author_id INTEGER,
-                added_by INTEGER
-            )
-        """)
-        conn.commit()
-        conn.close()
 
     @commands.group(invoke_without_command=True)
     async def quote(self, ctx):
         """Get a random quote"""
-        conn = sqlite3.connect(DB_PATH)
-        row = conn.execute(
+        row = await db.fetchone(
             "SELECT content, author_id FROM quotes WHERE guild_id = ? ORDER BY RANDOM() LIMIT 1",
             (ctx.guild.id,)
-        ).fetchone()
-        conn.close()
+        )
 
         if not row:
             return await ctx.send("No quotes yet. Use `?quote add <text>` to add one!")
@@ -47,23 +28,18 @@ class Quotes(commands.Cog):
     @commands.has_permissions(manage_messages=True)
     async def add_quote(self, ctx, *, text: str):
         """Add a new quote"""
-        conn = sqlite3.connect(DB_PATH)
-        conn.execute(
+        await db.execute(
             "INSERT INTO quotes (guild_id, content, author_id, added_by) VALUES (?, ?, ?, ?)",
             (ctx.guild.id, text.strip(), ctx.author.id, ctx.author.id)
         )
-        conn.commit()
-        conn.close()
-        await ctx.send(f"Quote added! Total: {self.count_quotes(ctx.guild.id)}")
+        await ctx.send(f"Quote added! Total: {await self.count_quotes(ctx.guild.id)}")
 
     @quote.command(name="list")
     async def list_quotes(self, ctx):
-        conn = sqlite3.connect(DB_PATH)
-        rows = conn.execute(
+        rows = await db.fetchall(
             "SELECT id, content FROM quotes WHERE guild_id = ?",
             (ctx.guild.id,)
-        ).fetchall()
-        conn.close()
+        )
 
         if not rows:
             return await ctx.send("No quotes.")
@@ -74,11 +50,9 @@ class Quotes(commands.Cog):
             embed = discord.Embed(title=f"Quotes ({i}/{len(pages)})", description="\n".join(page), color=0xff003d)
             await ctx.send(embed=embed)
 
-    def count_quotes(self, guild_id):
-        conn = sqlite3.connect(DB_PATH)
-        count = conn.execute("SELECT COUNT(*) FROM quotes WHERE guild_id = ?", (guild_id,)).fetchone()[0]
-        conn.close()
-        return count
+    async def count_quotes(self, guild_id):
+        row = await db.fetchone("SELECT COUNT(*) FROM quotes WHERE guild_id = ?", (guild_id,))
+        return row[0]
 
 async def setup(bot):
     await bot.add_cog(Quotes(bot))
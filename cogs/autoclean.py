@@ -1,33 +1,19 @@
 import discord
 from discord.ext import commands, tasks
-import sqlite3
 import asyncio
 from datetime import datetime, timedelta
-
-DB_PATH = "Leveling/main.db"
+from cogs.utils.db import db
 
 class AutoClean(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+
+    async def cog_load(self):
         self.autoclean_loop.start()
 
     def cog_unload(self):
         self.autoclean_loop.cancel()
 
-    def get_db(self):
-        conn = sqlite3.connect(DB_PATH)
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS autoclean (
-                guild_id INTEGER,
-                channel_id INTEGER,
-                interval_hours INTEGER,
-                warning_minutes INTEGER,
-                next_run TEXT,
-                PRIMARY KEY (guild_id, channel_id)
-            )
-        """)
-        return conn
-
     @commands.command(name="autoclean")
     @commands.has_permissions(manage_channels=True)
     @commands.bot_has_permissions(manage_channels=True)
@@ -43,15 +29,12 @@ class AutoClean(commands.Cog):
         channel = channel or ctx.channel
 
         # Save schedule
-        conn = self.get_db()
         next_run = datetime.utcnow() + timedelta(hours=interval_hours)
-        conn.execute("""
+        await db.execute("""
             INSERT OR REPLACE INTO autoclean 
             (guild_id, channel_id, interval_hours, warning_minutes, next_run)
             VALUES (?, ?, ?, ?, ?)
         """, (ctx.guild.id, channel.id, interval_hours, warning_minutes, next_run.isoformat()))
-        conn.commit()
-        conn.close()
 
         await ctx.send(
             f"Auto-clean scheduled for {channel.mention}\n"
@@ -63,12 +46,9 @@ class AutoClean(commands.Cog):
     @commands.has_permissions(manage_channels=True)
     async def stop_autoclean(self, ctx, channel: discord.TextChannel = None):
         channel = channel or ctx.channel
-        conn = self.get_db()
-        cur = conn.execute("DELETE FROM autoclean WHERE guild_id = ? AND channel_id = ?", (ctx.guild.id, channel.id))
-        conn.commit()
-        conn.close()
+        deleted = await db.execute("DELETE FROM autoclean WHERE guild_id = ? AND channel_id = ?", (ctx.guild.id, channel.id))
 
-        if cur.rowcount:
+        if deleted:
             await ctx.send(f"Stopped auto-clean for {channel.mention}")
         else:
             await ctx.send("No active auto-clean found for this channel.")
@@ -76,8 +56,7 @@ class AutoClean(commands.Cog):
     @tasks.loop(minutes=1)
     async def autoclean_loop(self):
         now = datetime.utcnow()
-        conn = self.get_db()
-        rows = conn.execute("SELECT * FROM autoclean").fetchall()
+        rows = await db.fetchall("SELECT * FROM autoclean")
         for row in rows:
             next_run = datetime.fromisoformat(row["next_run"])
             if now >= next_run:
@@ -111,13 +90,10 @@ class AutoClean(commands.Cog):
 
                 # Reschedule
                 next_run = datetime.utcnow() + timedelta(hours=interval_h)
-                conn.execute(
+                await db.execute(
                     "UPDATE autoclean SET next_run = ? WHERE guild_id = ? AND channel_id = ?",
                     (next_run.isoformat(), row["guild_id"], row["channel_id"])
                 )
-                conn.commit()
-
-        conn.close()
 
     @autoclean_loop.before_loop
     async def before_loop(self):
@@ -5,18 +5,45 @@ import logging
 from PIL import Image, ImageDraw, ImageFont
 from io import BytesIO
 import os
+from cogs.utils.render import render_service, RenderBusy
+import config
 
 logger = logging.getLogger(__name__)
 
 BAN_IMAGES_FOLDER = "ban_images"
 os.makedirs(BAN_IMAGES_FOLDER, exist_ok=True)
 
+def normalize_ban_image(data: bytes, max_size: int):
+    """Downscale a static upload and re-encode it as PNG (render worker); None keeps it as uploaded"""
+    with Image.open(BytesIO(data)) as image:
+        if getattr(image, "is_animated", False):
+            return None
+        image.thumbnail((max_size, max_size))
+        buffer = BytesIO()
+        image.convert("RGBA").save(buffer, format="PNG")
+        return buffer.getvalue()
+
 class Ban(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.default_ban_image = "ban_images/default.png"
         self.custom_ban_images = {}
 
+    async def save_ban_image(self, ctx, attachment, path) -> bool:
+        """Save an uploaded ban image, shrunk and re-encoded off the event loop"""
+        data = await attachment.read()
+        try:
+            png = await render_service.render("ban_image", normalize_ban_image, data, config.BAN_IMAGE_MAX_SIZE)
+        except RenderBusy:
+            png = None  # Keep the upload as-is rather than making the user retry
+        except Exception as e:
+            logger.warning(f"Rejected ban image upload: {e}")
+            await ctx.send("That image couldn't be read.")
+            return False
+        with open(path, "wb") as f:
+            f.write(png or data)
+        return True
+
     @commands.command(name="setdefaultban")
     @commands.is_owner()
     async def set_default(self, ctx):
@@ -26,7 +53,8 @@ class Ban(commands.Cog):
         if not attachment.filename.lower().endswith(('.png', '.jpg', '.jpeg', '.gif')):
             return await ctx.send("Only images.")
         path = f"{BAN_IMAGES_FOLDER}/default.png"
-        await attachment.save(path)
+        if not await self.save_ban_image(ctx, attachment, path):
+            return
         self.default_ban_image = path
         await ctx.send("Default ban image updated.")
 
@@ -39,7 +67,8 @@ class Ban(commands.Cog):
         if not attachment.filename.lower().endswith(('.png', '.jpg', '.jpeg', '.gif')):
             return await ctx.send("Only images.")
         path = f"{BAN_IMAGES_FOLDER}/{ctx.author.id}.png"
-        await attachment.save(path)
+        if not await self.save_ban_image(ctx, attachment, path):
+            return
         self.custom_ban_images[ctx.author.id] = path
         await ctx.send("Your personal ban image is set.")
 
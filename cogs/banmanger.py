@@ -3,11 +3,21 @@ from discord.ext import commands
 import json
 import asyncio
 from datetime import datetime
+from cogs.utils.jobs import jobs
+import config
 
 class BanManager(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
 
+    async def cog_load(self):
+        jobs.register("import_bans", self.import_bans_chunk, "Ban Import")
+        jobs.register("mass_ban", self.mass_ban_chunk, "Mass Ban")
+
+    async def cog_unload(self):
+        jobs.unregister("import_bans")
+        jobs.unregister("mass_ban")
+
     # === EXPORT ALL BANS FROM CURRENT SERVER ===
     @commands.command(name="exportbans")
     @commands.is_owner()
@@ -99,67 +109,70 @@ class BanManager(commands.Cog):
             return await confirm.edit(content="Import cancelled.")
 
         await confirm.edit(content="Importing bans... This may take a while.")
+        items = [[entry.get("user_id"), entry.get("reason", "Mass ban import")] for entry in bans]
+        await jobs.create("import_bans", ctx.guild.id, items, confirm, ctx.author.id)
 
-        success = 0
-        failed = 0
-        already_banned = 0
-
-        for entry in bans:
-            user_id = entry.get("user_id")
-            reason = entry.get("reason", "Mass ban import")
-
+    async def import_bans_chunk(self, job, guild, items):
+        """Job handler: apply a chunk of imported [user_id, reason] bans"""
+        counts = {"success": 0, "already_banned": 0, "failed": 0}
+        for user_id, reason in items:
             if not user_id:
-                failed += 1
+                counts["failed"] += 1
                 continue
 
             try:
                 user = discord.Object(id=user_id)
-                await ctx.guild.ban(user, reason=f"[Mass Import] {reason}", delete_message_days=0)
-                success += 1
+                await guild.ban(user, reason=f"[Mass Import] {reason}", delete_message_days=0)
+                counts["success"] += 1
             except discord.NotFound:
-                already_banned += 1
+                counts["already_banned"] += 1
             except discord.Forbidden:
-                failed += 1
+                counts["failed"] += 1
             except Exception:
-                failed += 1
+                counts["failed"] += 1
 
-            await asyncio.sleep(0.5)  # Rate limit safety
-
-        summary = (
-            f"**Ban import complete!**\n\n"
-            f"Success: `{success}`\n"
-            f"Already banned: `{already_banned}`\n"
-            f"Failed: `{failed}`\n"
-            f"Total processed: `{len(bans)}`"
-        )
-        await confirm.edit(content=summary)
+            await asyncio.sleep(config.BAN_JOB_DELAY)  # Rate limit safety
+        return counts
 
     # === QUICK MASS BAN FROM USER IDS (text list) ===
     @commands.command(name="massban")
     @commands.is_owner()
     async def mass_ban(self, ctx, *, user_ids: str):
         """Mass ban by pasting a list of user IDs (one per line)"""
-        ids = [uid.strip() for uid in user_ids.replace(",", "\n").split("\n") if uid.strip().isdigit()]
+        tokens = [uid.strip() for uid in user_ids.replace(",", "\n").split("\n") if uid.strip()]
+        # isdigit() alone accepts characters like "²" that int() rejects
+        ids = [int(uid) for uid in tokens if uid.isascii() and uid.isdigit()]
+        invalid = [uid for uid in tokens if not (uid.isascii() and uid.isdigit())]
+        skipped = ""
+        if invalid:
+            shown = ", ".join(f"`{uid[:32]}`" for uid in invalid[:10])
+            skipped = f"\nSkipping {len(invalid)} invalid ID{'s' if len(invalid) != 1 else ''}: {shown}"
+            if len(invalid) > 10:
+                skipped += ", ..."
         if not ids:
-            return await ctx.send("No valid user IDs found.")
+            return await ctx.send("No valid user IDs found." + skipped)
 
-        await ctx.send(f"Mass banning {len(ids)} users... Type `confirm` to proceed.")
+        await ctx.send(f"Mass banning {len(ids)} users... Type `confirm` to proceed.{skipped}")
         def check(m): return m.author == ctx.author and m.content.lower() == "confirm"
         try:
             await self.bot.wait_for("message", check=check, timeout=30)
         except:
             return await ctx.send("Cancelled.")
 
-        success = 0
-        for uid in ids:
+        status = await ctx.send(f"Mass banning {len(ids)} users...")
+        await jobs.create("mass_ban", ctx.guild.id, ids, status, ctx.author.id)
+
+    async def mass_ban_chunk(self, job, guild, user_ids):
+        """Job handler: ban a chunk of user IDs"""
+        counts = {"banned": 0, "failed": 0}
+        for uid in user_ids:
             try:
-                await ctx.guild.ban(discord.Object(id=int(uid)), reason="Mass ban by owner")
-                success += 1
+                await guild.ban(discord.Object(id=uid), reason="Mass ban by owner")
+                counts["banned"] += 1
             except:
-                pass
-            await asyncio.sleep(0.5)
-
-        await ctx.send(f"Mission complete. {success}/{len(ids)} banned.")
+                counts["failed"] += 1
+            await asyncio.sleep(config.BAN_JOB_DELAY)
+        return counts
 
 async def setup(bot):
     await bot.add_cog(BanManager(bot))
@@ -1,74 +1,65 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
-import sqlite3
-import math
+import asyncio
 import logging
-from contextlib import contextmanager
 from cogs.utils.checks import is_admin
+from cogs.utils.db import db
+from cogs.utils.rank_rewards import rank_rewards
+from cogs.utils.role_sync import RoleSyncQueue
+from cogs.utils.jobs import jobs
+from cogs.utils.leaderboard import leaderboards
+from cogs.utils.rank_card import rank_cards
+from cogs.utils.render import RenderBusy
+from cogs.utils.xp import calc_level, calc_exp_for_level, bulk_apply, BULK_ADD_XP, BULK_SET_XP, BULK_ADD_LEVELS
 import config
 
-DB_PATH = config.DB_PATH
 logger = logging.getLogger(__name__)
 
-@contextmanager
-def get_db():
-    """Context manager for database connections"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    try:
-        yield conn
-        conn.commit()
-    except Exception as e:
-        conn.rollback()
-        logger.error(f"Database error: {e}", exc_info=True)
-        raise
-    finally:
-        conn.close()
-
-def calc_level(exp: int) -> int:
-    """Calculate level from experience"""
-    return int((math.sqrt(1 + 8 * exp / config.LEVEL_DIVISOR) - 1) / 2)
-
-def calc_exp_for_level(level: int) -> int:
-    """Calculate required XP for a level"""
-    return int(config.LEVEL_DIVISOR * level * (level + 1) / 2)
-
 class BulkXP(commands.Cog):
     """Bulk XP operations for administrators"""
 
     def __init__(self, bot):
         self.bot = bot
-
-    async def update_user_roles(self, member: discord.Member):
-        """Update roles based on current level"""
-        with get_db() as conn:
-            user_row = conn.execute("""
-                SELECT level FROM glevel WHERE guild_id = ? AND user_id = ?
-            """, (member.guild.id, member.id)).fetchone()
-
-            if not user_row:
-                return
-
-            user_level = user_row['level']
-
-            # Get all rank rewards
-            ranks = conn.execute("""
-                SELECT role_id, level FROM ranks WHERE guild_id = ? ORDER BY level DESC
-            """, (member.guild.id,)).fetchall()
-
-            for rank in ranks:
-                role = member.guild.get_role(rank['role_id'])
-                if not role:
-                    continue
-
-                try:
-                    if user_level >= rank['level'] and role not in member.roles:
-                        await member.add_roles(role, reason="Level reward (bulk operation)")
-                    elif user_level < rank['level'] and role in member.roles:
-                        await member.remove_roles(role, reason="Level reward removed (bulk operation)")
-                except discord.Forbidden:
-                    logger.warning(f"Cannot modify role {role.name} for {member}")
+        self.role_sync = RoleSyncQueue(config.ROLE_SYNC_CONCURRENCY, config.ROLE_SYNC_PROGRESS_INTERVAL)
+
+    async def cog_load(self):
+        jobs.register("sync_xp_from_roles", self.sync_xp_chunk, "XP Synced from Roles")
+        jobs.register("sync_level_roles", self.sync_roles_chunk, "Level Roles Synced")
+
+    async def cog_unload(self):
+        jobs.unregister("sync_xp_from_roles")
+        jobs.unregister("sync_level_roles")
+        self.role_sync.stop()
+
+    @property
+    def xp_buffer(self):
+        """The Leveling cog's write-behind XP buffer, if loaded"""
+        leveling = self.bot.get_cog("Leveling")
+        return leveling.xp_buffer if leveling else None
+
+    async def flush_xp(self):
+        """Persist buffered XP so direct reads and writes see current values"""
+        if self.xp_buffer:
+            await self.xp_buffer.flush()
+
+    async def write_xp(self, guild_id: int, user_ids, fn, *args):
+        """Run ``fn(conn, *args)`` against glevel through the XP buffer, so buffered XP can't overwrite it"""
+        if self.xp_buffer:
+            return await self.xp_buffer.write_through(guild_id, user_ids, fn, *args)
+        return await db.run(fn, *args)
+
+    async def bulk_update(self, guild: discord.Guild, members, operation, **params) -> dict:
+        """Run a set-based XP operation for ``members`` and return {user_id: (old_level, new_level)}"""
+        user_ids = [m.id for m in members]
+        return await self.write_xp(guild.id, user_ids, bulk_apply, guild.id, user_ids, operation, params)
+
+    async def queue_role_sync(self, ctx, results: dict):
+        """Queue a background level-role sync for a bulk operation's {user_id: (old, new)} results"""
+        if not results or not rank_rewards.get(ctx.guild.id):
+            return
+        status = await ctx.send("Queued level role sync...")
+        self.role_sync.submit(ctx.guild, {user_id: new for user_id, (_, new) in results.items()}, status)
 
     # === MASS ADD XP ===
     @commands.command(name="mass-addxp", aliases=["massaddxp", "bulkaddxp"])
@@ -90,42 +81,9 @@ class BulkXP(commands.Cog):
 
         msg = await ctx.send(f"Adding {amount} XP to {len(members)} members...")
 
-        updated = 0
-        level_ups = 0
-
-        with get_db() as conn:
-            for member in members:
-                row = conn.execute("""
-                    SELECT exp, level FROM glevel WHERE guild_id = ? AND user_id = ?
-                """, (ctx.guild.id, member.id)).fetchone()
-
-                if row:
-                    old_exp = row['exp']
-                    old_level = row['level']
-                else:
-                    old_exp = 0
-                    old_level = 0
-                    conn.execute("""
-                        INSERT INTO glevel (guild_id, user_id, exp, level) VALUES (?, ?, 0, 0)
-                    """, (ctx.guild.id, member.id))
-
-                new_exp = old_exp + amount
-                new_level = calc_level(new_exp)
-
-                conn.execute("""
-                    UPDATE glevel SET exp = ?, level = ? WHERE guild_id = ? AND user_id = ?
-                """, (new_exp, new_level, ctx.guild.id, member.id))
-
-                updated += 1
-                if new_level > old_level:
-                    level_ups += 1
-
-        # Update roles for leveled up members
-        for member in members:
-            try:
-                await self.update_user_roles(member)
-            except Exception as e:
-                logger.error(f"Error updating roles for {member}: {e}")
+        results = await self.bulk_update(ctx.guild, members, BULK_ADD_XP, amount=amount)
+        updated = len(results)
+        level_ups = sum(1 for old, new in results.values() if new > old)
 
         embed = discord.Embed(
             title="Bulk XP Added",
@@ -136,6 +94,7 @@ class BulkXP(commands.Cog):
         embed.add_field(name="Members Updated", value=str(updated), inline=True)
         embed.add_field(name="Level Ups", value=str(level_ups), inline=True)
         await msg.edit(content=None, embed=embed)
+        await self.queue_role_sync(ctx, results)
 
     # === MASS SET XP ===
     @commands.command(name="mass-setxp", aliases=["masssetxp", "bulksetxp"])
@@ -155,22 +114,9 @@ class BulkXP(commands.Cog):
         msg = await ctx.send(f"Setting XP to {amount} for {len(members)} members...")
 
         new_level = calc_level(amount)
-        updated = 0
 
-        with get_db() as conn:
-            for member in members:
-                conn.execute("""
-                    INSERT INTO glevel (guild_id, user_id, exp, level) VALUES (?, ?, ?, ?)
-                    ON CONFLICT(guild_id, user_id) DO UPDATE SET exp = ?, level = ?
-                """, (ctx.guild.id, member.id, amount, new_level, amount, new_level))
-                updated += 1
-
-        # Update roles
-        for member in members:
-            try:
-                await self.update_user_roles(member)
-            except Exception as e:
-                logger.error(f"Error updating roles for {member}: {e}")
+        results = await self.bulk_update(ctx.guild, members, BULK_SET_XP, amount=amount)
+        updated = len(results)
 
         embed = discord.Embed(
             title="Bulk XP Set",
@@ -181,6 +127,7 @@ class BulkXP(commands.Cog):
         embed.add_field(name="Level", value=str(new_level), inline=True)
         embed.add_field(name="Members Updated", value=str(updated), inline=True)
         await msg.edit(content=None, embed=embed)
+        await self.queue_role_sync(ctx, results)
 
     # === MASS LEVEL UP ===
     @commands.command(name="mass-levelup", aliases=["masslevelup", "bulklevelup"])
@@ -202,36 +149,8 @@ class BulkXP(commands.Cog):
 
         msg = await ctx.send(f"Increasing level by {levels} for {len(members)} members...")
 
-        updated = 0
-
-        with get_db() as conn:
-            for member in members:
-                row = conn.execute("""
-                    SELECT exp, level FROM glevel WHERE guild_id = ? AND user_id = ?
-                """, (ctx.guild.id, member.id)).fetchone()
-
-                if row:
-                    old_level = row['level']
-                else:
-                    old_level = 0
-                    conn.execute("""
-                        INSERT INTO glevel (guild_id, user_id, exp, level) VALUES (?, ?, 0, 0)
-                    """, (ctx.guild.id, member.id))
-
-                new_level = old_level + levels
-                new_exp = calc_exp_for_level(new_level)
-
-                conn.execute("""
-                    UPDATE glevel SET exp = ?, level = ? WHERE guild_id = ? AND user_id = ?
-                """, (new_exp, new_level, ctx.guild.id, member.id))
-                updated += 1
-
-        # Update roles
-        for member in members:
-            try:
-                await self.update_user_roles(member)
-            except Exception as e:
-                logger.error(f"Error updating roles for {member}: {e}")
+        results = await self.bulk_update(ctx.guild, members, BULK_ADD_LEVELS, levels=levels)
+        updated = len(results)
 
         embed = discord.Embed(
             title="Bulk Level Up",
@@ -241,6 +160,7 @@ class BulkXP(commands.Cog):
         embed.add_field(name="Levels Added", value=f"+{levels}", inline=True)
         embed.add_field(name="Members Updated", value=str(updated), inline=True)
         await msg.edit(content=None, embed=embed)
+        await self.queue_role_sync(ctx, results)
 
     # === SYNC XP FROM ROLES ===
     @commands.command(name="sync-xp-from-roles", aliases=["syncxpfromroles", "rolesync"])
@@ -253,41 +173,38 @@ class BulkXP(commands.Cog):
         """
         msg = await ctx.send("Syncing XP from roles...")
 
-        with get_db() as conn:
-            # Get all rank rewards
-            ranks = conn.execute("""
-                SELECT role_id, level FROM ranks WHERE guild_id = ? ORDER BY level DESC
-            """, (ctx.guild.id,)).fetchall()
-
-            if not ranks:
-                return await msg.edit(content="No level roles configured. Use `?ranks add` first.")
-
-            updated = 0
-            for member in ctx.guild.members:
-                if member.bot:
-                    continue
-
-                # Find highest role the member has
-                highest_level = 0
-                for rank in ranks:
-                    role = ctx.guild.get_role(rank['role_id'])
-                    if role and role in member.roles:
-                        highest_level = max(highest_level, rank['level'])
-
-                if highest_level > 0:
-                    exp = calc_exp_for_level(highest_level)
-                    conn.execute("""
-                        INSERT INTO glevel (guild_id, user_id, exp, level) VALUES (?, ?, ?, ?)
-                        ON CONFLICT(guild_id, user_id) DO UPDATE SET exp = ?, level = ?
-                    """, (ctx.guild.id, member.id, exp, highest_level, exp, highest_level))
-                    updated += 1
+        if not rank_rewards.get(ctx.guild.id):
+            return await msg.edit(content="No level roles configured. Use `?ranks add` first.")
 
-        embed = discord.Embed(
-            title="XP Synced from Roles",
-            description=f"Updated {updated} members based on their level roles.",
-            color=config.COLOR_SUCCESS
-        )
-        await msg.edit(content=None, embed=embed)
+        member_ids = [m.id for m in ctx.guild.members if not m.bot]
+        await jobs.create("sync_xp_from_roles", ctx.guild.id, member_ids, msg, ctx.author.id)
+
+    async def sync_xp_chunk(self, job, guild: discord.Guild, member_ids: list) -> dict:
+        """Job handler: set each member's XP from their highest level role"""
+        ranks = rank_rewards.get(guild.id)
+        updates = []
+        for member_id in member_ids:
+            member = guild.get_member(member_id)
+            if not member:
+                continue
+
+            # Find highest role the member has
+            role_ids = {role.id for role in member.roles}
+            highest_level = max((rank.level for rank in ranks if rank.role_id in role_ids), default=0)
+
+            if highest_level > 0:
+                exp = calc_exp_for_level(highest_level)
+                updates.append((guild.id, member_id, exp, highest_level))
+
+        if updates:
+            def apply(conn):
+                conn.executemany("""
+                    INSERT INTO glevel (guild_id, user_id, exp, level) VALUES (?, ?, ?, ?)
+                    ON CONFLICT(guild_id, user_id) DO UPDATE SET exp = excluded.exp, level = excluded.level
+                """, updates)
+
+            await self.write_xp(guild.id, [u[1] for u in updates], apply)
+        return {"updated": len(updates), "skipped": len(member_ids) - len(updates)}
 
     # === SYNC LEVEL ROLES ===
     @commands.command(name="sync-levelroles", aliases=["synclevelroles", "applyroles"])
@@ -299,71 +216,55 @@ class BulkXP(commands.Cog):
         """
         msg = await ctx.send("Syncing level roles...")
 
-        with get_db() as conn:
-            ranks = conn.execute("""
-                SELECT role_id, level FROM ranks WHERE guild_id = ? ORDER BY level
-            """, (ctx.guild.id,)).fetchall()
+        if not rank_rewards.get(ctx.guild.id):
+            return await msg.edit(content="No level roles configured.")
 
-            if not ranks:
-                return await msg.edit(content="No level roles configured.")
+        await self.flush_xp()
+        users = await db.fetchall("""
+            SELECT user_id, level FROM glevel WHERE guild_id = ?
+        """, (ctx.guild.id,))
 
-            users = conn.execute("""
-                SELECT user_id, level FROM glevel WHERE guild_id = ?
-            """, (ctx.guild.id,)).fetchall()
+        await jobs.create("sync_level_roles", ctx.guild.id, [[u['user_id'], u['level']] for u in users],
+                          msg, ctx.author.id)
 
-        updated = 0
-        errors = 0
-
-        for user in users:
-            member = ctx.guild.get_member(user['user_id'])
-            if not member or member.bot:
-                continue
-
-            try:
-                await self.update_user_roles(member)
-                updated += 1
-            except Exception as e:
-                logger.error(f"Error syncing roles for {member}: {e}")
-                errors += 1
-
-        embed = discord.Embed(
-            title="Level Roles Synced",
-            color=config.COLOR_SUCCESS
-        )
-        embed.add_field(name="Members Updated", value=str(updated), inline=True)
-        if errors:
-            embed.add_field(name="Errors", value=str(errors), inline=True)
-        await msg.edit(content=None, embed=embed)
+    async def sync_roles_chunk(self, job, guild: discord.Guild, items: list) -> dict:
+        """Job handler: apply level roles to a chunk of [user_id, level] pairs"""
+        # Shares the role sync queue (and its rate-limit budget) with the bulk XP commands
+        sync = self.role_sync.submit(guild, {user_id: level for user_id, level in items})
+        await sync.finished.wait()
+        return {"updated": sync.changed, "already_correct": sync.skipped, "not_in_server": sync.missing,
+                "failed": sync.failed}
 
     # === XP LEADERBOARD ===
-    @commands.command(name="xp", aliases=["level", "rank"])
-    async def show_xp(self, ctx, member: discord.Member = None):
-        """Show your XP and level, or another member's"""
-        member = member or ctx.author
-
-        with get_db() as conn:
-            row = conn.execute("""
-                SELECT exp, level FROM glevel WHERE guild_id = ? AND user_id = ?
-            """, (ctx.guild.id, member.id)).fetchone()
+    async def xp_stats(self, member: discord.Member):
+        """Return (exp, level, rank, progress, needed) for a member, or None without XP"""
+        await self.flush_xp()
+        row = await db.fetchone("""
+            SELECT exp, level FROM glevel WHERE guild_id = ? AND user_id = ?
+        """, (member.guild.id, member.id))
 
-            if not row:
-                return await ctx.send(f"{member.display_name} has no XP yet.")
-
-            # Get rank
-            rank_row = conn.execute("""
-                SELECT COUNT(*) + 1 as rank FROM glevel
-                WHERE guild_id = ? AND exp > ?
-            """, (ctx.guild.id, row['exp'])).fetchone()
+        if not row:
+            return None
 
         exp = row['exp']
         level = row['level']
-        rank = rank_row['rank'] if rank_row else 1
+        rank = await leaderboards.rank(member.guild.id, exp, flush=self.flush_xp)
 
         # Calculate progress to next level
         current_level_exp = calc_exp_for_level(level)
         next_level_exp = calc_exp_for_level(level + 1)
-        progress = exp - current_level_exp
-        needed = next_level_exp - current_level_exp
+        return exp, level, rank, exp - current_level_exp, next_level_exp - current_level_exp
+
+    @commands.command(name="xp", aliases=["level", "rank"])
+    async def show_xp(self, ctx, member: discord.Member = None):
+        """Show your XP and level, or another member's"""
+        member = member or ctx.author
+
+        stats = await self.xp_stats(member)
+        if not stats:
+            return await ctx.send(f"{member.display_name} has no XP yet.")
+
+        exp, level, rank, progress, needed = stats
         progress_pct = (progress / needed * 100) if needed > 0 else 100
 
         # Create progress bar
@@ -386,36 +287,104 @@ class BulkXP(commands.Cog):
         )
         await ctx.send(embed=embed)
 
+    @commands.command(name="rankcard", aliases=["card"])
+    @commands.bot_has_permissions(attach_files=True)
+    async def rank_card(self, ctx, member: discord.Member = None):
+        """Show your rank card, or another member's"""
+        member = member or ctx.author
+
+        stats = await self.xp_stats(member)
+        if not stats:
+            return await ctx.send(f"{member.display_name} has no XP yet.")
+
+        exp, level, rank, progress, needed = stats
+        try:
+            async with ctx.typing():
+                file = await rank_cards.render(member, level, exp, progress, needed, rank)
+        except RenderBusy:
+            return await ctx.send("I'm drawing a lot of cards right now, try again in a moment.")
+        await ctx.send(file=file)
+
     @commands.command(name="leaderboard", aliases=["lb", "top"])
     async def leaderboard(self, ctx, page: int = 1):
         """Show the XP leaderboard"""
-        per_page = 10
-        offset = (page - 1) * per_page
-
-        with get_db() as conn:
-            rows = conn.execute("""
-                SELECT user_id, exp, level FROM glevel
-                WHERE guild_id = ?
-                ORDER BY exp DESC
-                LIMIT ? OFFSET ?
-            """, (ctx.guild.id, per_page, offset)).fetchall()
-
-            total = conn.execute("""
-                SELECT COUNT(*) as count FROM glevel WHERE guild_id = ?
-            """, (ctx.guild.id,)).fetchone()['count']
+        page = max(page, 1)
+        if not leaderboards.is_loaded(ctx.guild.id):
+            await self.flush_xp()
+        rows = await leaderboards.page(ctx.guild.id, page, LeaderboardView.PER_PAGE, flush=self.flush_xp)
+        total = await leaderboards.count(ctx.guild.id, flush=self.flush_xp)
 
         if not rows:
             return await ctx.send("No leaderboard data yet.")
 
+        view = LeaderboardView(ctx.guild, total, page, rows)
+        view.message = await ctx.send(embed=view.embed(), view=view)
+        view.prefetch()
+
+
+class LeaderboardView(discord.ui.View):
+    """Previous/Next buttons over the leaderboard.
+
+    Pages after the first are fetched with a keyset cursor on the last
+    (exp, user_id) shown, visited pages are kept, and the next page is
+    prefetched as soon as one is displayed.
+    """
+
+    PER_PAGE = 10
+
+    def __init__(self, guild: discord.Guild, total: int, page: int, rows: list, timeout: float = 120):
+        super().__init__(timeout=timeout)
+        self.guild = guild
+        self.total = total
+        self.page = page
+        self.pages = {page: rows}  # page number → [(user_id, exp)]
+        self.message = None
+        self._prefetch = None  # (page number, task)
+        self._lock = asyncio.Lock()
+        self.update_buttons()
+
+    @property
+    def total_pages(self) -> int:
+        return max(1, (self.total + self.PER_PAGE - 1) // self.PER_PAGE)
+
+    def cursor(self, number: int):
+        user_id, exp = self.pages[number][-1]
+        return exp, user_id
+
+    def prefetch(self):
+        """Start fetching the page after the current one"""
+        number = self.page + 1
+        if number in self.pages or number > self.total_pages or not self.pages[self.page]:
+            return
+        if self._prefetch and self._prefetch[0] == number:
+            return
+        task = asyncio.create_task(leaderboards.after(self.guild.id, self.cursor(self.page), self.PER_PAGE))
+        self._prefetch = (number, task)
+
+    async def load(self, number: int) -> list:
+        if number in self.pages:
+            return self.pages[number]
+        if self._prefetch and self._prefetch[0] == number:
+            rows = await self._prefetch[1]
+            self._prefetch = None
+        elif number - 1 in self.pages:
+            rows = await leaderboards.after(self.guild.id, self.cursor(number - 1), self.PER_PAGE)
+        else:
+            rows = await leaderboards.page(self.guild.id, number, self.PER_PAGE)
+        self.pages[number] = rows
+        return rows
+
+    def embed(self) -> discord.Embed:
         embed = discord.Embed(
-            title=f"Leaderboard - {ctx.guild.name}",
+            title=f"Leaderboard - {self.guild.name}",
             color=config.COLOR_PRIMARY
         )
 
         description_lines = []
-        for i, row in enumerate(rows, start=offset + 1):
-            member = ctx.guild.get_member(row['user_id'])
-            name = member.display_name if member else f"Unknown ({row['user_id']})"
+        offset = (self.page - 1) * self.PER_PAGE
+        for i, (user_id, exp) in enumerate(self.pages[self.page], start=offset + 1):
+            member = self.guild.get_member(user_id)
+            name = member.display_name if member else f"Unknown ({user_id})"
 
             medal = ""
             if i == 1:
@@ -427,15 +396,47 @@ class BulkXP(commands.Cog):
 
             description_lines.append(
                 f"{medal}**#{i}** {name}\n"
-                f"   Level {row['level']} | {row['exp']:,} XP"
+                f"   Level {calc_level(exp)} | {exp:,} XP"
             )
 
         embed.description = "\n".join(description_lines)
-
-        total_pages = (total + per_page - 1) // per_page
-        embed.set_footer(text=f"Page {page}/{total_pages} | {total} members ranked")
-
-        await ctx.send(embed=embed)
+        embed.set_footer(text=f"Page {self.page}/{self.total_pages} | {self.total} members ranked")
+        return embed
+
+    def update_buttons(self):
+        self.previous_page.disabled = self.page <= 1
+        self.next_page.disabled = self.page >= self.total_pages
+
+    async def turn(self, interaction: discord.Interaction, number: int):
+        async with self._lock:
+            rows = await self.load(number)
+            if rows:
+                self.page = number
+            else:
+                # Fewer members than the cached count promised
+                self.total = min(self.total, (number - 1) * self.PER_PAGE)
+            self.update_buttons()
+            await interaction.response.edit_message(embed=self.embed(), view=self)
+            self.prefetch()
+
+    @discord.ui.button(label="Previous", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.turn(interaction, self.page - 1)
+
+    @discord.ui.button(label="Next", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.turn(interaction, self.page + 1)
+
+    async def on_timeout(self):
+        if self._prefetch:
+            self._prefetch[1].cancel()
+        for item in self.children:
+            item.disabled = True
+        if self.message:
+            try:
+                await self.message.edit(view=self)
+            except discord.HTTPException:
+                pass
 
 
 async def setup(bot):
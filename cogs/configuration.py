@@ -1,89 +1,31 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
-import sqlite3
 import logging
-from contextlib import contextmanager
 from cogs.utils.checks import is_admin
+from cogs.utils.db import db
+from cogs.utils.guild_config import guild_configs
+from cogs.utils.templates import compile_template, placeholder_help, TemplateError, JOIN_DM_MAX_LENGTH
 import config
 
-DB_PATH = config.DB_PATH
 logger = logging.getLogger(__name__)
 
-@contextmanager
-def get_db():
-    """Context manager for database connections"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    try:
-        yield conn
-        conn.commit()
-    except Exception as e:
-        conn.rollback()
-        logger.error(f"Database error: {e}", exc_info=True)
-        raise
-    finally:
-        conn.close()
-
-def init_guild_tables():
-    """Initialize guild configuration tables"""
-    with get_db() as conn:
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS guild_config (
-                guild_id INTEGER PRIMARY KEY,
-                prefix TEXT DEFAULT '?',
-                spam_filter_enabled INTEGER DEFAULT 1,
-                leveling_enabled INTEGER DEFAULT 1,
-                welcome_enabled INTEGER DEFAULT 1,
-                join_dm_enabled INTEGER DEFAULT 0,
-                join_dm_message TEXT DEFAULT NULL,
-                error_channel_id INTEGER DEFAULT NULL,
-                mod_log_channel_id INTEGER DEFAULT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS master_users (
-                user_id INTEGER PRIMARY KEY,
-                added_by INTEGER,
-                added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-
 class Configuration(commands.Cog):
     """Guild configuration management"""
 
     def __init__(self, bot):
         self.bot = bot
-        self.prefix_cache = {}
-        init_guild_tables()
 
-    def get_guild_config(self, guild_id: int) -> dict:
+    async def get_guild_config(self, guild_id: int) -> dict:
         """Get guild configuration, creating default if not exists"""
-        with get_db() as conn:
-            row = conn.execute(
-                "SELECT * FROM guild_config WHERE guild_id = ?",
-                (guild_id,)
-            ).fetchone()
-            if row:
-                return dict(row)
+        if not guild_configs.has_config(guild_id):
             # Create default config
-            conn.execute(
-                "INSERT INTO guild_config (guild_id) VALUES (?)",
+            await db.execute(
+                "INSERT OR IGNORE INTO guild_config (guild_id) VALUES (?)",
                 (guild_id,)
             )
-            return {
-                "guild_id": guild_id,
-                "prefix": "?",
-                "spam_filter_enabled": 1,
-                "leveling_enabled": 1,
-                "welcome_enabled": 1,
-                "join_dm_enabled": 0,
-                "join_dm_message": None,
-                "error_channel_id": None,
-                "mod_log_channel_id": None
-            }
+            await guild_configs.refresh(guild_id)
+        return guild_configs.get(guild_id)
 
     # === PREFIX COMMANDS ===
     @commands.command(name="set-prefix", aliases=["setprefix", "prefix"])
@@ -93,13 +35,12 @@ class Configuration(commands.Cog):
         if len(new_prefix) > 10:
             return await ctx.send("Prefix must be 10 characters or less.")
 
-        with get_db() as conn:
-            conn.execute("""
-                INSERT INTO guild_config (guild_id, prefix) VALUES (?, ?)
-                ON CONFLICT(guild_id) DO UPDATE SET prefix = ?, updated_at = CURRENT_TIMESTAMP
-            """, (ctx.guild.id, new_prefix, new_prefix))
+        await db.execute("""
+            INSERT INTO guild_config (guild_id, prefix) VALUES (?, ?)
+            ON CONFLICT(guild_id) DO UPDATE SET prefix = ?, updated_at = CURRENT_TIMESTAMP
+        """, (ctx.guild.id, new_prefix, new_prefix))
+        await guild_configs.refresh(ctx.guild.id)
 
-        self.prefix_cache[ctx.guild.id] = new_prefix
         embed = discord.Embed(
             title="Prefix Updated",
             description=f"Command prefix set to `{new_prefix}`",
@@ -110,7 +51,7 @@ class Configuration(commands.Cog):
     @commands.command(name="get-prefix", aliases=["getprefix"])
     async def get_prefix(self, ctx):
         """Show the current command prefix"""
-        cfg = self.get_guild_config(ctx.guild.id)
+        cfg = await self.get_guild_config(ctx.guild.id)
         await ctx.send(f"Current prefix: `{cfg['prefix']}`")
 
     # === INIT GUILD ===
@@ -120,15 +61,15 @@ class Configuration(commands.Cog):
         """Initialize all guild settings and database tables"""
         guild_id = ctx.guild.id
 
-        with get_db() as conn:
+        def apply(conn):
             # Ensure guild_config exists
             conn.execute("""
                 INSERT OR IGNORE INTO guild_config (guild_id) VALUES (?)
             """, (guild_id,))
 
-            # Ensure glevel table has guild entry
+            # Ensure leveling settings have a guild entry
             conn.execute("""
-                INSERT OR IGNORE INTO glevel (guild_id, enabled) VALUES (?, 'enabled')
+                INSERT OR IGNORE INTO leveling_settings (guild_id, enabled) VALUES (?, 1)
             """, (guild_id,))
 
             # Ensure welcome table exists
@@ -136,6 +77,9 @@ class Configuration(commands.Cog):
                 INSERT OR IGNORE INTO welcome (guild_id) VALUES (?)
             """, (guild_id,))
 
+        await db.run(apply)
+        await guild_configs.refresh(ctx.guild.id)
+
         embed = discord.Embed(
             title="Guild Initialized",
             description=f"**{ctx.guild.name}** has been set up!",
@@ -152,7 +96,7 @@ class Configuration(commands.Cog):
     @is_admin()
     async def show_config(self, ctx):
         """Show all guild configuration settings"""
-        cfg = self.get_guild_config(ctx.guild.id)
+        cfg = await self.get_guild_config(ctx.guild.id)
 
         embed = discord.Embed(
             title=f"Configuration for {ctx.guild.name}",
@@ -201,11 +145,11 @@ class Configuration(commands.Cog):
 
         enabled = state in ("on", "enable", "1", "true")
 
-        with get_db() as conn:
-            conn.execute("""
-                INSERT INTO guild_config (guild_id, spam_filter_enabled) VALUES (?, ?)
-                ON CONFLICT(guild_id) DO UPDATE SET spam_filter_enabled = ?, updated_at = CURRENT_TIMESTAMP
-            """, (ctx.guild.id, int(enabled), int(enabled)))
+        await db.execute("""
+            INSERT INTO guild_config (guild_id, spam_filter_enabled) VALUES (?, ?)
+            ON CONFLICT(guild_id) DO UPDATE SET spam_filter_enabled = ?, updated_at = CURRENT_TIMESTAMP
+        """, (ctx.guild.id, int(enabled), int(enabled)))
+        await guild_configs.refresh(ctx.guild.id)
 
         status = "enabled" if enabled else "disabled"
         embed = discord.Embed(
@@ -226,16 +170,19 @@ class Configuration(commands.Cog):
 
         enabled = state in ("on", "enable", "1", "true")
 
-        with get_db() as conn:
+        def apply(conn):
             conn.execute("""
                 INSERT INTO guild_config (guild_id, leveling_enabled) VALUES (?, ?)
                 ON CONFLICT(guild_id) DO UPDATE SET leveling_enabled = ?, updated_at = CURRENT_TIMESTAMP
             """, (ctx.guild.id, int(enabled), int(enabled)))
-            # Also update glevel table
+            # Also update the leveling cog's own switch
             conn.execute("""
-                INSERT INTO glevel (guild_id, enabled) VALUES (?, ?)
-                ON CONFLICT(guild_id) DO UPDATE SET enabled = ?
-            """, (ctx.guild.id, "enabled" if enabled else "disabled", "enabled" if enabled else "disabled"))
+                INSERT INTO leveling_settings (guild_id, enabled) VALUES (?, ?)
+                ON CONFLICT(guild_id) DO UPDATE SET enabled = excluded.enabled
+            """, (ctx.guild.id, int(enabled)))
+
+        await db.run(apply)
+        await guild_configs.refresh(ctx.guild.id)
 
         status = "enabled" if enabled else "disabled"
         embed = discord.Embed(
@@ -251,7 +198,7 @@ class Configuration(commands.Cog):
     async def set_join_message(self, ctx, *, message: str = None):
         """Set the DM message sent to new members. Use 'off' to disable."""
         if message is None:
-            cfg = self.get_guild_config(ctx.guild.id)
+            cfg = await self.get_guild_config(ctx.guild.id)
             if cfg['join_dm_message']:
                 await ctx.send(f"Current join message:\n```{cfg['join_dm_message']}```")
             else:
@@ -259,18 +206,23 @@ class Configuration(commands.Cog):
             return
 
         if message.lower() in ("off", "disable", "none", "clear"):
-            with get_db() as conn:
-                conn.execute("""
-                    UPDATE guild_config SET join_dm_enabled = 0, join_dm_message = NULL, updated_at = CURRENT_TIMESTAMP
-                    WHERE guild_id = ?
-                """, (ctx.guild.id,))
+            await db.execute("""
+                UPDATE guild_config SET join_dm_enabled = 0, join_dm_message = NULL, updated_at = CURRENT_TIMESTAMP
+                WHERE guild_id = ?
+            """, (ctx.guild.id,))
+            await guild_configs.refresh(ctx.guild.id)
             return await ctx.send("Join DM disabled.")
 
-        with get_db() as conn:
-            conn.execute("""
-                INSERT INTO guild_config (guild_id, join_dm_enabled, join_dm_message) VALUES (?, 1, ?)
-                ON CONFLICT(guild_id) DO UPDATE SET join_dm_enabled = 1, join_dm_message = ?, updated_at = CURRENT_TIMESTAMP
-            """, (ctx.guild.id, message, message))
+        try:
+            template = compile_template(message, max_length=JOIN_DM_MAX_LENGTH)
+        except TemplateError as e:
+            return await ctx.send(f"{e}\nAvailable placeholders: {placeholder_help()}")
+
+        await db.execute("""
+            INSERT INTO guild_config (guild_id, join_dm_enabled, join_dm_message) VALUES (?, 1, ?)
+            ON CONFLICT(guild_id) DO UPDATE SET join_dm_enabled = 1, join_dm_message = ?, updated_at = CURRENT_TIMESTAMP
+        """, (ctx.guild.id, message, message))
+        await guild_configs.refresh(ctx.guild.id)
 
         embed = discord.Embed(
             title="Join Message Set",
@@ -278,7 +230,8 @@ class Configuration(commands.Cog):
             color=config.COLOR_SUCCESS
         )
         embed.add_field(name="Message", value=message[:1024], inline=False)
-        embed.set_footer(text="Variables: {user}, {server}, {membercount}")
+        embed.add_field(name="Preview", value=template.fill(ctx.author)[:1024], inline=False)
+        embed.set_footer(text=f"Variables: {placeholder_help()}")
         await ctx.send(embed=embed)
 
     # === MOD LOG CHANNEL ===
@@ -287,18 +240,18 @@ class Configuration(commands.Cog):
     async def set_mod_log(self, ctx, channel: discord.TextChannel = None):
         """Set the channel for moderation logs"""
         if channel is None:
-            with get_db() as conn:
-                conn.execute("""
-                    UPDATE guild_config SET mod_log_channel_id = NULL, updated_at = CURRENT_TIMESTAMP
-                    WHERE guild_id = ?
-                """, (ctx.guild.id,))
+            await db.execute("""
+                UPDATE guild_config SET mod_log_channel_id = NULL, updated_at = CURRENT_TIMESTAMP
+                WHERE guild_id = ?
+            """, (ctx.guild.id,))
+            await guild_configs.refresh(ctx.guild.id)
             return await ctx.send("Mod log channel cleared.")
 
-        with get_db() as conn:
-            conn.execute("""
-                INSERT INTO guild_config (guild_id, mod_log_channel_id) VALUES (?, ?)
-                ON CONFLICT(guild_id) DO UPDATE SET mod_log_channel_id = ?, updated_at = CURRENT_TIMESTAMP
-            """, (ctx.guild.id, channel.id, channel.id))
+        await db.execute("""
+            INSERT INTO guild_config (guild_id, mod_log_channel_id) VALUES (?, ?)
+            ON CONFLICT(guild_id) DO UPDATE SET mod_log_channel_id = ?, updated_at = CURRENT_TIMESTAMP
+        """, (ctx.guild.id, channel.id, channel.id))
+        await guild_configs.refresh(ctx.guild.id)
 
         embed = discord.Embed(
             title="Mod Log Channel Set",
@@ -312,10 +265,9 @@ class Configuration(commands.Cog):
     @commands.is_owner()
     async def add_master_user(self, ctx, user: discord.User):
         """Add a master user (bot owner only)"""
-        with get_db() as conn:
-            conn.execute("""
-                INSERT OR REPLACE INTO master_users (user_id, added_by) VALUES (?, ?)
-            """, (user.id, ctx.author.id))
+        await db.execute("""
+            INSERT OR REPLACE INTO master_users (user_id, added_by) VALUES (?, ?)
+        """, (user.id, ctx.author.id))
 
         embed = discord.Embed(
             title="Master User Added",
@@ -328,8 +280,7 @@ class Configuration(commands.Cog):
     @commands.is_owner()
     async def remove_master_user(self, ctx, user: discord.User):
         """Remove a master user (bot owner only)"""
-        with get_db() as conn:
-            conn.execute("DELETE FROM master_users WHERE user_id = ?", (user.id,))
+        await db.execute("DELETE FROM master_users WHERE user_id = ?", (user.id,))
 
         embed = discord.Embed(
             title="Master User Removed",
@@ -342,8 +293,7 @@ class Configuration(commands.Cog):
     @commands.is_owner()
     async def list_master_users(self, ctx):
         """List all master users"""
-        with get_db() as conn:
-            rows = conn.execute("SELECT user_id FROM master_users").fetchall()
+        rows = await db.fetchall("SELECT user_id FROM master_users")
 
         if not rows:
             return await ctx.send("No master users configured.")
@@ -369,18 +319,18 @@ class Configuration(commands.Cog):
     async def set_error_channel(self, ctx, channel: discord.TextChannel = None):
         """Set channel for error logging (bot owner only)"""
         if channel is None:
-            with get_db() as conn:
-                conn.execute("""
-                    UPDATE guild_config SET error_channel_id = NULL, updated_at = CURRENT_TIMESTAMP
-                    WHERE guild_id = ?
-                """, (ctx.guild.id,))
+            await db.execute("""
+                UPDATE guild_config SET error_channel_id = NULL, updated_at = CURRENT_TIMESTAMP
+                WHERE guild_id = ?
+            """, (ctx.guild.id,))
+            await guild_configs.refresh(ctx.guild.id)
             return await ctx.send("Error logging channel cleared.")
 
-        with get_db() as conn:
-            conn.execute("""
-                INSERT INTO guild_config (guild_id, error_channel_id) VALUES (?, ?)
-                ON CONFLICT(guild_id) DO UPDATE SET error_channel_id = ?, updated_at = CURRENT_TIMESTAMP
-            """, (ctx.guild.id, channel.id, channel.id))
+        await db.execute("""
+            INSERT INTO guild_config (guild_id, error_channel_id) VALUES (?, ?)
+            ON CONFLICT(guild_id) DO UPDATE SET error_channel_id = ?, updated_at = CURRENT_TIMESTAMP
+        """, (ctx.guild.id, channel.id, channel.id))
+        await guild_configs.refresh(ctx.guild.id)
 
         embed = discord.Embed(
             title="Error Channel Set",
@@ -394,7 +344,7 @@ class Configuration(commands.Cog):
     @app_commands.default_permissions(administrator=True)
     async def slash_config(self, interaction: discord.Interaction):
         """Slash command version of config"""
-        cfg = self.get_guild_config(interaction.guild_id)
+        cfg = await self.get_guild_config(interaction.guild_id)
 
         embed = discord.Embed(
             title=f"Configuration for {interaction.guild.name}",
@@ -425,13 +375,12 @@ class Configuration(commands.Cog):
                 ephemeral=True
             )
 
-        with get_db() as conn:
-            conn.execute("""
-                INSERT INTO guild_config (guild_id, prefix) VALUES (?, ?)
-                ON CONFLICT(guild_id) DO UPDATE SET prefix = ?, updated_at = CURRENT_TIMESTAMP
-            """, (interaction.guild_id, prefix, prefix))
+        await db.execute("""
+            INSERT INTO guild_config (guild_id, prefix) VALUES (?, ?)
+            ON CONFLICT(guild_id) DO UPDATE SET prefix = ?, updated_at = CURRENT_TIMESTAMP
+        """, (interaction.guild_id, prefix, prefix))
+        await guild_configs.refresh(interaction.guild_id)
 
-        self.prefix_cache[interaction.guild_id] = prefix
         embed = discord.Embed(
             title="Prefix Updated",
             description=f"Command prefix set to `{prefix}`",
@@ -0,0 +1,99 @@
+import discord
+from discord.ext import commands
+import logging
+from cogs.utils.checks import is_admin
+from cogs.utils.jobs import jobs, format_duration
+import config
+
+logger = logging.getLogger(__name__)
+
+class Jobs(commands.Cog):
+    """Status and control of long-running background jobs"""
+
+    def __init__(self, bot):
+        self.bot = bot
+        jobs.bind(bot)
+
+    async def cog_load(self):
+        # on_ready won't fire again when the cog is reloaded on a running bot
+        if self.bot.is_ready():
+            await jobs.resume_all()
+
+    async def cog_unload(self):
+        jobs.stop()
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        await jobs.resume_all()
+
+    async def get_guild_job(self, ctx, job_id: int):
+        job = await jobs.get(job_id)
+        if job is None or job.guild_id != ctx.guild.id:
+            await ctx.send(f"No job #{job_id} in this server.")
+            return None
+        return job
+
+    # === LIST ===
+    @commands.group(name="jobs", invoke_without_command=True)
+    @is_admin()
+    async def jobs_group(self, ctx):
+        """Show this server's recent background jobs"""
+        recent = await jobs.recent(ctx.guild.id)
+        if not recent:
+            return await ctx.send("No background jobs have run in this server.")
+
+        lines = []
+        for job in recent:
+            line = f"`#{job.id}` **{job.kind}** — {job.status}, {job.position:,}/{job.total:,}"
+            if job.status == "running":
+                line += f" ({job.rate:.1f}/s, ETA {format_duration(job.eta)})"
+            lines.append(line)
+
+        embed = discord.Embed(title="Background Jobs", description="\n".join(lines), color=config.COLOR_INFO)
+        embed.set_footer(text="?jobs status|pause|resume|cancel <id>")
+        await ctx.send(embed=embed)
+
+    @jobs_group.command(name="status")
+    @is_admin()
+    async def job_status(self, ctx, job_id: int):
+        job = await self.get_guild_job(ctx, job_id)
+        if job:
+            await ctx.send(embed=jobs.embed(job))
+
+    # === CONTROL ===
+    @jobs_group.command(name="pause")
+    @is_admin()
+    async def job_pause(self, ctx, job_id: int):
+        job = await self.get_guild_job(ctx, job_id)
+        if not job:
+            return
+        if await jobs.pause(job):
+            await ctx.send(f"Job #{job.id} will pause after its current batch.")
+        else:
+            await ctx.send(f"Job #{job.id} is {job.status} and can't be paused.")
+
+    @jobs_group.command(name="resume")
+    @is_admin()
+    async def job_resume(self, ctx, job_id: int):
+        job = await self.get_guild_job(ctx, job_id)
+        if not job:
+            return
+        if await jobs.resume(job):
+            await ctx.send(f"Job #{job.id} resumed at {job.position:,}/{job.total:,}.")
+        else:
+            await ctx.send(f"Job #{job.id} is {job.status} and can't be resumed right now.")
+
+    @jobs_group.command(name="cancel")
+    @is_admin()
+    async def job_cancel(self, ctx, job_id: int):
+        job = await self.get_guild_job(ctx, job_id)
+        if not job:
+            return
+        if await jobs.cancel(job):
+            await ctx.send(f"Job #{job.id} cancelled.")
+        else:
+            await ctx.send(f"Job #{job.id} is already {job.status}.")
+
+async def setup(bot):
+    await bot.add_cog(Jobs(bot))
+    logger.info("Jobs cog loaded")
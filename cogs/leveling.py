@@ -1,38 +1,48 @@
 import discord
-from discord.ext import commands
-import sqlite3
+from discord.ext import commands, tasks
 import datetime
-import math
 import random
+import time
 import asyncio
 import logging
-from contextlib import contextmanager
 from cogs.utils.checks import is_admin
+from cogs.utils.db import db
+from cogs.utils.guild_config import guild_configs
+from cogs.utils.rank_rewards import rank_rewards
+from cogs.utils.pipeline import pipeline, PRIORITY_XP
+from cogs.utils.xp import XPBuffer
+from cogs.utils.leaderboard import leaderboards
 import config
 
-DB_PATH = config.DB_PATH
-
 logger = logging.getLogger(__name__)
 
-@contextmanager
-def get_db():
-    """Context manager for database connections"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    try:
-        yield conn
-        conn.commit()
-    except Exception as e:
-        conn.rollback()
-        logger.error(f"Database error: {e}", exc_info=True)
-        raise
-    finally:
-        conn.close()
-
 class Leveling(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.voice_tasks = {}
+        self.voice_members = {}   # voice channel_id → set of human member ids
+        self.voice_sessions = {}  # (guild_id, user_id) → [channel_id, joined_at, credited_at]
+        self.xp_buffer = XPBuffer(db, config.XP_BUFFER_MAX_ENTRIES, leaderboards)
+
+    async def cog_load(self):
+        self.flush_xp.start()
+        self.voice_sweep.start()
+        pipeline.register("xp", self.on_message, PRIORITY_XP)
+        # on_ready won't fire again when the cog is reloaded on a running bot
+        if self.bot.is_ready():
+            await self.restore_voice_sessions()
+
+    async def cog_unload(self):
+        pipeline.unregister("xp")
+        self.voice_sweep.cancel()
+        self.flush_xp.cancel()
+        await self.xp_buffer.flush(also=self._save_sessions)
+
+    @tasks.loop(seconds=config.XP_FLUSH_INTERVAL)
+    async def flush_xp(self):
+        try:
+            await self.xp_buffer.flush()
+        except Exception as e:
+            logger.error(f"Failed to flush XP buffer: {e}", exc_info=True)
 
     # === RANKS ===
     @commands.group(invoke_without_command=True)
@@ -53,9 +63,9 @@ class Leveling(commands.Cog):
             level_msg = await self.bot.wait_for("message", check=check, timeout=60)
             level = int(level_msg.content)
 
-            with get_db() as conn:
-                conn.execute("INSERT OR REPLACE INTO ranks(guild_id, role_id, level) VALUES(?, ?, ?)",
-                            (ctx.guild.id, role.id, level))
+            await db.execute("INSERT OR REPLACE INTO ranks(guild_id, role_id, level) VALUES(?, ?, ?)",
+                             (ctx.guild.id, role.id, level))
+            await rank_rewards.refresh(ctx.guild.id)
             await ctx.send(f"{role.name} → Level {level}")
         except asyncio.TimeoutError:
             await ctx.send("Timed out.")
@@ -69,17 +79,16 @@ class Leveling(commands.Cog):
         role = discord.utils.get(ctx.guild.roles, name=msg.content)
         if not role: return await ctx.send("Not found.")
 
-        with get_db() as conn:
-            conn.execute("DELETE FROM ranks WHERE guild_id = ? AND role_id = ?", (ctx.guild.id, role.id))
+        await db.execute("DELETE FROM ranks WHERE guild_id = ? AND role_id = ?", (ctx.guild.id, role.id))
+        await rank_rewards.refresh(ctx.guild.id)
         await ctx.send("Removed.")
 
     @ranks.command(name="list")
     async def _list(self, ctx):
-        with get_db() as conn:
-            rows = conn.execute("SELECT role_id, level FROM ranks WHERE guild_id = ?", (ctx.guild.id,)).fetchall()
-            if not rows:
-                return await ctx.send("No ranks set.")
-            text = "\n".join(f"<@&{r['role_id']}> → Level {r['level']}" for r in rows)
+        rewards = rank_rewards.get(ctx.guild.id)
+        if not rewards:
+            return await ctx.send("No ranks set.")
+        text = "\n".join(f"<@&{r.role_id}> → Level {r.level}" for r in rewards)
         await ctx.send(text)
 
     # === LEVELING TOGGLE ===
@@ -91,36 +100,28 @@ class Leveling(commands.Cog):
     @leveling.command()
     @is_admin()
     async def enable(self, ctx):
-        with get_db() as conn:
-            conn.execute("INSERT OR REPLACE INTO glevel(guild_id, enabled) VALUES(?, 'enabled')", (ctx.guild.id,))
+        await db.execute("INSERT OR REPLACE INTO leveling_settings(guild_id, enabled) VALUES(?, 1)", (ctx.guild.id,))
+        await guild_configs.refresh(ctx.guild.id)
         await ctx.send("Leveling enabled.")
 
     @leveling.command()
     @is_admin()
     async def disable(self, ctx):
-        with get_db() as conn:
-            conn.execute("INSERT OR REPLACE INTO glevel(guild_id, enabled) VALUES(?, 'disabled')", (ctx.guild.id,))
+        await db.execute("INSERT OR REPLACE INTO leveling_settings(guild_id, enabled) VALUES(?, 0)", (ctx.guild.id,))
+        await guild_configs.refresh(ctx.guild.id)
         await ctx.send("Leveling disabled.")
 
     # === CORE XP ===
     async def give_xp(self, member: discord.Member, xp: int):
         if member.bot: return
 
-        with get_db() as conn:
-            row = conn.execute("SELECT exp, level FROM glevel WHERE guild_id = ? AND user_id = ?",
-                              (member.guild.id, member.id)).fetchone()
-            if not row:
-                conn.execute("INSERT INTO glevel(guild_id, user_id, exp, level) VALUES(?, ?, ?, ?)",
-                            (member.guild.id, member.id, 0, 0))
-                row = {"exp": 0, "level": 0}
-
-            new_exp = row["exp"] + xp
-            new_level = int((math.sqrt(1 + 8 * new_exp / config.LEVEL_DIVISOR) - 1) / 2)
+        old_level, new_level = await self.xp_buffer.add(member.guild.id, member.id, xp)
+        await self.handle_level(member, old_level, new_level)
 
-            conn.execute("UPDATE glevel SET exp = ?, level = ? WHERE guild_id = ? AND user_id = ?",
-                        (new_exp, new_level, member.guild.id, member.id))
-
-            old_level = row["level"]
+    async def handle_level(self, member: discord.Member, old_level: int, new_level: int):
+        """Announce level-ups and hand out rank rewards after an XP award"""
+        if new_level == old_level:
+            return
 
         if new_level > old_level:
             try:
@@ -128,76 +129,158 @@ class Leveling(commands.Cog):
             except discord.Forbidden:
                 logger.debug(f"Could not DM {member} about level up")
 
-        # Auto-role
-        with get_db() as conn:
-            roles = conn.execute("SELECT role_id, level FROM ranks WHERE guild_id = ?", (member.guild.id,)).fetchall()
-            for r in roles:
-                if new_level >= r["level"]:
-                    role = member.guild.get_role(r["role_id"])
-                    if role and role not in member.roles:
-                        try:
-                            await member.add_roles(role, reason="Level reward")
-                        except discord.Forbidden:
-                            logger.warning(f"Cannot assign role {role.name} to {member} - missing permissions")
+        # Auto-role: one edit with every earned reward the member is missing
+        missing = rank_rewards.missing_roles(member, new_level)
+        if missing:
+            roles = [r for r in member.roles if not r.is_default()] + missing
+            try:
+                await member.edit(roles=roles, reason="Level reward")
+            except discord.Forbidden:
+                logger.warning(f"Cannot assign level rewards to {member} - missing permissions")
+            except discord.HTTPException as e:
+                logger.error(f"Failed to assign level rewards to {member}: {e}")
 
     # === TEXT XP ===
-    @commands.Cog.listener()
     async def on_message(self, message):
-        if not message.guild or message.author.bot:
+        """Message pipeline stage"""
+        if not guild_configs.leveling_enabled(message.guild.id):
             return
 
-        with get_db() as conn:
-            enabled = conn.execute("SELECT enabled FROM glevel WHERE guild_id = ?", (message.guild.id,)).fetchone()
-            if not enabled or enabled["enabled"] != "enabled":
-                return
-
         await self.give_xp(message.author, random.randint(config.TEXT_XP_MIN, config.TEXT_XP_MAX))
-        await self.bot.process_commands(message)
 
     # === VOICE XP ===
+    def _start_session(self, guild_id, member_id, channel_id, now):
+        self.voice_members.setdefault(channel_id, set()).add(member_id)
+        self.voice_sessions[(guild_id, member_id)] = [channel_id, now, now]
+
+    def _end_session(self, guild_id, member_id, channel_id):
+        members = self.voice_members.get(channel_id)
+        if members is not None:
+            members.discard(member_id)
+            if not members:
+                del self.voice_members[channel_id]
+        self.voice_sessions.pop((guild_id, member_id), None)
+
+    def _save_sessions(self, conn):
+        """Replace the persisted sessions with the in-memory ones (runs in the XP flush transaction)"""
+        now = time.time()
+        conn.execute("DELETE FROM voice_sessions")
+        conn.executemany(
+            "INSERT INTO voice_sessions (guild_id, user_id, channel_id, joined_at, credited_at, seen_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [(g, u, c, joined, credited, now) for (g, u), (c, joined, credited) in self.voice_sessions.items()]
+        )
+
+    async def restore_voice_sessions(self):
+        """Rebuild voice state from the gateway cache in one pass over every guild.
+
+        Members still connected keep their persisted session: time credited
+        before a restart is never awarded again, the partial interval they had
+        accrued is kept, and the downtime itself is not counted.
+        """
+        try:
+            rows = await db.fetchall("SELECT * FROM voice_sessions")
+        except Exception as e:
+            logger.error(f"Failed to load voice sessions: {e}", exc_info=True)
+            rows = []
+        persisted = {(r["guild_id"], r["user_id"]): r for r in rows}
+
+        now = time.time()
+        voice_members, sessions = {}, {}
+        for guild in self.bot.guilds:
+            for channel in (*guild.voice_channels, *guild.stage_channels):
+                humans = {m.id for m in channel.members if not m.bot}
+                if not humans:
+                    continue
+                voice_members[channel.id] = humans
+                for member_id in humans:
+                    key = (guild.id, member_id)
+                    live, saved = self.voice_sessions.get(key), persisted.get(key)
+                    if live is not None:
+                        sessions[key] = [channel.id, live[1], live[2]]
+                    elif saved is not None:
+                        downtime = max(0.0, now - saved["seen_at"])
+                        sessions[key] = [channel.id, saved["joined_at"], min(now, saved["credited_at"] + downtime)]
+                    else:
+                        sessions[key] = [channel.id, now, now]
+
+        self.voice_members, self.voice_sessions = voice_members, sessions
+        resumed = sum(1 for key in sessions if key in persisted)
+        logger.info(f"Restored {len(sessions)} voice sessions in {len(voice_members)} channels ({resumed} resumed)")
+
+        try:
+            await self.xp_buffer.flush(also=self._save_sessions)
+        except Exception as e:
+            logger.error(f"Failed to save voice sessions: {e}", exc_info=True)
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        await self.restore_voice_sessions()
+
+    @commands.Cog.listener()
+    async def on_resumed(self):
+        await self.restore_voice_sessions()
+
     @commands.Cog.listener()
     async def on_voice_state_update(self, member, before, after):
-        if member.bot:
+        if member.bot or before.channel == after.channel:
             return
 
-        # Cancel existing task if any (handles left, switched, or rejoined)
-        if member.id in self.voice_tasks:
-            old_task = self.voice_tasks.pop(member.id)
-            if not old_task.done():
-                old_task.cancel()
-                try:
-                    await old_task
-                except asyncio.CancelledError:
-                    pass
+        # Left or switched away from a channel
+        if before.channel:
+            self._end_session(member.guild.id, member.id, before.channel.id)
 
         # Joined or switched to a voice channel
         if after.channel:
-            # Don't give XP if alone or only with bots
-            if len(after.channel.members) <= 1:
-                return
-            if all(m.bot for m in after.channel.members if m.id != member.id):
-                return
-
-            async def voice_loop():
-                try:
-                    while True:
-                        await asyncio.sleep(config.VOICE_XP_INTERVAL)
-                        # Verify member is still in voice before giving XP
-                        if member.voice and member.voice.channel:
-                            # Re-check they're not alone
-                            channel = member.voice.channel
-                            if len(channel.members) > 1 and not all(m.bot for m in channel.members if m.id != member.id):
-                                await self.give_xp(member, random.randint(config.VOICE_XP_MIN, config.VOICE_XP_MAX))
-                        else:
-                            # Member left voice, cancel task
-                            break
-                except asyncio.CancelledError:
-                    logger.debug(f"Voice XP task cancelled for {member}")
-                except Exception as e:
-                    logger.error(f"Error in voice XP loop for {member}: {e}", exc_info=True)
-
-            task = asyncio.create_task(voice_loop())
-            self.voice_tasks[member.id] = task
+            self._start_session(member.guild.id, member.id, after.channel.id, time.time())
+
+    @tasks.loop(seconds=config.VOICE_XP_INTERVAL)
+    async def voice_sweep(self):
+        """Award voice XP for every full interval each member spent not alone with bots"""
+        now = time.time()
+        interval = config.VOICE_XP_INTERVAL
+        awards = {}  # guild → {user_id: xp}
+        for channel_id, member_ids in list(self.voice_members.items()):
+            channel = self.bot.get_channel(channel_id)
+            # Don't give XP if alone or only with bots; time spent that way doesn't accrue
+            eligible = len(member_ids) >= 2 and channel is not None
+            for member_id in member_ids:
+                session = self.voice_sessions.get((channel.guild.id, member_id)) if channel else None
+                if session is None:
+                    continue
+                if not eligible:
+                    session[2] = now
+                    continue
+                intervals = int((now - session[2]) // interval)
+                if intervals <= 0:
+                    continue
+                session[2] += intervals * interval
+                xp = sum(random.randint(config.VOICE_XP_MIN, config.VOICE_XP_MAX) for _ in range(intervals))
+                awards.setdefault(channel.guild, {})[member_id] = xp
+
+        for guild, guild_awards in awards.items():
+            try:
+                results = await self.xp_buffer.add_many(guild.id, guild_awards)
+            except Exception as e:
+                logger.error(f"Error awarding voice XP in {guild.id}: {e}", exc_info=True)
+                continue
+            for member_id, (old_level, new_level) in results.items():
+                member = guild.get_member(member_id)
+                if member:
+                    try:
+                        await self.handle_level(member, old_level, new_level)
+                    except Exception as e:
+                        logger.error(f"Error handling voice level for {member}: {e}", exc_info=True)
+
+        # XP and the session checkpoints commit together, so a crash never re-awards time
+        try:
+            await self.xp_buffer.flush(also=self._save_sessions)
+        except Exception as e:
+            logger.error(f"Failed to flush voice XP: {e}", exc_info=True)
+
+    @voice_sweep.before_loop
+    async def before_voice_sweep(self):
+        await self.bot.wait_until_ready()
 
 async def setup(bot):
     await bot.add_cog(Leveling(bot))
@@ -2,6 +2,7 @@ import discord
 from discord.ext import commands
 import random
 import os
+from cogs.utils.pipeline import pipeline, PRIORITY_MENTION
 
 RESPONSES_FOLDER = "mention_responses"
 os.makedirs(RESPONSES_FOLDER, exist_ok=True)
@@ -21,11 +22,14 @@ class Mention(commands.Cog):
             "Keep going, ara~"
         ]
 
-    @commands.Cog.listener()
-    async def on_message(self, message: discord.Message):
-        if message.author.bot:
-            return
+    async def cog_load(self):
+        pipeline.register("mention", self.on_message, PRIORITY_MENTION, guild_only=False)
+
+    async def cog_unload(self):
+        pipeline.unregister("mention")
 
+    async def on_message(self, message: discord.Message):
+        """Message pipeline stage"""
         # Direct mention (or reply to bot)
         if self.bot.user in message.mentions or (message.reference and message.reference.resolved and message.reference.resolved.author == self.bot.user):
             # 60% chance to respond
@@ -41,8 +45,6 @@ class Mention(commands.Cog):
                     response = random.choice(self.text_responses)
                     await message.reply(response, mention_author=False)
 
-        await self.bot.process_commands(message)
-
 async def setup(bot):
     await bot.add_cog(Mention(bot))
     print("Mention responses loaded — Yuno hears you ♡")
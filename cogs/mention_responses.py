@@ -1,54 +1,19 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
-import sqlite3
 import random
 import os
 import logging
-from contextlib import contextmanager
 from cogs.utils.checks import is_admin
+from cogs.utils.db import db
+from cogs.utils.pipeline import pipeline, PRIORITY_MENTION
 import config
 
-DB_PATH = config.DB_PATH
 RESPONSES_FOLDER = "mention_responses"
 logger = logging.getLogger(__name__)
 
 os.makedirs(RESPONSES_FOLDER, exist_ok=True)
 
-@contextmanager
-def get_db():
-    """Context manager for database connections"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    try:
-        yield conn
-        conn.commit()
-    except Exception as e:
-        conn.rollback()
-        logger.error(f"Database error: {e}", exc_info=True)
-        raise
-    finally:
-        conn.close()
-
-def init_mention_tables():
-    """Initialize mention response tables"""
-    with get_db() as conn:
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS mention_responses (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                guild_id INTEGER NOT NULL,
-                trigger TEXT NOT NULL,
-                response TEXT,
-                image_path TEXT,
-                created_by INTEGER,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                UNIQUE(guild_id, trigger)
-            )
-        """)
-        conn.execute("""
-            CREATE INDEX IF NOT EXISTS idx_mention_guild ON mention_responses(guild_id)
-        """)
-
 class MentionResponses(commands.Cog):
     """Custom mention-based auto responses"""
 
@@ -65,25 +30,29 @@ class MentionResponses(commands.Cog):
             "I'm proud of you!",
             "Keep going, ara~"
         ]
-        init_mention_tables()
 
-    def get_response(self, guild_id: int, trigger: str = None):
+    async def cog_load(self):
+        pipeline.register("mention_responses", self.on_message, PRIORITY_MENTION + 1)
+
+    async def cog_unload(self):
+        pipeline.unregister("mention_responses")
+
+    async def get_response(self, guild_id: int, trigger: str = None):
         """Get a response for the guild, optionally matching a trigger"""
-        with get_db() as conn:
-            if trigger:
-                row = conn.execute("""
-                    SELECT response, image_path FROM mention_responses
-                    WHERE guild_id = ? AND LOWER(trigger) = LOWER(?)
-                """, (guild_id, trigger)).fetchone()
-                if row:
-                    return dict(row)
-
-            # Get random guild response
-            rows = conn.execute("""
-                SELECT response, image_path FROM mention_responses WHERE guild_id = ?
-            """, (guild_id,)).fetchall()
-            if rows:
-                return dict(random.choice(rows))
+        if trigger:
+            row = await db.fetchone("""
+                SELECT response, image_path FROM mention_responses
+                WHERE guild_id = ? AND LOWER(trigger) = LOWER(?)
+            """, (guild_id, trigger))
+            if row:
+                return dict(row)
+
+        # Get random guild response
+        rows = await db.fetchall("""
+            SELECT response, image_path FROM mention_responses WHERE guild_id = ?
+        """, (guild_id,))
+        if rows:
+            return dict(random.choice(rows))
 
         return None
 
@@ -110,14 +79,13 @@ class MentionResponses(commands.Cog):
         if not response and not image_path:
             return await ctx.send("Please provide a response text or attach an image.")
 
-        with get_db() as conn:
-            conn.execute("""
-                INSERT INTO mention_responses (guild_id, trigger, response, image_path, created_by)
-                VALUES (?, ?, ?, ?, ?)
-                ON CONFLICT(guild_id, trigger) DO UPDATE SET
-                    response = ?, image_path = ?, created_by = ?
-            """, (ctx.guild.id, trigger.lower(), response, image_path, ctx.author.id,
-                  response, image_path, ctx.author.id))
+        await db.execute("""
+            INSERT INTO mention_responses (guild_id, trigger, response, image_path, created_by)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(guild_id, trigger) DO UPDATE SET
+                response = ?, image_path = ?, created_by = ?
+        """, (ctx.guild.id, trigger.lower(), response, image_path, ctx.author.id,
+              response, image_path, ctx.author.id))
 
         embed = discord.Embed(
             title="Mention Response Added",
@@ -135,28 +103,27 @@ class MentionResponses(commands.Cog):
     @is_admin()
     async def del_mention_response(self, ctx, *, trigger: str):
         """Delete a custom mention response"""
-        with get_db() as conn:
-            # Get image path before deleting to clean up file
-            row = conn.execute("""
-                SELECT image_path FROM mention_responses
-                WHERE guild_id = ? AND LOWER(trigger) = LOWER(?)
-            """, (ctx.guild.id, trigger)).fetchone()
-
-            if not row:
-                return await ctx.send(f"No response found for trigger `{trigger}`")
-
-            # Delete the record
-            conn.execute("""
-                DELETE FROM mention_responses
-                WHERE guild_id = ? AND LOWER(trigger) = LOWER(?)
-            """, (ctx.guild.id, trigger))
-
-            # Clean up image file
-            if row['image_path'] and os.path.exists(row['image_path']):
-                try:
-                    os.remove(row['image_path'])
-                except OSError:
-                    pass
+        # Get image path before deleting to clean up file
+        row = await db.fetchone("""
+            SELECT image_path FROM mention_responses
+            WHERE guild_id = ? AND LOWER(trigger) = LOWER(?)
+        """, (ctx.guild.id, trigger))
+
+        if not row:
+            return await ctx.send(f"No response found for trigger `{trigger}`")
+
+        # Delete the record
+        await db.execute("""
+            DELETE FROM mention_responses
+            WHERE guild_id = ? AND LOWER(trigger) = LOWER(?)
+        """, (ctx.guild.id, trigger))
+
+        # Clean up image file
+        if row['image_path'] and os.path.exists(row['image_path']):
+            try:
+                os.remove(row['image_path'])
+            except OSError:
+                pass
 
         embed = discord.Embed(
             title="Mention Response Deleted",
@@ -169,11 +136,10 @@ class MentionResponses(commands.Cog):
     @commands.command(name="mentionresponses", aliases=["listmentions", "responses"])
     async def list_mention_responses(self, ctx):
         """List all custom mention responses for this server"""
-        with get_db() as conn:
-            rows = conn.execute("""
-                SELECT id, trigger, response, image_path, created_by FROM mention_responses
-                WHERE guild_id = ? ORDER BY trigger
-            """, (ctx.guild.id,)).fetchall()
+        rows = await db.fetchall("""
+            SELECT id, trigger, response, image_path, created_by FROM mention_responses
+            WHERE guild_id = ? ORDER BY trigger
+        """, (ctx.guild.id,))
 
         if not rows:
             embed = discord.Embed(
@@ -207,11 +173,8 @@ class MentionResponses(commands.Cog):
         await ctx.send(embed=embed)
 
     # === MESSAGE LISTENER ===
-    @commands.Cog.listener()
     async def on_message(self, message: discord.Message):
-        if message.author.bot or not message.guild:
-            return
-
+        """Message pipeline stage"""
         # Check if bot is mentioned
         if self.bot.user not in message.mentions:
             # Also check for reply to bot
@@ -225,11 +188,11 @@ class MentionResponses(commands.Cog):
         # Try to find a matching trigger response
         response_data = None
         if content:
-            response_data = self.get_response(message.guild.id, content)
+            response_data = await self.get_response(message.guild.id, content)
 
         # If no specific match, get random guild response
         if not response_data:
-            response_data = self.get_response(message.guild.id)
+            response_data = await self.get_response(message.guild.id)
 
         # If still no response, use defaults
         if not response_data:
@@ -266,13 +229,12 @@ class MentionResponses(commands.Cog):
     )
     async def slash_add_response(self, interaction: discord.Interaction, trigger: str, response: str):
         """Slash command to add mention response"""
-        with get_db() as conn:
-            conn.execute("""
-                INSERT INTO mention_responses (guild_id, trigger, response, created_by)
-                VALUES (?, ?, ?, ?)
-                ON CONFLICT(guild_id, trigger) DO UPDATE SET response = ?, created_by = ?
-            """, (interaction.guild_id, trigger.lower(), response, interaction.user.id,
-                  response, interaction.user.id))
+        await db.execute("""
+            INSERT INTO mention_responses (guild_id, trigger, response, created_by)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(guild_id, trigger) DO UPDATE SET response = ?, created_by = ?
+        """, (interaction.guild_id, trigger.lower(), response, interaction.user.id,
+              response, interaction.user.id))
 
         embed = discord.Embed(
             title="Mention Response Added",
@@ -287,13 +249,12 @@ class MentionResponses(commands.Cog):
     @app_commands.describe(trigger="The trigger word to remove")
     async def slash_del_response(self, interaction: discord.Interaction, trigger: str):
         """Slash command to delete mention response"""
-        with get_db() as conn:
-            result = conn.execute("""
-                DELETE FROM mention_responses
-                WHERE guild_id = ? AND LOWER(trigger) = LOWER(?)
-            """, (interaction.guild_id, trigger))
+        deleted = await db.execute("""
+            DELETE FROM mention_responses
+            WHERE guild_id = ? AND LOWER(trigger) = LOWER(?)
+        """, (interaction.guild_id, trigger))
 
-        if result.rowcount == 0:
+        if deleted == 0:
             return await interaction.response.send_message(
                 f"No response found for trigger `{trigger}`",
                 ephemeral=True
@@ -309,11 +270,10 @@ class MentionResponses(commands.Cog):
     @app_commands.command(name="responses", description="List all custom mention responses")
     async def slash_list_responses(self, interaction: discord.Interaction):
         """Slash command to list mention responses"""
-        with get_db() as conn:
-            rows = conn.execute("""
-                SELECT trigger, response FROM mention_responses
-                WHERE guild_id = ? ORDER BY trigger LIMIT 25
-            """, (interaction.guild_id,)).fetchall()
+        rows = await db.fetchall("""
+            SELECT trigger, response FROM mention_responses
+            WHERE guild_id = ? ORDER BY trigger LIMIT 25
+        """, (interaction.guild_id,))
 
         if not rows:
             return await interaction.response.send_message(
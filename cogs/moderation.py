@@ -1,79 +1,34 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
-import sqlite3
 import datetime
 import logging
-from contextlib import contextmanager
 from cogs.utils.checks import is_admin
+from cogs.utils.db import db
+from cogs.utils.guild_config import guild_configs
 import config
 
-DB_PATH = config.DB_PATH
 logger = logging.getLogger(__name__)
 
-@contextmanager
-def get_db():
-    """Context manager for database connections"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    try:
-        yield conn
-        conn.commit()
-    except Exception as e:
-        conn.rollback()
-        logger.error(f"Database error: {e}", exc_info=True)
-        raise
-    finally:
-        conn.close()
-
-def init_mod_tables():
-    """Initialize moderation tables"""
-    with get_db() as conn:
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS mod_actions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                guild_id INTEGER NOT NULL,
-                moderator_id INTEGER NOT NULL,
-                target_id INTEGER NOT NULL,
-                action TEXT NOT NULL,
-                reason TEXT,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        conn.execute("""
-            CREATE INDEX IF NOT EXISTS idx_mod_guild ON mod_actions(guild_id)
-        """)
-        conn.execute("""
-            CREATE INDEX IF NOT EXISTS idx_mod_moderator ON mod_actions(moderator_id)
-        """)
-        conn.execute("""
-            CREATE INDEX IF NOT EXISTS idx_mod_target ON mod_actions(target_id)
-        """)
-
 class Moderation(commands.Cog):
     """Enhanced moderation commands with action logging"""
 
     def __init__(self, bot):
         self.bot = bot
-        init_mod_tables()
 
-    def log_action(self, guild_id: int, moderator_id: int, target_id: int, action: str, reason: str = None):
+    async def log_action(self, guild_id: int, moderator_id: int, target_id: int, action: str, reason: str = None):
         """Log a moderation action to the database"""
-        with get_db() as conn:
-            conn.execute("""
-                INSERT INTO mod_actions (guild_id, moderator_id, target_id, action, reason)
-                VALUES (?, ?, ?, ?, ?)
-            """, (guild_id, moderator_id, target_id, action, reason))
+        await db.execute("""
+            INSERT INTO mod_actions (guild_id, moderator_id, target_id, action, reason)
+            VALUES (?, ?, ?, ?, ?)
+        """, (guild_id, moderator_id, target_id, action, reason))
 
     async def send_mod_log(self, guild: discord.Guild, embed: discord.Embed):
         """Send to mod log channel if configured"""
-        with get_db() as conn:
-            row = conn.execute("""
-                SELECT mod_log_channel_id FROM guild_config WHERE guild_id = ?
-            """, (guild.id,)).fetchone()
+        channel_id = guild_configs.get(guild.id)['mod_log_channel_id']
 
-        if row and row['mod_log_channel_id']:
-            channel = guild.get_channel(row['mod_log_channel_id'])
+        if channel_id:
+            channel = guild.get_channel(channel_id)
             if channel:
                 try:
                     await channel.send(embed=embed)
@@ -94,7 +49,7 @@ class Moderation(commands.Cog):
         except discord.Forbidden:
             return await ctx.send("I don't have permission to kick this user.")
 
-        self.log_action(ctx.guild.id, ctx.author.id, member.id, "kick", reason)
+        await self.log_action(ctx.guild.id, ctx.author.id, member.id, "kick", reason)
 
         embed = discord.Embed(
             title="Member Kicked",
@@ -149,7 +104,7 @@ class Moderation(commands.Cog):
         except discord.Forbidden:
             return await ctx.send("I don't have permission to timeout this user.")
 
-        self.log_action(ctx.guild.id, ctx.author.id, member.id, "timeout", f"{duration} - {reason}")
+        await self.log_action(ctx.guild.id, ctx.author.id, member.id, "timeout", f"{duration} - {reason}")
 
         embed = discord.Embed(
             title="Member Timed Out",
@@ -176,7 +131,7 @@ class Moderation(commands.Cog):
         except discord.Forbidden:
             return await ctx.send("I don't have permission to remove timeout.")
 
-        self.log_action(ctx.guild.id, ctx.author.id, member.id, "untimeout", reason)
+        await self.log_action(ctx.guild.id, ctx.author.id, member.id, "untimeout", reason)
 
         embed = discord.Embed(
             title="Timeout Removed",
@@ -192,7 +147,7 @@ class Moderation(commands.Cog):
     @commands.has_permissions(kick_members=True)
     async def warn(self, ctx, member: discord.Member, *, reason: str = "No reason provided"):
         """Warn a member (logged but no automatic action)"""
-        self.log_action(ctx.guild.id, ctx.author.id, member.id, "warn", reason)
+        await self.log_action(ctx.guild.id, ctx.author.id, member.id, "warn", reason)
 
         embed = discord.Embed(
             title="Member Warned",
@@ -229,58 +184,57 @@ class Moderation(commands.Cog):
         ?mod-stats - Show all mod stats
         ?mod-stats @Mod - Show specific moderator's stats
         """
-        with get_db() as conn:
-            if moderator:
-                # Stats for specific moderator
-                rows = conn.execute("""
-                    SELECT action, COUNT(*) as count FROM mod_actions
-                    WHERE guild_id = ? AND moderator_id = ?
-                    GROUP BY action
-                """, (ctx.guild.id, moderator.id)).fetchall()
-
-                total = conn.execute("""
-                    SELECT COUNT(*) as count FROM mod_actions
-                    WHERE guild_id = ? AND moderator_id = ?
-                """, (ctx.guild.id, moderator.id)).fetchone()['count']
-
-                embed = discord.Embed(
-                    title=f"Mod Stats for {moderator.display_name}",
-                    color=config.COLOR_INFO
-                )
-                embed.set_thumbnail(url=moderator.display_avatar.url)
-            else:
-                # Overall stats
-                rows = conn.execute("""
-                    SELECT action, COUNT(*) as count FROM mod_actions
-                    WHERE guild_id = ?
-                    GROUP BY action
-                """, (ctx.guild.id,)).fetchall()
-
-                total = conn.execute("""
-                    SELECT COUNT(*) as count FROM mod_actions WHERE guild_id = ?
-                """, (ctx.guild.id,)).fetchone()['count']
-
-                # Top moderators
-                top_mods = conn.execute("""
-                    SELECT moderator_id, COUNT(*) as count FROM mod_actions
-                    WHERE guild_id = ?
-                    GROUP BY moderator_id
-                    ORDER BY count DESC
-                    LIMIT 5
-                """, (ctx.guild.id,)).fetchall()
-
-                embed = discord.Embed(
-                    title=f"Moderation Stats for {ctx.guild.name}",
-                    color=config.COLOR_INFO
-                )
-
-                if top_mods:
-                    top_text = []
-                    for row in top_mods:
-                        member = ctx.guild.get_member(row['moderator_id'])
-                        name = member.display_name if member else f"Unknown ({row['moderator_id']})"
-                        top_text.append(f"**{name}**: {row['count']} actions")
-                    embed.add_field(name="Top Moderators", value="\n".join(top_text), inline=False)
+        if moderator:
+            # Stats for specific moderator
+            rows = await db.fetchall("""
+                SELECT action, COUNT(*) as count FROM mod_actions
+                WHERE guild_id = ? AND moderator_id = ?
+                GROUP BY action
+            """, (ctx.guild.id, moderator.id))
+
+            total = (await db.fetchone("""
+                SELECT COUNT(*) as count FROM mod_actions
+                WHERE guild_id = ? AND moderator_id = ?
+            """, (ctx.guild.id, moderator.id)))['count']
+
+            embed = discord.Embed(
+                title=f"Mod Stats for {moderator.display_name}",
+                color=config.COLOR_INFO
+            )
+            embed.set_thumbnail(url=moderator.display_avatar.url)
+        else:
+            # Overall stats
+            rows = await db.fetchall("""
+                SELECT action, COUNT(*) as count FROM mod_actions
+                WHERE guild_id = ?
+                GROUP BY action
+            """, (ctx.guild.id,))
+
+            total = (await db.fetchone("""
+                SELECT COUNT(*) as count FROM mod_actions WHERE guild_id = ?
+            """, (ctx.guild.id,)))['count']
+
+            # Top moderators
+            top_mods = await db.fetchall("""
+                SELECT moderator_id, COUNT(*) as count FROM mod_actions
+                WHERE guild_id = ?
+                GROUP BY moderator_id
+                ORDER BY count DESC
+                LIMIT 5
+            """, (ctx.guild.id,))
+
+            embed = discord.Embed(
+                title=f"Moderation Stats for {ctx.guild.name}",
+                color=config.COLOR_INFO
+            )
+
+            if top_mods:
+                top_text = []
+                for row in top_mods:
+                    member = ctx.guild.get_member(row['moderator_id'])
+                    name = member.display_name if member else f"Unknown ({row['moderator_id']})"
+                    top_text.append(f"**{name}**: {row['count']} actions")
+                embed.add_field(name="Top Moderators", value="\n".join(top_text), inline=False)
 
         if not rows:
             return await ctx.send("No moderation actions recorded.")
@@ -311,13 +265,12 @@ class Moderation(commands.Cog):
     @is_admin()
     async def user_history(self, ctx, user: discord.User):
         """View moderation history for a user"""
-        with get_db() as conn:
-            rows = conn.execute("""
-                SELECT action, reason, moderator_id, timestamp FROM mod_actions
-                WHERE guild_id = ? AND target_id = ?
-                ORDER BY timestamp DESC
-                LIMIT 10
-            """, (ctx.guild.id, user.id)).fetchall()
+        rows = await db.fetchall("""
+            SELECT action, reason, moderator_id, timestamp FROM mod_actions
+            WHERE guild_id = ? AND target_id = ?
+            ORDER BY timestamp DESC
+            LIMIT 10
+        """, (ctx.guild.id, user.id))
 
         if not rows:
             return await ctx.send(f"No moderation history for {user}")
@@ -356,7 +309,7 @@ class Moderation(commands.Cog):
         except discord.Forbidden:
             return await interaction.response.send_message("I don't have permission to kick this user.", ephemeral=True)
 
-        self.log_action(interaction.guild_id, interaction.user.id, member.id, "kick", reason)
+        await self.log_action(interaction.guild_id, interaction.user.id, member.id, "kick", reason)
 
         embed = discord.Embed(title="Member Kicked", color=config.COLOR_WARNING)
         embed.add_field(name="User", value=f"{member}", inline=True)
@@ -385,7 +338,7 @@ class Moderation(commands.Cog):
         except discord.Forbidden:
             return await interaction.response.send_message("I don't have permission to timeout this user.", ephemeral=True)
 
-        self.log_action(interaction.guild_id, interaction.user.id, member.id, "timeout", f"{minutes}m - {reason}")
+        await self.log_action(interaction.guild_id, interaction.user.id, member.id, "timeout", f"{minutes}m - {reason}")
 
         embed = discord.Embed(title="Member Timed Out", color=config.COLOR_WARNING)
         embed.add_field(name="User", value=f"{member}", inline=True)
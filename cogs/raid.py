@@ -0,0 +1,60 @@
+import discord
+from discord.ext import commands
+import logging
+from cogs.utils.checks import is_admin
+from cogs.utils.raid import raid_monitor
+import config
+
+logger = logging.getLogger(__name__)
+
+class Raid(commands.Cog):
+    """Raid mode status and manual control"""
+
+    def __init__(self, bot):
+        self.bot = bot
+
+    async def cog_unload(self):
+        raid_monitor.stop()
+
+    @commands.group(name="raid", invoke_without_command=True)
+    @is_admin()
+    async def raid(self, ctx):
+        """Show whether this server is in raid mode"""
+        raid = raid_monitor.get(ctx.guild.id)
+        if raid is None:
+            embed = discord.Embed(
+                title="Raid mode off",
+                description=(f"Starts automatically at {config.RAID_JOIN_LIMIT} joins in {config.RAID_JOIN_WINDOW}s "
+                             f"or {config.RAID_MESSAGE_LIMIT} messages in {config.SPAM_GUILD_WINDOW}s alongside "
+                             f"{config.RAID_DENSITY_JOINS} joins or {config.RAID_DENSITY_OFFENDERS} spam offenders "
+                             f"in {config.RAID_DENSITY_WINDOW}s."),
+                color=config.COLOR_INFO
+            )
+        else:
+            embed = raid_monitor.embed(raid)
+        embed.set_footer(text="?raid on • ?raid off")
+        await ctx.send(embed=embed)
+
+    @raid.command(name="on")
+    @is_admin()
+    async def raid_on(self, ctx):
+        """Start raid mode until ?raid off"""
+        was_active = raid_monitor.active(ctx.guild.id)
+        raid_monitor.start(ctx.guild, f"Manual ({ctx.author})", ctx.channel, manual=True)
+        logger.info(f"{ctx.author} enabled raid mode in {ctx.guild.name}")
+        if was_active:
+            await ctx.send("Raid mode is already on; it will now stay on until `?raid off`.")
+        else:
+            await ctx.send("Raid mode on. Welcomes are paused and spam bans are batched until `?raid off`.")
+
+    @raid.command(name="off")
+    @is_admin()
+    async def raid_off(self, ctx):
+        """End raid mode once queued bans are sent"""
+        if not raid_monitor.end(ctx.guild.id):
+            return await ctx.send("Raid mode is not on.")
+        logger.info(f"{ctx.author} ended raid mode in {ctx.guild.name}")
+        await ctx.send("Ending raid mode after the queued bans are sent.")
+
+async def setup(bot):
+    await bot.add_cog(Raid(bot))
@@ -1,118 +1,336 @@
 import discord
-from discord.ext import commands
-import re
-from collections import defaultdict, deque
-import asyncio
+from discord.ext import commands, tasks
 import logging
+from cogs.utils.checks import is_admin
+from cogs.utils.db import db
+from cogs.utils.guild_config import guild_configs
+from cogs.utils.message_handler import message_rates
+from cogs.utils.pipeline import pipeline, PRIORITY_SPAM
+from cogs.utils.raid import raid_monitor
+from cogs.utils.spam_state import spam_state, HISTORY_SIZE
+from cogs.utils.spam_rules import (spam_matchers, spam_rules, normalize_domain, rule_limit, SpamRule, DEFAULT_SPAM_RULES,
+                                   RULE_ORDER, RULE_LIMITS, ACTIONS, TERM_KINDS, RULE_INVITE, RULE_LINK, RULE_MASS_MENTION,
+                                   RULE_BANNED_WORD, RULE_BANNED_DOMAIN)
 import config
 
 logger = logging.getLogger(__name__)
 
-# === CONFIGURABLE RULES ===
-INVITE_REGEX = re.compile(config.INVITE_PATTERN)
-LINK_REGEX = re.compile(config.LINK_PATTERN)
+# rule → (ban reason, warning for a first offense); {limit} is the rule's threshold
+RULE_MESSAGES = {
+    "invite": ("Posted Discord invite link", "Discord invites are not allowed here."),
+    "blocklist": ("Posted a blocked word or link", "Your message contained a blocked word or link and was removed."),
+    "image_only": ("Text in image-only channel (2nd offense)",
+                   "Text is not allowed in image channels (like this one).\n"
+                   "Only links and images are permitted to reduce clutter."),
+    "mass_mention": ("Unauthorized @everyone or @here", "You are not allowed to mention everyone here."),
+    "no_links": ("Posted link after warning",
+                 "Links are not allowed in this channel. This is your **only warning**.\nNext offense = ban."),
+    "cross_channel": ("Posting in {limit}+ channels at once",
+                      "Please don't post across several channels at once. This is your **only warning**."),
+    "duplicate": ("Repeated the same message {limit}+ times", "Please don't repeat the same message."),
+    "flood": ("Sending {limit}+ messages in a few seconds", "You're sending messages too fast, please slow down."),
+    "message_streak": ("Message spam ({limit}+ consecutive)",
+                       "Please keep messages under {limit} in a row here.\n"
+                       "This is your **only warning**. Next burst = ban."),
+}
 
 class SpamFilter(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
 
-        # Per-user warning tracking
-        self.link_warnings = set()           # Users warned for links in #main
-        self.nsfw_text_warnings = set()      # Users warned in nsfw_* channels
-        self.spam_streak = defaultdict(int)  # Consecutive messages in main
+    async def cog_load(self):
+        pipeline.register("spam_filter", self.on_message, PRIORITY_SPAM)
+        self.sweep_state.start()
 
-        # Message history per channel (last 10 messages)
-        self.recent_messages = defaultdict(lambda: deque(maxlen=10))
+    async def cog_unload(self):
+        pipeline.unregister("spam_filter")
+        self.sweep_state.cancel()
 
-    @commands.Cog.listener()
-    async def on_message(self, message: discord.Message):
-        if not message.guild or message.author.bot:
-            return
+    # Warnings and channel histories live in spam_state and expire on their own
+    @tasks.loop(seconds=config.SPAM_STATE_SWEEP_INTERVAL)
+    async def sweep_state(self):
+        removed = spam_state.sweep() + message_rates.sweep()
+        if removed:
+            logger.debug(f"Expired {removed} spam filter entries")
 
-        # Cache member if needed
-        if message.author.id not in message.guild.members:
-            try:
-                await message.guild.fetch_member(message.author.id)
-            except discord.NotFound:
-                logger.warning(f"Member {message.author.id} not found in guild {message.guild.id}")
-                return
+    # === RULE CHECKS: (message, rule, hits, rates) → violated? ===
+    def check_invite(self, message, rule, hits, rates):
+        return RULE_INVITE in hits
+
+    def check_blocklist(self, message, rule, hits, rates):
+        return RULE_BANNED_WORD in hits or RULE_BANNED_DOMAIN in hits
+
+    def check_image_only(self, message, rule, hits, rates):
+        has_link = RULE_LINK in hits or message.attachments
+        return bool(message.content.strip()) and not has_link
+
+    def check_mass_mention(self, message, rule, hits, rates):
+        # Allowed if they have permission
+        return RULE_MASS_MENTION in hits and not message.author.guild_permissions.mention_everyone
+
+    def check_no_links(self, message, rule, hits, rates):
+        return RULE_LINK in hits
+
+    def check_cross_channel(self, message, rule, hits, rates):
+        return rates.channels >= rule_limit(rule)
+
+    def check_duplicate(self, message, rule, hits, rates):
+        return rates.duplicates >= rule_limit(rule)
+
+    def check_flood(self, message, rule, hits, rates):
+        return rates.user >= rule_limit(rule)
+
+    def check_message_streak(self, message, rule, hits, rates):
+        return spam_state.streak(message.guild.id, message.channel.id, message.author.id, rule_limit(rule))
+
+    async def on_message(self, message: discord.Message):
+        """Message pipeline stage; returns True when the message was actioned"""
+        if not guild_configs.spam_filter_enabled(message.guild.id):
+            return False
 
         # Skip mods/admins
         if message.author.guild_permissions.manage_messages:
-            return await self.bot.process_commands(message)
-
-        content = message.content
-        channel_name = message.channel.name.lower()
-
-        # Store in recent history
-        self.recent_messages[message.channel.id].append(message)
-
-        # === RULE 1: Discord invites → instant ban ===
-        if INVITE_REGEX.search(content):
-            return await self.auto_ban(message, "Posted Discord invite link")
-
-        # === RULE 2: NSFW channels (nsfw_*) — no text, only links/images ===
-        if channel_name.startswith("nsfw_"):
-            has_link = bool(LINK_REGEX.search(content)) or message.attachments
-            if content.strip() and not has_link:
-                if message.author.id in self.nsfw_text_warnings:
-                    self.nsfw_text_warnings.remove(message.author.id)
-                    return await self.auto_ban(message, "Text in NSFW image-only channel (2nd offense)")
-                else:
-                    self.nsfw_text_warnings.add(message.author.id)
-                    await message.delete()
-                    try:
-                        await message.author.send(
-                            "Text is not allowed in NSFW image channels (like this one).\n"
-                            "Only links and images are permitted to reduce clutter.\n"
-                            "Please discuss in #main-chat or #media instead."
-                        )
-                    except discord.Forbidden:
-                        logger.debug(f"Could not DM {message.author} - DMs are closed")
-                    return
-
-        # === RULE 3: @everyone / @here → instant ban ===
-        if "@everyone" in content or "@here" in content:
-            if message.author.guild_permissions.mention_everyone:
-                pass  # Allowed if they have permission
+            return False
+
+        # Store in recent history and the rate windows
+        spam_state.record(message.guild.id, message.channel.id, message.author.id)
+        rates = message_rates.observe(message)
+        raid_monitor.record_messages(message, rates.guild)
+
+        entry = spam_rules.for_channel(message.channel)
+        # One pass over the content finds every pattern the rules need
+        hits = spam_matchers.get(message.guild.id).scan(message.content) if entry.scan else {}
+
+        for rule in entry.rules:
+            if getattr(self, f"check_{rule.rule}")(message, rule, hits, rates):
+                return await self.enforce(message, rule)
+        return False
+
+    async def enforce(self, message: discord.Message, rule) -> bool:
+        """Apply a violated rule's action; returns True if the message was removed"""
+        reason, warning = (text.format(limit=rule_limit(rule)) for text in RULE_MESSAGES[rule.rule])
+        guild_id, user_id = message.guild.id, message.author.id
+
+        raid_monitor.record_offense(message.author)
+
+        if rule.action == "ban" or (rule.action == "warn_ban" and spam_state.is_warned(guild_id, rule.rule, user_id)):
+            spam_state.clear_warning(guild_id, rule.rule, user_id)
+            # In raid mode bans go to the batched executor and nothing is posted per member
+            if raid_monitor.queue_ban(message.author, reason):
+                await message.delete()
             else:
-                return await self.auto_ban(message, "Unauthorized @everyone or @here")
-
-        # === RULE 4: Links in #main → one warning, then ban ===
-        if channel_name.startswith("main"):
-            if LINK_REGEX.search(content):
-                if message.author.id in self.link_warnings:
-                    self.link_warnings.remove(message.author.id)
-                    return await self.auto_ban(message, "Posted link in #main after warning")
-                else:
-                    self.link_warnings.add(message.author.id)
-                    await message.delete()
-                    warning = await message.channel.send(
-                        f"{message.author.mention} Links are not allowed in main chat. This is your **only warning**.\n"
-                        "Next offense = ban."
-                    )
-                    await asyncio.sleep(config.WARNING_TIMEOUT)
-                    await warning.delete()
-                    return
-
-            # === RULE 5: 4+ consecutive messages in #main → warning, then ban ===
-            recent = self.recent_messages[message.channel.id]
-            if len(recent) >= config.SPAM_MESSAGE_LIMIT:
-                authors = [m.author.id for m in list(recent)[-config.SPAM_MESSAGE_LIMIT:]]
-                if all(a == message.author.id for a in authors):
-                    if message.author.id in self.spam_streak:
-                        self.spam_streak.pop(message.author.id, None)
-                        return await self.auto_ban(message, "Message spam (4+ consecutive in main)")
-                    else:
-                        self.spam_streak[message.author.id] = True
-                        warning = await message.channel.send(
-                            f"{message.author.mention} Please keep messages under {config.SPAM_MESSAGE_LIMIT} in a row in main chat.\n"
-                            "This is your **only warning**. Next burst = ban."
-                        )
-                        await asyncio.sleep(config.WARNING_TIMEOUT)
-                        await warning.delete()
-
-        await self.bot.process_commands(message)
+                await self.auto_ban(message, reason)
+            return True
+
+        if rule.action == "delete" and raid_monitor.active(guild_id):
+            await message.delete()
+            return True
+
+        # A streak warning leaves the message that completed the streak in place
+        deleted = rule.rule != "message_streak"
+        if deleted:
+            await message.delete()
+
+        # delete rules fire on every offending message; only the first one gets a warning
+        if rule.action == "delete" and spam_state.is_warned(guild_id, rule.rule, user_id):
+            return deleted
+        spam_state.warn(guild_id, rule.rule, user_id)
+
+        if rule.rule == "image_only":
+            try:
+                await message.author.send(warning)
+            except discord.Forbidden:
+                logger.debug(f"Could not DM {message.author} - DMs are closed")
+        else:
+            await message.channel.send(f"{message.author.mention} {warning}", delete_after=config.WARNING_TIMEOUT)
+        return deleted
+
+    # === RULE SETS ===
+    def describe_rule(self, rule) -> str:
+        if rule.channel_id:
+            scope = f"<#{rule.channel_id}>"
+        elif rule.channel_prefix:
+            scope = f"channels starting with `{rule.channel_prefix}`"
+        else:
+            scope = "all channels"
+        text = f"**{rule.rule}** → `{rule.action}` in {scope}"
+        if rule.rule in RULE_LIMITS:
+            text += f" (limit {rule_limit(rule)})"
+        return text
+
+    @commands.group(name="spamrules", invoke_without_command=True)
+    @is_admin()
+    async def spamrules(self, ctx):
+        """Show this server's spam rules"""
+        rules = spam_rules.get(ctx.guild.id)
+        lines = [f"`{i}.` {self.describe_rule(rule)}" for i, rule in enumerate(rules, 1)]
+        embed = discord.Embed(title="Spam Rules", description="\n".join(lines) or "No rules.", color=config.COLOR_INFO)
+        if not guild_configs.spam_filter_enabled(ctx.guild.id):
+            embed.description = "⚠️ The spam filter is off (`?set-spamfilter on`).\n\n" + embed.description
+        origin = "Custom rules" if spam_rules.is_custom(ctx.guild.id) else "Built-in rules"
+        embed.set_footer(text=f"{origin} • ?spamrules add <rule> <action> [#channel|prefix:<name>|all] [limit] • "
+                              f"remove <number> • reset")
+        await ctx.send(embed=embed)
+
+    def customize(self, conn, guild_id: int):
+        """Copy the built-in rules into the table the first time a guild edits its rules"""
+        if spam_rules.is_custom(guild_id):
+            return
+        conn.executemany("""
+            INSERT INTO spam_rules (guild_id, rule, channel_id, channel_prefix, action, threshold)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, [(guild_id, r.rule, r.channel_id, r.channel_prefix, r.action, r.threshold) for r in DEFAULT_SPAM_RULES])
+
+    @spamrules.command(name="add")
+    @is_admin()
+    async def spamrules_add(self, ctx, rule: str, action: str, scope: str = "all", limit: int = None):
+        rule, action = rule.lower(), action.lower()
+        if rule not in RULE_ORDER or action not in ACTIONS:
+            return await ctx.send(f"Rules: {', '.join(RULE_ORDER)}\nActions: {', '.join(ACTIONS)}")
+        if limit is not None:
+            if rule not in RULE_LIMITS:
+                return await ctx.send(f"Only these rules take a limit: {', '.join(RULE_LIMITS)}")
+            highest = HISTORY_SIZE if rule == "message_streak" else 100
+            if not 2 <= limit <= highest:
+                return await ctx.send(f"The limit must be between 2 and {highest}.")
+
+        channel_id, prefix = None, None
+        if scope.lower().startswith("prefix:"):
+            prefix = scope[7:].lower()
+            if not prefix:
+                return await ctx.send("Usage: `prefix:<start of channel name>`")
+        elif scope.lower() != "all":
+            try:
+                channel_id = (await commands.GuildChannelConverter().convert(ctx, scope)).id
+            except commands.BadArgument:
+                return await ctx.send(f"Unknown channel `{scope}`. Use a #channel, `prefix:<name>` or `all`.")
+
+        guild_id = ctx.guild.id
+
+        def apply(conn):
+            self.customize(conn, guild_id)
+            conn.execute("""
+                INSERT INTO spam_rules (guild_id, rule, channel_id, channel_prefix, action, threshold)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (guild_id, rule, channel_id, prefix, action, limit))
+
+        await db.run(apply)
+        await spam_rules.refresh(guild_id)
+        await ctx.send(f"Added rule: {self.describe_rule(SpamRule(None, rule, channel_id, prefix, action, limit))}")
+
+    @spamrules.command(name="remove")
+    @is_admin()
+    async def spamrules_remove(self, ctx, number: int):
+        rules = spam_rules.get(ctx.guild.id)
+        if not 1 <= number <= len(rules):
+            return await ctx.send(f"There is no rule {number}. See `?spamrules`.")
+        guild_id = ctx.guild.id
+
+        def apply(conn):
+            self.customize(conn, guild_id)
+            # Built-in rules are copied in order, so the number still points at the same rule
+            row = conn.execute("SELECT id FROM spam_rules WHERE guild_id = ? ORDER BY id LIMIT 1 OFFSET ?",
+                               (guild_id, number - 1)).fetchone()
+            conn.execute("DELETE FROM spam_rules WHERE id = ?", (row["id"],))
+
+        await db.run(apply)
+        await spam_rules.refresh(guild_id)
+        await ctx.send(f"Removed rule: {self.describe_rule(rules[number - 1])}")
+
+    @spamrules.command(name="reset")
+    @is_admin()
+    async def spamrules_reset(self, ctx):
+        await db.execute("DELETE FROM spam_rules WHERE guild_id = ?", (ctx.guild.id,))
+        await spam_rules.refresh(ctx.guild.id)
+        await ctx.send("Spam rules reset to the built-in defaults.")
+
+    # === KEEP DECISION TABLES IN STEP WITH CHANNELS ===
+    @commands.Cog.listener()
+    async def on_guild_channel_create(self, channel):
+        spam_rules.invalidate(channel.guild.id)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel):
+        spam_rules.invalidate(channel.guild.id)
+        spam_state.forget_channel(channel.guild.id, channel.id)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_update(self, before, after):
+        if before.name != after.name:
+            spam_rules.invalidate(after.guild.id)
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild):
+        spam_rules.invalidate(guild.id)
+        spam_state.forget_guild(guild.id)
+        message_rates.forget_guild(guild.id)
+        raid_monitor.forget_guild(guild.id)
+
+    # === MEMORY REPORT ===
+    @commands.command(name="spamstate")
+    @commands.is_owner()
+    async def spam_state_report(self, ctx):
+        """Show how much state the spam filter is holding"""
+        report = spam_state.memory_report()
+        rates = message_rates.memory_report()
+        embed = discord.Embed(title="Spam Filter State", color=config.COLOR_INFO)
+        embed.add_field(name="Guilds", value=f"{report['guilds']:,}")
+        embed.add_field(name="Channel histories", value=f"{report['channels']:,}")
+        embed.add_field(name="Active warnings", value=f"{report['warnings']:,}")
+        embed.add_field(name="Rate windows", value=f"{rates['keys']:,}")
+        embed.add_field(name="Approx. memory", value=f"{(report['bytes'] + rates['bytes']) / 1024:,.1f} KiB")
+        embed.set_footer(text=f"Warnings expire after {config.SPAM_WARNING_TTL // 3600}h, "
+                              f"idle channels after {config.SPAM_HISTORY_TTL // 60} min")
+        await ctx.send(embed=embed)
+
+    # === BLOCKLIST ===
+    @commands.group(name="blocklist", invoke_without_command=True)
+    @is_admin()
+    async def blocklist(self, ctx):
+        """Show this server's blocked words and domains"""
+        rows = await db.fetchall("SELECT kind, term FROM spam_terms WHERE guild_id = ? ORDER BY kind, term",
+                                 (ctx.guild.id,))
+        embed = discord.Embed(title="Spam Blocklist", color=config.COLOR_INFO)
+        for kind in TERM_KINDS:
+            terms = [f"`{r['term']}`" for r in rows if r["kind"] == kind]
+            embed.add_field(name=f"{kind.title()}s ({len(terms)})", value=", ".join(terms)[:1024] or "None", inline=False)
+        embed.set_footer(text="?blocklist add|remove word|domain <term>")
+        await ctx.send(embed=embed)
+
+    def parse_term(self, kind: str, term: str):
+        kind = kind.lower()
+        if kind not in TERM_KINDS:
+            return None, None
+        term = normalize_domain(term) if kind == "domain" else term.strip().lower()
+        return kind, term
+
+    @blocklist.command(name="add")
+    @is_admin()
+    async def blocklist_add(self, ctx, kind: str, *, term: str):
+        kind, term = self.parse_term(kind, term)
+        if not kind or not term:
+            return await ctx.send("Usage: `?blocklist add word <word>` or `?blocklist add domain <domain>`")
+
+        await db.execute(
+            "INSERT OR IGNORE INTO spam_terms (guild_id, kind, term, added_by) VALUES (?, ?, ?, ?)",
+            (ctx.guild.id, kind, term, ctx.author.id)
+        )
+        await spam_matchers.refresh(ctx.guild.id)
+        await ctx.send(f"Blocked {kind} `{term}`.")
+
+    @blocklist.command(name="remove")
+    @is_admin()
+    async def blocklist_remove(self, ctx, kind: str, *, term: str):
+        kind, term = self.parse_term(kind, term)
+        if not kind or not term:
+            return await ctx.send("Usage: `?blocklist remove word <word>` or `?blocklist remove domain <domain>`")
+
+        deleted = await db.execute("DELETE FROM spam_terms WHERE guild_id = ? AND kind = ? AND term = ?",
+                                   (ctx.guild.id, kind, term))
+        if not deleted:
+            return await ctx.send(f"`{term}` isn't a blocked {kind}.")
+        await spam_matchers.refresh(ctx.guild.id)
+        await ctx.send(f"Unblocked {kind} `{term}`.")
 
     async def auto_ban(self, message: discord.Message, reason: str):
         try:
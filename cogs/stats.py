@@ -6,6 +6,7 @@ import datetime
 import os
 import sys
 import asyncio
+from cogs.utils.render import render_service
 
 class Stats(commands.Cog):
     def __init__(self, bot):
@@ -50,6 +51,25 @@ class Stats(commands.Cog):
 
         await ctx.send(embed=embed)
 
+    @commands.command(name="renderstats")
+    @commands.is_owner()
+    async def render_stats(self, ctx):
+        """Timing of image renders by kind"""
+        metrics = render_service.metrics()
+        embed = discord.Embed(title="Yuno • Render Stats", color=0xff003d, timestamp=discord.utils.utcnow())
+        embed.description = f"Workers: {render_service.workers} • Queued: {render_service.queued}/{render_service.max_queue}"
+        for kind, m in sorted(metrics.items()):
+            embed.add_field(
+                name=kind,
+                value=(f"{m['count']} done • {m['failed']} failed • {m['rejected']} rejected\n"
+                       f"render avg {m['avg_render_ms']:.1f} ms • max {m['max_render_ms']:.1f} ms\n"
+                       f"queue avg {m['avg_wait_ms']:.1f} ms"),
+                inline=False
+            )
+        if not metrics:
+            embed.add_field(name="No renders yet", value="Nothing has been drawn since startup.", inline=False)
+        await ctx.send(embed=embed)
+
 async def setup(bot):
     await bot.add_cog(Stats(bot))
     print("Stats command loaded — transparency achieved.")
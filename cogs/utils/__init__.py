@@ -1,4 +1,22 @@
 from .checks import is_admin, is_mod
-from .message_handler import MessageHandler
+from .message_handler import MessageHandler, RateReport, message_rates
+from .db import Database, db
+from .migrations import migrate
+from .guild_config import GuildConfigCache, guild_configs
+from .pipeline import MessagePipeline, pipeline
+from .rank_rewards import RankRewardCache, rank_rewards
+from .role_sync import RoleSyncQueue, RoleSyncJob, level_role_diff, apply_level_roles
+from .jobs import Job, JobManager, jobs
+from .leaderboard import GuildRanking, LeaderboardIndex, leaderboards
+from .render import RenderService, RenderBusy, render_service
+from .avatars import AvatarCache, avatars
+from .rank_card import RankCardRenderer, rank_cards
+from .welcome_banner import WelcomeBannerRenderer, welcome_banners
+from .templates import CompiledTemplate, TemplateCache, TemplateError, compile_template, templates
+from .welcome_dispatch import TokenBucket, WelcomeDispatcher, welcome_dispatcher
+from .spam_rules import SpamMatcher, SpamMatcherCache, spam_matchers, SpamRule, SpamRuleTable, SpamRuleCache, spam_rules
+from .spam_state import ChannelHistory, SpamState, spam_state
+from .raid import Raid, RaidMonitor, raid_monitor
+from .xp import XPBuffer, calc_level, calc_exp_for_level
 
-__all__ = ["is_admin", "is_mod", "MessageHandler"]
+__all__ = ["is_admin", "is_mod", "MessageHandler", "RateReport", "message_rates", "Database", "db", "migrate", "GuildConfigCache", "guild_configs", "MessagePipeline", "pipeline", "RankRewardCache", "rank_rewards", "RoleSyncQueue", "RoleSyncJob", "level_role_diff", "apply_level_roles", "Job", "JobManager", "jobs", "GuildRanking", "LeaderboardIndex", "leaderboards", "RenderService", "RenderBusy", "render_service", "AvatarCache", "avatars", "RankCardRenderer", "rank_cards", "WelcomeBannerRenderer", "welcome_banners", "CompiledTemplate", "TemplateCache", "TemplateError", "compile_template", "templates", "TokenBucket", "WelcomeDispatcher", "welcome_dispatcher", "SpamMatcher", "SpamMatcherCache", "spam_matchers", "SpamRule", "SpamRuleTable", "SpamRuleCache", "spam_rules", "ChannelHistory", "SpamState", "spam_state", "Raid", "RaidMonitor", "raid_monitor", "XPBuffer", "calc_level", "calc_exp_for_level"]
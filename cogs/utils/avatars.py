@@ -0,0 +1,55 @@
+import logging
+from collections import OrderedDict
+from io import BytesIO
+import discord
+from PIL import Image
+from cogs.utils.render import render_service
+import config
+
+logger = logging.getLogger(__name__)
+
+AVATAR_SIZE = 155
+
+
+def prepare_avatar(data: bytes) -> bytes:
+    """Decode and resize an avatar, returning raw RGBA pixels (render worker)"""
+    with Image.open(BytesIO(data)) as image:
+        return image.convert("RGBA").resize((AVATAR_SIZE, AVATAR_SIZE), Image.LANCZOS).tobytes()
+
+
+def avatar_image(pixels: bytes) -> Image.Image:
+    """Rebuild an image from prepare_avatar output (render worker)"""
+    return Image.frombytes("RGBA", (AVATAR_SIZE, AVATAR_SIZE), pixels)
+
+
+class AvatarCache:
+    """LRU of resized avatars shared by every rendered image.
+
+    Entries are keyed by the avatar hash, so a member's avatar is only
+    downloaded and resized again after they change it.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._avatars = OrderedDict()  # avatar key → RGBA bytes, least recently used first
+
+    async def get(self, user: discord.abc.User):
+        """Return the user's resized avatar pixels, or None if it couldn't be loaded"""
+        asset = user.display_avatar
+        pixels = self._avatars.get(asset.key)
+        if pixels is not None:
+            self._avatars.move_to_end(asset.key)
+            return pixels
+        try:
+            data = await asset.replace(size=256, format="png").read()
+            pixels = await render_service.render("avatar", prepare_avatar, data)
+        except (discord.HTTPException, OSError) as e:
+            logger.warning(f"Could not load avatar for {user}: {e}")
+            return None
+        self._avatars[asset.key] = pixels
+        while len(self._avatars) > self.max_entries:
+            self._avatars.popitem(last=False)
+        return pixels
+
+
+avatars = AvatarCache(config.AVATAR_CACHE_SIZE)
@@ -0,0 +1,104 @@
+import asyncio
+import logging
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from cogs.utils.xp import calc_level, calc_exp_for_level
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class Database:
+    """Bot-wide SQLite access layer.
+
+    Every query runs on a small dedicated thread pool; each worker thread owns
+    one long-lived connection, so the event loop never touches SQLite and
+    connections are reused instead of being opened per query.
+    """
+
+    def __init__(self, path: str, pool_size: int = 4):
+        self.path = path
+        self.pool_size = pool_size
+        self._executor = None
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    # === CONNECTIONS (worker threads only) ===
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        # Per-connection tuning; journal_mode=WAL is persistent and set by the migration runner
+        conn.execute(f"PRAGMA synchronous = {config.DB_SYNCHRONOUS}")
+        conn.execute(f"PRAGMA cache_size = -{int(config.DB_CACHE_SIZE_KB)}")
+        conn.execute(f"PRAGMA mmap_size = {int(config.DB_MMAP_SIZE)}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        # Level math available to set-based SQL (see cogs.utils.xp.bulk_apply)
+        conn.create_function("calc_level", 1, calc_level, deterministic=True)
+        conn.create_function("calc_exp_for_level", 1, calc_exp_for_level, deterministic=True)
+        return conn
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def _transaction(self, fn, *args):
+        conn = self._connection()
+        try:
+            result = fn(conn, *args)
+            conn.commit()
+            return result
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Database error: {e}", exc_info=True)
+            raise
+
+    # === ASYNC API ===
+    async def run(self, fn, *args):
+        """Run ``fn(conn, *args)`` in a single transaction on the DB thread pool"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix="yuno-db")
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._transaction, fn, *args)
+
+    async def execute(self, sql: str, params=()) -> int:
+        """Execute a statement and return the affected row count"""
+        return await self.run(lambda conn: conn.execute(sql, params).rowcount)
+
+    async def executemany(self, sql: str, seq_of_params) -> int:
+        """Execute a statement for every parameter set and return the affected row count"""
+        seq_of_params = list(seq_of_params)
+        return await self.run(lambda conn: conn.executemany(sql, seq_of_params).rowcount)
+
+    async def executescript(self, script: str):
+        """Execute several statements at once"""
+        await self.run(lambda conn: conn.executescript(script))
+
+    async def fetchone(self, sql: str, params=()):
+        """Return the first matching row or None"""
+        return await self.run(lambda conn: conn.execute(sql, params).fetchone())
+
+    async def fetchall(self, sql: str, params=()) -> list:
+        """Return all matching rows"""
+        return await self.run(lambda conn: conn.execute(sql, params).fetchall())
+
+    async def close(self):
+        """Stop the worker threads and close every pooled connection"""
+        if self._executor is not None:
+            # Let queued writes (like the final XP flush) drain without blocking the event loop
+            await asyncio.to_thread(self._executor.shutdown, True)
+            self._executor = None
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+
+db = Database(config.DB_PATH, config.DB_POOL_SIZE)
@@ -0,0 +1,85 @@
+import copy
+import logging
+from cogs.utils.db import db
+import config
+
+logger = logging.getLogger(__name__)
+
+GUILD_CONFIG_DEFAULTS = {
+    "prefix": config.BOT_PREFIX,
+    "spam_filter_enabled": 1,
+    "leveling_enabled": 1,
+    "welcome_enabled": 1,
+    "join_dm_enabled": 0,
+    "join_dm_message": None,
+    "error_channel_id": None,
+    "mod_log_channel_id": None
+}
+
+
+class GuildConfigCache:
+    """In-memory copy of every guild's settings.
+
+    Loaded in bulk at startup; commands that write settings call
+    ``refresh(guild_id)`` afterwards, so event handlers never query the
+    database just to read configuration.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self._config = {}    # guild_id → guild_config row
+        self._leveling = {}  # guild_id → leveling_settings.enabled
+        self._welcome = {}   # guild_id → welcome row
+
+    @staticmethod
+    def _read(conn, guild_id=None):
+        where, params = ("", ()) if guild_id is None else (" WHERE guild_id = ?", (guild_id,))
+        config_rows = conn.execute("SELECT * FROM guild_config" + where, params).fetchall()
+        leveling_rows = conn.execute("SELECT guild_id, enabled FROM leveling_settings" + where, params).fetchall()
+        welcome_rows = conn.execute("SELECT * FROM welcome" + where, params).fetchall()
+        return (
+            {r["guild_id"]: dict(r) for r in config_rows},
+            {r["guild_id"]: bool(r["enabled"]) for r in leveling_rows},
+            {r["guild_id"]: dict(r) for r in welcome_rows},
+        )
+
+    async def load(self):
+        """Load settings for every guild"""
+        self._config, self._leveling, self._welcome = await self.db.run(self._read)
+        logger.info(f"Loaded settings for {len(self._config)} guilds")
+
+    async def refresh(self, guild_id: int):
+        """Re-read one guild's settings after they were written"""
+        cfg, leveling, welcome = await self.db.run(self._read, guild_id)
+        for cache, fresh in ((self._config, cfg), (self._leveling, leveling), (self._welcome, welcome)):
+            cache.pop(guild_id, None)
+            cache.update(fresh)
+
+    def get(self, guild_id: int) -> dict:
+        """Return the guild_config row for a guild, or the defaults"""
+        cfg = self._config.get(guild_id)
+        if cfg is None:
+            return {"guild_id": guild_id, **GUILD_CONFIG_DEFAULTS}
+        return copy.copy(cfg)
+
+    def prefix(self, guild_id: int) -> str:
+        """Return the command prefix for a guild"""
+        cfg = self._config.get(guild_id)
+        return (cfg and cfg["prefix"]) or config.BOT_PREFIX
+
+    def has_config(self, guild_id: int) -> bool:
+        return guild_id in self._config
+
+    def leveling_enabled(self, guild_id: int) -> bool:
+        return self._leveling.get(guild_id, False)
+
+    def spam_filter_enabled(self, guild_id: int) -> bool:
+        cfg = self._config.get(guild_id)
+        return bool(cfg["spam_filter_enabled"]) if cfg else bool(GUILD_CONFIG_DEFAULTS["spam_filter_enabled"])
+
+    def welcome(self, guild_id: int):
+        """Return the welcome row for a guild, or None if never configured"""
+        return self._welcome.get(guild_id)
+
+
+guild_configs = GuildConfigCache(db)
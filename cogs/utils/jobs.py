@@ -0,0 +1,278 @@
+import asyncio
+import json
+import logging
+import time
+import discord
+from cogs.utils.db import db
+import config
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ("pending", "running")
+
+
+class Job:
+    """A persisted background job; items are stored in ``job_items`` and processed in order"""
+
+    def __init__(self, row):
+        self.id = row["id"]
+        self.kind = row["kind"]
+        self.guild_id = row["guild_id"]
+        self.channel_id = row["channel_id"]
+        self.message_id = row["message_id"]
+        self.created_by = row["created_by"]
+        self.status = row["status"]
+        self.total = row["total"]
+        self.position = row["position"]
+        self.counters = json.loads(row["counters"])
+        self.task = None
+        # Throughput of the current run (resets on restart/resume)
+        self.run_started = None
+        self.run_start_position = self.position
+
+    @property
+    def active(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    @property
+    def rate(self) -> float:
+        """Items per second since this run started"""
+        if self.run_started is None:
+            return 0.0
+        elapsed = time.monotonic() - self.run_started
+        return (self.position - self.run_start_position) / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def eta(self):
+        """Seconds left at the current rate, or None if unknown"""
+        rate = self.rate
+        return (self.total - self.position) / rate if rate > 0 else None
+
+
+def format_duration(seconds) -> str:
+    if seconds is None:
+        return "unknown"
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours}h {minutes}m"
+    if minutes:
+        return f"{minutes}m {seconds}s"
+    return f"{seconds}s"
+
+
+class JobManager:
+    """Runs long admin operations as persistent, resumable jobs.
+
+    Cogs register a handler per job kind, ``async (job, guild, items) -> {counter: n}``,
+    called with consecutive chunks of the job's items. The position and
+    counters are checkpointed after every chunk, so after a restart a job
+    resumes at its last checkpoint (handlers must tolerate repeating at most
+    one chunk). Jobs can be paused, resumed and cancelled; pausing and
+    cancelling take effect at the next chunk boundary.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.bot = None
+        self._handlers = {}  # kind → (handler, title, chunk_size)
+        self._jobs = {}      # job_id → Job, for jobs loaded this session
+
+    def bind(self, bot):
+        self.bot = bot
+
+    def register(self, kind: str, handler, title: str, chunk_size: int = None):
+        self._handlers[kind] = (handler, title, chunk_size or config.JOB_CHECKPOINT_EVERY)
+
+    def unregister(self, kind: str):
+        self._handlers.pop(kind, None)
+
+    # === PERSISTENCE ===
+    @staticmethod
+    def _insert(conn, kind, guild_id, channel_id, message_id, created_by, items):
+        now = time.time()
+        cursor = conn.execute(
+            "INSERT INTO jobs (kind, guild_id, channel_id, message_id, created_by, total, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (kind, guild_id, channel_id, message_id, created_by, len(items), now, now)
+        )
+        job_id = cursor.lastrowid
+        conn.executemany("INSERT INTO job_items (job_id, seq, data) VALUES (?, ?, ?)",
+                         ((job_id, seq, json.dumps(item)) for seq, item in enumerate(items)))
+        return conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+
+    @staticmethod
+    def _load_items(conn, job_id, position, limit):
+        rows = conn.execute("SELECT data FROM job_items WHERE job_id = ? AND seq >= ? ORDER BY seq LIMIT ?",
+                            (job_id, position, limit)).fetchall()
+        return [json.loads(r["data"]) for r in rows]
+
+    @staticmethod
+    def _save(conn, job_id, status, position, counters, finished):
+        now = time.time()
+        conn.execute("UPDATE jobs SET status = ?, position = ?, counters = ?, updated_at = ?, finished_at = ? "
+                     "WHERE id = ?", (status, position, json.dumps(counters), now, now if finished else None, job_id))
+        if finished:
+            conn.execute("DELETE FROM job_items WHERE job_id = ?", (job_id,))
+
+    async def _checkpoint(self, job: Job):
+        finished = job.status in ("done", "cancelled", "failed")
+        await self.db.run(self._save, job.id, job.status, job.position, job.counters, finished)
+
+    # === LIFECYCLE ===
+    async def create(self, kind: str, guild_id: int, items: list, message: discord.Message = None,
+                     created_by: int = None) -> Job:
+        """Persist a new job and start it; progress is edited into ``message``"""
+        if kind not in self._handlers:
+            raise ValueError(f"No handler registered for job kind '{kind}'")
+        row = await self.db.run(
+            self._insert, kind, guild_id, message.channel.id if message else None,
+            message.id if message else None, created_by, items
+        )
+        job = Job(row)
+        self._jobs[job.id] = job
+        self._start(job)
+        return job
+
+    async def resume_all(self):
+        """Restart every job left pending or running (called once the bot is ready)"""
+        rows = await self.db.fetchall(
+            "SELECT * FROM jobs WHERE status IN (?, ?) ORDER BY id", ACTIVE_STATUSES
+        )
+        resumed = 0
+        for row in rows:
+            job = self._jobs.get(row["id"])
+            if job is not None and job.active:
+                continue
+            if row["kind"] not in self._handlers:
+                logger.warning(f"Not resuming job {row['id']}: no handler for '{row['kind']}'")
+                continue
+            job = Job(row)
+            self._jobs[job.id] = job
+            self._start(job)
+            resumed += 1
+        if resumed:
+            logger.info(f"Resumed {resumed} background jobs")
+
+    async def get(self, job_id: int):
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job
+        row = await self.db.fetchone("SELECT * FROM jobs WHERE id = ?", (job_id,))
+        if row is None:
+            return None
+        job = Job(row)
+        self._jobs[job.id] = job
+        return job
+
+    async def recent(self, guild_id: int, limit: int = 10) -> list:
+        """Return the guild's most recent jobs, live state preferred"""
+        rows = await self.db.fetchall("SELECT * FROM jobs WHERE guild_id = ? ORDER BY id DESC LIMIT ?",
+                                      (guild_id, limit))
+        return [self._jobs.get(r["id"]) or Job(r) for r in rows]
+
+    async def pause(self, job: Job) -> bool:
+        if job.status not in ACTIVE_STATUSES:
+            return False
+        job.status = "paused"
+        if not job.active:
+            await self._checkpoint(job)
+        return True
+
+    async def resume(self, job: Job) -> bool:
+        if job.status != "paused" or job.active or job.kind not in self._handlers:
+            return False
+        job.status = "pending"
+        await self._checkpoint(job)
+        self._start(job)
+        return True
+
+    async def cancel(self, job: Job) -> bool:
+        if job.status not in (*ACTIVE_STATUSES, "paused"):
+            return False
+        job.status = "cancelled"
+        if not job.active:
+            await self._checkpoint(job)
+            await self._report(job)
+        return True
+
+    def stop(self):
+        """Cancel running job tasks; their last checkpoint is kept for the next start"""
+        for job in self._jobs.values():
+            if job.active:
+                job.task.cancel()
+
+    def _start(self, job: Job):
+        job.task = asyncio.create_task(self._run(job))
+
+    # === RUNNER ===
+    async def _run(self, job: Job):
+        handler, _, chunk_size = self._handlers[job.kind]
+        if job.status not in ACTIVE_STATUSES:
+            # Paused or cancelled before the task got to run
+            await self._checkpoint(job)
+            await self._report(job)
+            return
+        guild = self.bot.get_guild(job.guild_id) if self.bot else None
+        if guild is None:
+            logger.warning(f"Job {job.id} ({job.kind}) not started: guild {job.guild_id} unavailable")
+            return
+        job.status = "running"
+        job.run_started, job.run_start_position = time.monotonic(), job.position
+        await self._checkpoint(job)
+        last_report = 0.0
+        try:
+            while job.status == "running" and job.position < job.total:
+                items = await self.db.run(self._load_items, job.id, job.position, chunk_size)
+                if not items:
+                    break
+                for key, value in (await handler(job, guild, items)).items():
+                    job.counters[key] = job.counters.get(key, 0) + value
+                job.position += len(items)
+                await self._checkpoint(job)
+                if time.monotonic() - last_report >= config.JOB_PROGRESS_INTERVAL:
+                    last_report = time.monotonic()
+                    await self._report(job)
+            if job.status == "running":
+                job.status = "done"
+        except asyncio.CancelledError:
+            # Shutdown: leave the job "running" so it resumes from its checkpoint
+            raise
+        except Exception as e:
+            logger.error(f"Job {job.id} ({job.kind}) failed: {e}", exc_info=True)
+            job.status = "failed"
+
+        await self._checkpoint(job)
+        logger.info(f"Job {job.id} ({job.kind}) {job.status} at {job.position}/{job.total}")
+        await self._report(job)
+
+    # === STATUS ===
+    def embed(self, job: Job) -> discord.Embed:
+        _, title, _ = self._handlers.get(job.kind, (None, job.kind, None))
+        colors = {"done": config.COLOR_SUCCESS, "failed": config.COLOR_ERROR,
+                  "cancelled": config.COLOR_WARNING, "paused": config.COLOR_WARNING}
+        embed = discord.Embed(title=f"{title} — job #{job.id}", color=colors.get(job.status, config.COLOR_INFO))
+        percent = job.position / job.total * 100 if job.total else 100
+        embed.add_field(name="Status", value=job.status.capitalize(), inline=True)
+        embed.add_field(name="Progress", value=f"{job.position:,}/{job.total:,} ({percent:.0f}%)", inline=True)
+        if job.status == "running":
+            embed.add_field(name="Rate", value=f"{job.rate:.1f}/s", inline=True)
+            embed.add_field(name="ETA", value=format_duration(job.eta), inline=True)
+        for key, value in job.counters.items():
+            embed.add_field(name=key.replace("_", " ").capitalize(), value=f"{value:,}", inline=True)
+        return embed
+
+    async def _report(self, job: Job):
+        if not job.message_id or self.bot is None:
+            return
+        channel = self.bot.get_channel(job.channel_id)
+        if channel is None:
+            return
+        try:
+            await channel.get_partial_message(job.message_id).edit(content=None, embed=self.embed(job))
+        except discord.HTTPException as e:
+            logger.debug(f"Could not update status for job {job.id}: {e}")
+
+
+jobs = JobManager(db)
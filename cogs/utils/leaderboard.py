@@ -0,0 +1,192 @@
+import asyncio
+import bisect
+import logging
+from collections import OrderedDict
+from cogs.utils.db import db
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class GuildRanking:
+    """One guild's members ordered by XP (highest first, ties by user ID)"""
+
+    def __init__(self, rows=()):
+        self._exp = {user_id: exp for user_id, exp in rows}
+        self._keys = sorted((-exp, user_id) for user_id, exp in self._exp.items())
+
+    def __len__(self):
+        return len(self._keys)
+
+    def update(self, user_id: int, exp: int):
+        old = self._exp.get(user_id)
+        if old == exp:
+            return
+        if old is not None:
+            del self._keys[bisect.bisect_left(self._keys, (-old, user_id))]
+        self._exp[user_id] = exp
+        bisect.insort(self._keys, (-exp, user_id))
+
+    def exp(self, user_id: int):
+        return self._exp.get(user_id)
+
+    def rank(self, exp: int) -> int:
+        """1-based rank of an XP total; members with equal XP share a rank"""
+        return bisect.bisect_left(self._keys, (-exp,)) + 1
+
+    def page(self, offset: int, limit: int) -> list:
+        """Return [(user_id, exp)] starting at ``offset``"""
+        return [(user_id, -neg) for neg, user_id in self._keys[offset:offset + limit]]
+
+    def after(self, cursor, limit: int) -> list:
+        """Return [(user_id, exp)] following the (exp, user_id) ``cursor``, or from the top"""
+        start = 0 if cursor is None else bisect.bisect_right(self._keys, (-cursor[0], cursor[1]))
+        return self.page(start, limit)
+
+
+class LeaderboardIndex:
+    """In-memory XP rankings for recently used guilds.
+
+    A guild is loaded on first use and then kept in step with XP awards by
+    the XP buffer; bulk writes drop it with ``invalidate`` so it reloads.
+    Until a guild is loaded, lookups fall back to keyset queries on
+    ``idx_glevel_leaderboard`` instead of COUNT scans and OFFSET pagination.
+    """
+
+    def __init__(self, db, max_guilds: int = 50):
+        self.db = db
+        self.max_guilds = max_guilds
+        self._rankings = OrderedDict()  # guild_id → GuildRanking, least recently used first
+        self._loading = {}              # guild_id → (task, {user_id: exp} updates seen while loading)
+        self._counts = {}               # guild_id → ranked member count for guilds not in memory
+
+    # === SYNC WITH XP WRITES ===
+    def update(self, guild_id: int, user_id: int, exp: int):
+        """Record a member's new XP total (called by the XP buffer)"""
+        ranking = self._rankings.get(guild_id)
+        if ranking is not None:
+            ranking.update(user_id, exp)
+            return
+        # The member may be new to the guild's ranking
+        self._counts.pop(guild_id, None)
+        if guild_id in self._loading:
+            self._loading[guild_id][1][user_id] = exp
+
+    def invalidate(self, guild_id: int):
+        """Forget a guild after its XP was written outside the buffer"""
+        self._rankings.pop(guild_id, None)
+        self._counts.pop(guild_id, None)
+        loading = self._loading.pop(guild_id, None)
+        if loading is not None:
+            loading[0].cancel()
+
+    # === LOADING ===
+    @staticmethod
+    def _read(conn, guild_id: int):
+        return conn.execute("SELECT user_id, exp FROM glevel WHERE guild_id = ?", (guild_id,)).fetchall()
+
+    def is_loaded(self, guild_id: int) -> bool:
+        return guild_id in self._rankings
+
+    def ensure_loaded(self, guild_id: int, flush=None):
+        """Start loading a guild in the background if it isn't cached
+
+        ``flush`` is an optional coroutine function that persists buffered XP;
+        updates made after loading starts are replayed onto the result.
+        """
+        if guild_id in self._rankings or guild_id in self._loading:
+            return
+        task = asyncio.create_task(self._load(guild_id, flush))
+        self._loading[guild_id] = (task, {})
+
+    async def _load(self, guild_id: int, flush):
+        try:
+            if flush is not None:
+                await flush()
+            rows = await self.db.run(self._read, guild_id)
+        except Exception as e:
+            logger.error(f"Failed to load leaderboard for guild {guild_id}: {e}", exc_info=True)
+            self._loading.pop(guild_id, None)
+            return
+
+        loading = self._loading.pop(guild_id, None)
+        if loading is None:
+            return  # invalidated while loading
+        ranking = GuildRanking((r["user_id"], r["exp"]) for r in rows)
+        for user_id, exp in loading[1].items():
+            ranking.update(user_id, exp)
+        self._rankings[guild_id] = ranking
+        self._counts.pop(guild_id, None)
+        while len(self._rankings) > self.max_guilds:
+            self._rankings.popitem(last=False)
+        logger.debug(f"Loaded leaderboard for guild {guild_id} ({len(ranking)} members)")
+
+    async def get(self, guild_id: int, flush=None) -> GuildRanking:
+        """Return a guild's ranking, loading it now if needed"""
+        self.ensure_loaded(guild_id, flush)
+        if guild_id in self._loading:
+            # wait() rather than await: the load may be cancelled by an invalidate
+            await asyncio.wait([self._loading[guild_id][0]])
+        ranking = self._rankings.get(guild_id)
+        if ranking is not None:
+            self._rankings.move_to_end(guild_id)
+        return ranking
+
+    def _hot(self, guild_id: int, flush):
+        ranking = self._rankings.get(guild_id)
+        if ranking is None:
+            self.ensure_loaded(guild_id, flush)
+        else:
+            self._rankings.move_to_end(guild_id)
+        return ranking
+
+    # === LOOKUPS (memory when loaded, keyset SQL otherwise) ===
+    async def rank(self, guild_id: int, exp: int, flush=None) -> int:
+        ranking = self._hot(guild_id, flush)
+        if ranking is not None:
+            return ranking.rank(exp)
+        row = await self.db.fetchone("SELECT COUNT(*) + 1 AS rank FROM glevel WHERE guild_id = ? AND exp > ?",
+                                     (guild_id, exp))
+        return row["rank"]
+
+    async def count(self, guild_id: int, flush=None) -> int:
+        ranking = self._hot(guild_id, flush)
+        if ranking is not None:
+            return len(ranking)
+        count = self._counts.get(guild_id)
+        if count is None:
+            row = await self.db.fetchone("SELECT COUNT(*) AS count FROM glevel WHERE guild_id = ?", (guild_id,))
+            count = self._counts[guild_id] = row["count"]
+        return count
+
+    async def after(self, guild_id: int, cursor=None, limit: int = 10, flush=None) -> list:
+        """Return up to ``limit`` [(user_id, exp)] after the (exp, user_id) ``cursor``"""
+        ranking = self._hot(guild_id, flush)
+        if ranking is not None:
+            return ranking.after(cursor, limit)
+        if cursor is None:
+            rows = await self.db.fetchall("""
+                SELECT user_id, exp FROM glevel WHERE guild_id = ?
+                ORDER BY exp DESC, user_id LIMIT ?
+            """, (guild_id, limit))
+        else:
+            exp, user_id = cursor
+            rows = await self.db.fetchall("""
+                SELECT user_id, exp FROM glevel
+                WHERE guild_id = ? AND (exp < ? OR (exp = ? AND user_id > ?))
+                ORDER BY exp DESC, user_id LIMIT ?
+            """, (guild_id, exp, exp, user_id, limit))
+        return [(r["user_id"], r["exp"]) for r in rows]
+
+    async def page(self, guild_id: int, number: int, per_page: int = 10, flush=None) -> list:
+        """Return page ``number`` (1-based) as [(user_id, exp)]"""
+        if number <= 1:
+            return await self.after(guild_id, None, per_page, flush)
+        # Deep pages have no cursor to seek from, so wait for the in-memory ranking
+        ranking = await self.get(guild_id, flush)
+        if ranking is None:
+            return []
+        return ranking.page((number - 1) * per_page, per_page)
+
+
+leaderboards = LeaderboardIndex(db, config.LEADERBOARD_CACHE_GUILDS)
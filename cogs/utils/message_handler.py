@@ -1,22 +1,168 @@
-from collections import deque
-import discord.utils
+import sys
+import time
+from collections import deque, namedtuple
+import config
+
+# Counts for one message, taken over each window after it was recorded
+RateReport = namedtuple("RateReport", "user channel guild duplicates channels")
+
+
+class _Window:
+    """Timestamps within the last ``seconds``; expired entries are dropped as new ones arrive"""
+
+    __slots__ = ("times",)
+
+    def __init__(self):
+        self.times = deque()
+
+    def add(self, now: float, seconds: float) -> int:
+        times = self.times
+        times.append(now)
+        while now - times[0] > seconds:
+            times.popleft()
+        return len(times)
+
+    @property
+    def last(self) -> float:
+        return self.times[-1] if self.times else 0.0
+
+
+class _CountingWindow:
+    """(timestamp, key) pairs within the last ``seconds`` with a running count per key"""
+
+    __slots__ = ("entries", "counts")
+
+    def __init__(self):
+        self.entries = deque()
+        self.counts = {}
+
+    def add(self, now: float, key, seconds: float) -> int:
+        entries, counts = self.entries, self.counts
+        entries.append((now, key))
+        counts[key] = counts.get(key, 0) + 1
+        while now - entries[0][0] > seconds:
+            _, old = entries.popleft()
+            if counts[old] == 1:
+                del counts[old]
+            else:
+                counts[old] -= 1
+        return counts[key]
+
+    @property
+    def last(self) -> float:
+        return self.entries[-1][0] if self.entries else 0.0
+
 
 class MessageHandler:
-    def __init__(self, max_messages: int = 6, window_seconds: int = 8):
-        self.history = {}  # author_id → deque of timestamps
+    """Sliding-window message rate detection.
+
+    ``observe`` records a message in every window it belongs to and returns
+    a RateReport: messages by the author, in the channel and in the guild
+    over their windows, how often the author repeated this exact content,
+    and how many distinct channels the author posted in. Each update is
+    O(1) amortized; ``sweep`` forgets keys that have been idle longer than
+    their window.
+    """
+
+    def __init__(self, max_messages: int = 6, window_seconds: float = 8, channel_window: float = 10,
+                 guild_window: float = 10, duplicate_window: float = 30, cross_channel_window: float = 15):
         self.max = max_messages
         self.window = window_seconds
+        self.channel_window = channel_window
+        self.guild_window = guild_window
+        self.duplicate_window = duplicate_window
+        self.cross_channel_window = cross_channel_window
+
+        self.history = {}      # (guild_id, author_id) → _Window
+        self._channels = {}    # channel_id → _Window
+        self._guilds = {}      # guild_id → _Window
+        self._contents = {}    # (guild_id, author_id) → _CountingWindow of content hashes
+        self._spread = {}      # (guild_id, author_id) → _CountingWindow of channel IDs
+
+    @staticmethod
+    def _get(table: dict, key, factory):
+        value = table.get(key)
+        if value is None:
+            value = table[key] = factory()
+        return value
+
+    @staticmethod
+    def content_hash(content: str) -> int:
+        """Hash of the content with case and whitespace differences removed"""
+        return hash(" ".join(content.lower().split()))
+
+    def observe(self, message, now: float = None) -> RateReport:
+        """Record a guild message and return its rate counts"""
+        now = time.monotonic() if now is None else now
+        guild_id, channel_id = message.guild.id, message.channel.id
+        author = (guild_id, message.author.id)
+
+        user = self._get(self.history, author, _Window).add(now, self.window)
+        channel = self._get(self._channels, channel_id, _Window).add(now, self.channel_window)
+        guild = self._get(self._guilds, guild_id, _Window).add(now, self.guild_window)
+
+        duplicates = 0
+        if message.content.strip():
+            duplicates = self._get(self._contents, author, _CountingWindow).add(
+                now, self.content_hash(message.content), self.duplicate_window
+            )
+
+        spread = self._get(self._spread, author, _CountingWindow)
+        spread.add(now, channel_id, self.cross_channel_window)
+        return RateReport(user, channel, guild, duplicates, len(spread.counts))
+
+    def guild_rate(self, guild_id: int) -> int:
+        """Messages in the guild over its window, as of the last message"""
+        window = self._guilds.get(guild_id)
+        return len(window.times) if window else 0
+
+    # === PER-AUTHOR API ===
+    def add(self, author_id: int, guild_id: int = 0):
+        self._get(self.history, (guild_id, author_id), _Window).add(time.monotonic(), self.window)
+
+    def is_spamming(self, author_id: int, guild_id: int = 0) -> bool:
+        return self.spam_count(author_id, guild_id) >= self.max
+
+    def spam_count(self, author_id: int, guild_id: int = 0) -> int:
+        window = self.history.get((guild_id, author_id))
+        return len(window.times) if window else 0
+
+    # === EXPIRY ===
+    def sweep(self, now: float = None) -> int:
+        """Forget keys idle for longer than their window; returns keys removed"""
+        now = time.monotonic() if now is None else now
+        removed = 0
+        for table, seconds in ((self.history, self.window), (self._channels, self.channel_window),
+                               (self._guilds, self.guild_window), (self._contents, self.duplicate_window),
+                               (self._spread, self.cross_channel_window)):
+            idle = [key for key, window in table.items() if now - window.last > seconds]
+            for key in idle:
+                del table[key]
+            removed += len(idle)
+        return removed
+
+    def forget_guild(self, guild_id: int):
+        for table in (self.history, self._contents, self._spread):
+            for key in [k for k in table if k[0] == guild_id]:
+                del table[key]
+        self._guilds.pop(guild_id, None)
 
-    def add(self, author_id: int):
-        now = discord.utils.utcnow().timestamp()
-        q = self.history.setdefault(author_id, deque())
-        q.append(now)
-        while q and now - q[0] > self.window:
-            q.popleft()
+    def memory_report(self) -> dict:
+        """Key counts and an estimate of the bytes held"""
+        tables = (self.history, self._channels, self._guilds, self._contents, self._spread)
+        size = 0
+        for table in tables:
+            size += sys.getsizeof(table)
+            for key, window in table.items():
+                size += sys.getsizeof(key) + sys.getsizeof(window)
+                if isinstance(window, _Window):
+                    size += sys.getsizeof(window.times) + 32 * len(window.times)
+                else:
+                    size += sys.getsizeof(window.entries) + sys.getsizeof(window.counts) + 88 * len(window.entries)
+        return {"keys": sum(len(t) for t in tables), "bytes": size}
 
-    def is_spamming(self, author_id: int) -> bool:
-        q = self.history.get(author_id, deque())
-        return len(q) >= self.max
 
-    def spam_count(self, author_id: int) -> int:
-        return len(self.history.get(author_id, deque()))
+message_rates = MessageHandler(
+    config.SPAM_FLOOD_MESSAGES, config.SPAM_FLOOD_WINDOW, config.SPAM_CHANNEL_WINDOW, config.SPAM_GUILD_WINDOW,
+    config.SPAM_DUPLICATE_WINDOW, config.SPAM_CROSS_CHANNEL_WINDOW
+)
@@ -0,0 +1,265 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Each migration is (version, description, statements). Versions are applied
+# in order and recorded in PRAGMA user_version; never edit a released entry,
+# append a new one instead.
+MIGRATIONS = [
+    (1, "initial schema", [
+        """
+        CREATE TABLE IF NOT EXISTS glevel (
+            enabled TEXT,
+            user_id TEXT,
+            exp TEXT,
+            level TEXT,
+            guild_id TEXT
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS ranks (
+            role_id TEXT,
+            guild_id TEXT,
+            level TEXT
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS guild_config (
+            guild_id INTEGER PRIMARY KEY,
+            prefix TEXT DEFAULT '?',
+            spam_filter_enabled INTEGER DEFAULT 1,
+            leveling_enabled INTEGER DEFAULT 1,
+            welcome_enabled INTEGER DEFAULT 1,
+            join_dm_enabled INTEGER DEFAULT 0,
+            join_dm_message TEXT DEFAULT NULL,
+            error_channel_id INTEGER DEFAULT NULL,
+            mod_log_channel_id INTEGER DEFAULT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS master_users (
+            user_id INTEGER PRIMARY KEY,
+            added_by INTEGER,
+            added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS mod_actions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id INTEGER NOT NULL,
+            moderator_id INTEGER NOT NULL,
+            target_id INTEGER NOT NULL,
+            action TEXT NOT NULL,
+            reason TEXT,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_mod_guild ON mod_actions(guild_id)",
+        "CREATE INDEX IF NOT EXISTS idx_mod_moderator ON mod_actions(moderator_id)",
+        "CREATE INDEX IF NOT EXISTS idx_mod_target ON mod_actions(target_id)",
+        """
+        CREATE TABLE IF NOT EXISTS mention_responses (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id INTEGER NOT NULL,
+            trigger TEXT NOT NULL,
+            response TEXT,
+            image_path TEXT,
+            created_by INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(guild_id, trigger)
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_mention_guild ON mention_responses(guild_id)",
+        """
+        CREATE TABLE IF NOT EXISTS welcome (
+            guild_id INTEGER PRIMARY KEY,
+            channel_id INTEGER,
+            dm_enabled INTEGER DEFAULT 0,
+            channel_enabled INTEGER DEFAULT 1,
+            message TEXT DEFAULT 'Welcome {member} to {guild}!',
+            embed_color INTEGER DEFAULT 16761035,
+            image_url TEXT,
+            enabled INTEGER DEFAULT 1
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS quotes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id INTEGER,
+            content TEXT,
+            author_id INTEGER,
+            added_by INTEGER
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS autoclean (
+            guild_id INTEGER,
+            channel_id INTEGER,
+            interval_hours INTEGER,
+            warning_minutes INTEGER,
+            next_run TEXT,
+            PRIMARY KEY (guild_id, channel_id)
+        )
+        """,
+    ]),
+    (2, "hot-path indexes", [
+        "CREATE INDEX IF NOT EXISTS idx_glevel_member ON glevel(guild_id, user_id)",
+        "CREATE INDEX IF NOT EXISTS idx_ranks_guild ON ranks(guild_id, level)",
+        "CREATE INDEX IF NOT EXISTS idx_quotes_guild ON quotes(guild_id)",
+        "CREATE INDEX IF NOT EXISTS idx_mod_target_guild ON mod_actions(guild_id, target_id, timestamp)",
+    ]),
+    (3, "split glevel into leveling_settings and keyed member XP", [
+        # Per-guild enable flags used to live in glevel rows with a NULL user_id
+        """
+        CREATE TABLE leveling_settings (
+            guild_id INTEGER PRIMARY KEY,
+            enabled INTEGER NOT NULL DEFAULT 0
+        )
+        """,
+        """
+        INSERT OR REPLACE INTO leveling_settings (guild_id, enabled)
+        SELECT CAST(guild_id AS INTEGER), enabled = 'enabled' FROM glevel
+        WHERE user_id IS NULL AND guild_id IS NOT NULL AND enabled IS NOT NULL
+        ORDER BY rowid
+        """,
+        """
+        CREATE TABLE glevel_new (
+            guild_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            exp INTEGER NOT NULL DEFAULT 0,
+            level INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (guild_id, user_id)
+        ) WITHOUT ROWID
+        """,
+        """
+        INSERT INTO glevel_new (guild_id, user_id, exp, level)
+        -- With a single MAX() aggregate, SQLite takes the bare level column from
+        -- the duplicate row holding the most XP, so exp and level stay paired
+        SELECT CAST(guild_id AS INTEGER), CAST(user_id AS INTEGER),
+               MAX(CAST(IFNULL(exp, 0) AS INTEGER)), CAST(IFNULL(level, 0) AS INTEGER)
+        FROM glevel
+        WHERE user_id IS NOT NULL AND guild_id IS NOT NULL
+        GROUP BY CAST(guild_id AS INTEGER), CAST(user_id AS INTEGER)
+        """,
+        "DROP TABLE glevel",
+        "ALTER TABLE glevel_new RENAME TO glevel",
+        "CREATE INDEX idx_glevel_leaderboard ON glevel(guild_id, exp DESC)",
+        # ranks had the same untyped, unkeyed layout; `INSERT OR REPLACE` never replaced anything
+        """
+        CREATE TABLE ranks_new (
+            guild_id INTEGER NOT NULL,
+            role_id INTEGER NOT NULL,
+            level INTEGER NOT NULL,
+            PRIMARY KEY (guild_id, role_id)
+        ) WITHOUT ROWID
+        """,
+        """
+        INSERT OR REPLACE INTO ranks_new (guild_id, role_id, level)
+        SELECT CAST(guild_id AS INTEGER), CAST(role_id AS INTEGER), CAST(level AS INTEGER) FROM ranks
+        WHERE guild_id IS NOT NULL AND role_id IS NOT NULL AND level IS NOT NULL
+        ORDER BY rowid
+        """,
+        "DROP TABLE ranks",
+        "ALTER TABLE ranks_new RENAME TO ranks",
+        "CREATE INDEX idx_ranks_guild ON ranks(guild_id, level)",
+    ]),
+    (4, "persisted voice XP sessions", [
+        """
+        CREATE TABLE voice_sessions (
+            guild_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            channel_id INTEGER NOT NULL,
+            joined_at REAL NOT NULL,
+            credited_at REAL NOT NULL,
+            seen_at REAL NOT NULL,
+            PRIMARY KEY (guild_id, user_id)
+        ) WITHOUT ROWID
+        """,
+    ]),
+    (5, "resumable background jobs", [
+        """
+        CREATE TABLE jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            guild_id INTEGER NOT NULL,
+            channel_id INTEGER,
+            message_id INTEGER,
+            created_by INTEGER,
+            status TEXT NOT NULL DEFAULT 'pending',
+            total INTEGER NOT NULL,
+            position INTEGER NOT NULL DEFAULT 0,
+            counters TEXT NOT NULL DEFAULT '{}',
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL,
+            finished_at REAL
+        )
+        """,
+        "CREATE INDEX idx_jobs_status ON jobs(status)",
+        "CREATE INDEX idx_jobs_guild ON jobs(guild_id, id)",
+        """
+        CREATE TABLE job_items (
+            job_id INTEGER NOT NULL,
+            seq INTEGER NOT NULL,
+            data TEXT NOT NULL,
+            PRIMARY KEY (job_id, seq)
+        ) WITHOUT ROWID
+        """,
+    ]),
+    (6, "generated welcome banners", [
+        "ALTER TABLE welcome ADD COLUMN banner_enabled INTEGER NOT NULL DEFAULT 0",
+    ]),
+    (7, "spam filter blocklists", [
+        """
+        CREATE TABLE spam_terms (
+            guild_id INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            term TEXT NOT NULL,
+            added_by INTEGER,
+            PRIMARY KEY (guild_id, kind, term)
+        ) WITHOUT ROWID
+        """,
+    ]),
+    (8, "per-guild spam rules", [
+        """
+        CREATE TABLE spam_rules (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id INTEGER NOT NULL,
+            rule TEXT NOT NULL,
+            channel_id INTEGER,
+            channel_prefix TEXT,
+            action TEXT NOT NULL,
+            threshold INTEGER
+        )
+        """,
+        "CREATE INDEX idx_spam_rules_guild ON spam_rules(guild_id, id)",
+    ]),
+]
+
+
+def _current_version(conn) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def _apply(conn, version: int, statements):
+    conn.execute("BEGIN")
+    for sql in statements:
+        conn.execute(sql)
+    conn.execute(f"PRAGMA user_version = {int(version)}")
+
+
+async def migrate(db):
+    """Enable WAL and bring the schema up to the latest version (run once at boot)"""
+    mode = await db.run(lambda conn: conn.execute("PRAGMA journal_mode = WAL").fetchone()[0])
+    if mode.lower() != "wal":
+        logger.warning(f"Could not enable WAL mode, database is using '{mode}'")
+
+    current = await db.run(_current_version)
+    pending = [m for m in MIGRATIONS if m[0] > current]
+    for version, description, statements in pending:
+        logger.info(f"Applying database migration {version}: {description}")
+        await db.run(_apply, version, statements)
+
+    if pending:
+        logger.info(f"Database schema at version {pending[-1][0]}")
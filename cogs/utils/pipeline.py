@@ -0,0 +1,62 @@
+import bisect
+import logging
+import discord
+
+logger = logging.getLogger(__name__)
+
+# Stage priorities; lower runs first. Command dispatch always runs after every stage.
+PRIORITY_SPAM = 10
+PRIORITY_XP = 20
+PRIORITY_MENTION = 30
+
+
+class MessagePipeline:
+    """Ordered chain of message handlers run once per message.
+
+    Cogs register a stage instead of adding their own ``on_message`` listener.
+    A stage returning True consumes the message: later stages and command
+    dispatch are skipped. Bot authors are dropped before any stage runs and
+    guild authors are resolved to ``discord.Member`` once for all stages.
+    """
+
+    def __init__(self):
+        self._stages = []  # sorted (priority, name, handler, guild_only)
+
+    def register(self, name: str, handler, priority: int, guild_only: bool = True):
+        """Add a stage; ``handler`` is ``async (message) -> bool | None``"""
+        self.unregister(name)
+        keys = [(p, n) for p, n, _, _ in self._stages]
+        index = bisect.bisect(keys, (priority, name))
+        self._stages.insert(index, (priority, name, handler, guild_only))
+
+    def unregister(self, name: str):
+        self._stages = [s for s in self._stages if s[1] != name]
+
+    @property
+    def stages(self) -> list:
+        return [name for _, name, _, _ in self._stages]
+
+    async def process(self, message: discord.Message) -> bool:
+        """Run every stage; return False if a stage consumed the message"""
+        if message.author.bot:
+            return False
+
+        if message.guild and not isinstance(message.author, discord.Member):
+            try:
+                message.author = await message.guild.fetch_member(message.author.id)
+            except discord.NotFound:
+                logger.warning(f"Member {message.author.id} not found in guild {message.guild.id}")
+                return False
+
+        for _, name, handler, guild_only in list(self._stages):
+            if guild_only and message.guild is None:
+                continue
+            try:
+                if await handler(message):
+                    return False
+            except Exception as e:
+                logger.error(f"Message stage '{name}' failed: {e}", exc_info=True)
+        return True
+
+
+pipeline = MessagePipeline()
@@ -0,0 +1,264 @@
+import asyncio
+import logging
+import time
+from collections import Counter, OrderedDict, deque
+import discord
+from cogs.utils.guild_config import guild_configs
+from cogs.utils.jobs import format_duration
+import config
+
+logger = logging.getLogger(__name__)
+
+BULK_BAN_LIMIT = 200  # Discord's cap per bulk ban request
+
+
+class Raid:
+    """Counters and queued bans for one guild's raid"""
+
+    def __init__(self, guild: discord.Guild, trigger: str, channel=None, manual: bool = False):
+        self.guild = guild
+        self.trigger = trigger
+        self.channel = channel        # where to post the summary if the guild has no mod log
+        self.manual = manual          # manual raids only end with ?raid off
+        self.started = time.monotonic()
+        self.last_activity = self.started
+        self.ended = None
+        self.joins = 0
+        self.welcomes_suppressed = 0
+        self.pending = {}             # user_id → reason, waiting for the next ban batch
+        self.handled = set()          # user IDs already queued or banned
+        self.banned = 0
+        self.failed = 0
+        self.reasons = Counter()
+        self.message = None
+        self.task = None
+
+    @property
+    def duration(self) -> float:
+        return (self.ended or time.monotonic()) - self.started
+
+
+class RaidMonitor:
+    """Detects join and message bursts and runs a guild in raid mode.
+
+    While a raid is active, welcomes are suppressed, the spam filter queues
+    bans here instead of banning (and announcing) each member itself, and
+    one worker per raid sends the queued bans in bulk every
+    ``ban_interval`` seconds. The worker also keeps a single summary
+    message up to date. Raid mode ends after ``quiet_seconds`` without a
+    join burst or new ban.
+
+    A join burst starts raid mode on its own. A high message rate only does
+    when it comes with recent joins or spam offenders (``density_joins`` or
+    ``density_offenders`` within ``density_window`` seconds), so a busy
+    guild's normal chat never triggers or extends a raid.
+    """
+
+    def __init__(self, join_limit: int = 10, join_window: float = 10, message_limit: int = 50,
+                 density_window: float = 60, density_joins: int = 5, density_offenders: int = 5,
+                 quiet_seconds: float = 120, ban_interval: float = 5):
+        self.join_limit = join_limit
+        self.join_window = join_window
+        self.message_limit = message_limit
+        self.density_window = density_window
+        self.density_joins = density_joins
+        self.density_offenders = density_offenders
+        self.quiet_seconds = quiet_seconds
+        self.ban_interval = ban_interval
+        self._joins = {}      # guild_id → times of the latest joins (join_limit of them)
+        self._offenders = {}  # guild_id → OrderedDict of user_id → last offense time, oldest first
+        self._raids = {}      # guild_id → Raid
+
+    # === DETECTION ===
+    def active(self, guild_id: int) -> bool:
+        return guild_id in self._raids
+
+    def get(self, guild_id: int):
+        return self._raids.get(guild_id)
+
+    def record_join(self, member: discord.Member) -> bool:
+        """Count a join; starts raid mode when joins arrive faster than the threshold.
+
+        Returns whether the guild is in raid mode after this join.
+        """
+        now = time.monotonic()
+        joins = self._joins.get(member.guild.id)
+        if joins is None:
+            joins = self._joins[member.guild.id] = deque(maxlen=self.join_limit)
+        joins.append(now)
+        burst = len(joins) == joins.maxlen and now - joins[0] <= self.join_window
+
+        raid = self._raids.get(member.guild.id)
+        if raid is None and burst:
+            raid = self.start(member.guild, f"{self.join_limit}+ joins in {self.join_window:g}s")
+        if raid is not None:
+            raid.joins += 1
+            if burst:
+                raid.last_activity = now
+        return raid is not None
+
+    def record_offense(self, member: discord.Member):
+        """Count a spam filter offense towards the guild's offender density"""
+        now = time.monotonic()
+        offenders = self._offenders.get(member.guild.id)
+        if offenders is None:
+            offenders = self._offenders[member.guild.id] = OrderedDict()
+        offenders[member.id] = now
+        offenders.move_to_end(member.id)
+        while now - next(iter(offenders.values())) > self.density_window:
+            offenders.popitem(last=False)
+
+    def _recent_joins(self, guild_id: int, now: float) -> int:
+        return sum(1 for t in self._joins.get(guild_id, ()) if now - t <= self.density_window)
+
+    def _recent_offenders(self, guild_id: int, now: float) -> int:
+        offenders = self._offenders.get(guild_id)
+        return sum(1 for t in offenders.values() if now - t <= self.density_window) if offenders else 0
+
+    def record_messages(self, message: discord.Message, guild_rate: int):
+        """Check the guild's message rate (from MessageHandler) after each message.
+
+        Volume alone neither starts nor extends a raid; it needs recent joins
+        or offenders alongside it.
+        """
+        if guild_rate < self.message_limit or message.guild.id in self._raids:
+            return
+        now = time.monotonic()
+        joins = self._recent_joins(message.guild.id, now)
+        offenders = self._recent_offenders(message.guild.id, now)
+        if joins < self.density_joins and offenders < self.density_offenders:
+            return
+        self.start(message.guild, f"{guild_rate} messages in {config.SPAM_GUILD_WINDOW}s with {joins} joins "
+                                  f"and {offenders} offenders in {self.density_window:g}s", message.channel)
+
+    # === CONTROL ===
+    def start(self, guild: discord.Guild, trigger: str, channel=None, manual: bool = False) -> Raid:
+        raid = self._raids.get(guild.id)
+        if raid is not None:
+            raid.manual = raid.manual or manual
+            return raid
+        raid = self._raids[guild.id] = Raid(guild, trigger, channel, manual)
+        # The joins and offenders that triggered this raid can't trigger the next one
+        self._joins.pop(guild.id, None)
+        self._offenders.pop(guild.id, None)
+        raid.task = asyncio.create_task(self._run(raid))
+        logger.warning(f"Raid mode enabled in {guild.name} ({guild.id}): {trigger}")
+        return raid
+
+    def end(self, guild_id: int) -> bool:
+        """End a raid now (after sending its queued bans)"""
+        raid = self._raids.get(guild_id)
+        if raid is None:
+            return False
+        raid.manual = False
+        raid.last_activity = 0
+        return True
+
+    def suppress_welcome(self, guild_id: int):
+        raid = self._raids.get(guild_id)
+        if raid is not None:
+            raid.welcomes_suppressed += 1
+
+    def queue_ban(self, member, reason: str) -> bool:
+        """Queue a member for the next ban batch; returns False if no raid is active"""
+        raid = self._raids.get(member.guild.id)
+        if raid is None:
+            return False
+        if member.id not in raid.handled:
+            raid.handled.add(member.id)
+            raid.pending[member.id] = reason
+            raid.reasons[reason] += 1
+            raid.last_activity = time.monotonic()
+        return True
+
+    def forget_guild(self, guild_id: int):
+        self._joins.pop(guild_id, None)
+        self._offenders.pop(guild_id, None)
+        raid = self._raids.pop(guild_id, None)
+        if raid is not None and raid.task is not None:
+            raid.task.cancel()
+
+    def stop(self):
+        for raid in self._raids.values():
+            if raid.task is not None:
+                raid.task.cancel()
+        self._raids = {}
+
+    # === WORKER ===
+    async def _run(self, raid: Raid):
+        try:
+            await self._post_summary(raid)
+            while raid.manual or time.monotonic() - raid.last_activity < self.quiet_seconds:
+                await asyncio.sleep(self.ban_interval)
+                await self._ban_batch(raid)
+                await self._post_summary(raid)
+            while raid.pending:
+                await self._ban_batch(raid)
+            raid.ended = time.monotonic()
+            await self._post_summary(raid)
+            logger.warning(f"Raid mode ended in {raid.guild.name} ({raid.guild.id}): "
+                           f"{raid.banned} banned, {raid.welcomes_suppressed} welcomes suppressed")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Raid worker for guild {raid.guild.id} failed: {e}", exc_info=True)
+        finally:
+            if self._raids.get(raid.guild.id) is raid:
+                del self._raids[raid.guild.id]
+
+    async def _ban_batch(self, raid: Raid):
+        if not raid.pending:
+            return
+        user_ids = list(raid.pending)[:BULK_BAN_LIMIT]
+        reasons = Counter(raid.pending.pop(uid) for uid in user_ids)
+        reason = f"[Raid] {reasons.most_common(1)[0][0]}"
+        try:
+            result = await raid.guild.bulk_ban([discord.Object(id=uid) for uid in user_ids], reason=reason,
+                                               delete_message_seconds=config.BAN_DELETE_MESSAGES_SECONDS)
+        except discord.HTTPException as e:
+            logger.error(f"Raid bulk ban failed in guild {raid.guild.id}: {e}")
+            raid.failed += len(user_ids)
+            return
+        raid.banned += len(result.banned)
+        raid.failed += len(result.failed)
+
+    # === SUMMARY ===
+    def embed(self, raid: Raid) -> discord.Embed:
+        if raid.ended:
+            embed = discord.Embed(title="Raid mode ended", color=config.COLOR_SUCCESS)
+        else:
+            embed = discord.Embed(title="🚨 Raid mode active", color=config.COLOR_ERROR,
+                                  description="Welcomes are paused and offenders are banned in batches.")
+        embed.add_field(name="Trigger", value=raid.trigger, inline=False)
+        embed.add_field(name="Duration", value=format_duration(raid.duration))
+        embed.add_field(name="Joins", value=f"{raid.joins:,}")
+        embed.add_field(name="Welcomes suppressed", value=f"{raid.welcomes_suppressed:,}")
+        embed.add_field(name="Banned", value=f"{raid.banned:,}")
+        embed.add_field(name="Queued", value=f"{len(raid.pending):,}")
+        embed.add_field(name="Failed", value=f"{raid.failed:,}")
+        if raid.reasons:
+            top = "\n".join(f"{count:,}× {reason}" for reason, count in raid.reasons.most_common(5))
+            embed.add_field(name="Reasons", value=top[:1024], inline=False)
+        return embed
+
+    def _summary_channel(self, raid: Raid):
+        log_id = guild_configs.get(raid.guild.id)["mod_log_channel_id"]
+        channel = raid.guild.get_channel(log_id) if log_id else None
+        return channel or raid.channel or raid.guild.system_channel
+
+    async def _post_summary(self, raid: Raid):
+        try:
+            if raid.message is not None:
+                await raid.message.edit(embed=self.embed(raid))
+                return
+            channel = self._summary_channel(raid)
+            if channel is not None:
+                raid.message = await channel.send(embed=self.embed(raid))
+        except discord.HTTPException as e:
+            logger.warning(f"Could not update raid summary in guild {raid.guild.id}: {e}")
+
+
+raid_monitor = RaidMonitor(
+    config.RAID_JOIN_LIMIT, config.RAID_JOIN_WINDOW, config.RAID_MESSAGE_LIMIT, config.RAID_DENSITY_WINDOW,
+    config.RAID_DENSITY_JOINS, config.RAID_DENSITY_OFFENDERS, config.RAID_QUIET_SECONDS, config.RAID_BAN_INTERVAL
+)
@@ -0,0 +1,97 @@
+import logging
+from io import BytesIO
+import discord
+from PIL import Image, ImageDraw, ImageFont
+from cogs.utils.avatars import AVATAR_SIZE, avatar_image, avatars
+from cogs.utils.render import render_service
+import config
+
+logger = logging.getLogger(__name__)
+
+# Layout of Leveling/rank.png (934x282)
+AVATAR_POS = (51, 61)
+LEVEL_POS = (243, 97)
+EXP_POS = (243, 177)
+NAME_POS = (51, 220)
+RANK_POS = (880, 40)     # right-aligned
+BAR_BOX = (420, 200, 880, 222)
+TEXT_COLOR = (255, 255, 255, 255)
+MUTED_COLOR = (170, 170, 178, 255)
+BAR_BG = (47, 47, 53, 255)
+BAR_FG = (255, 0, 61, 255)
+
+
+# Per-process caches: filled once in each render worker
+_templates = {}
+_fonts = {}
+
+
+def _template(path: str) -> Image.Image:
+    template = _templates.get(path)
+    if template is None:
+        with Image.open(path) as image:
+            template = _templates[path] = image.convert("RGBA")
+    return template
+
+
+def _font(path: str, size: int) -> ImageFont.FreeTypeFont:
+    font = _fonts.get((path, size))
+    if font is None:
+        font = _fonts[(path, size)] = ImageFont.truetype(path, size)
+    return font
+
+
+def draw_rank_card(template_path: str, font_path: str, avatar, name: str, level: int, exp: int,
+                   progress: int, needed: int, rank: int) -> bytes:
+    """Render a card to PNG bytes (render worker); ``avatar`` is AvatarCache pixels or None"""
+    card = _template(template_path).copy()
+    if avatar is not None:
+        avatar = avatar_image(avatar)
+        card.paste(avatar, AVATAR_POS, avatar)
+
+    draw = ImageDraw.Draw(card)
+    draw.text(LEVEL_POS, str(level), font=_font(font_path, 36), fill=TEXT_COLOR)
+    draw.text(EXP_POS, f"{exp:,}", font=_font(font_path, 36), fill=TEXT_COLOR)
+    draw.text(NAME_POS, name[:20], font=_font(font_path, 22), fill=TEXT_COLOR)
+    draw.text(RANK_POS, f"Rank #{rank:,}", font=_font(font_path, 40), fill=TEXT_COLOR, anchor="ra")
+
+    x0, y0, x1, y1 = BAR_BOX
+    radius = (y1 - y0) // 2
+    draw.rounded_rectangle(BAR_BOX, radius=radius, fill=BAR_BG)
+    fraction = min(max(progress / needed, 0), 1) if needed > 0 else 1
+    if fraction > 0:
+        fill_x = max(x0 + 2 * radius, int(x0 + (x1 - x0) * fraction))
+        draw.rounded_rectangle((x0, y0, fill_x, y1), radius=radius, fill=BAR_FG)
+    draw.text((x1, y0 - 6), f"{progress:,} / {needed:,} XP", font=_font(font_path, 22), fill=MUTED_COLOR, anchor="rb")
+
+    buffer = BytesIO()
+    # Fast zlib level: cards are sent once, so encode time matters more than size
+    card.save(buffer, format="PNG", compress_level=1)
+    return buffer.getvalue()
+
+
+class RankCardRenderer:
+    """Draws rank cards onto the Leveling template.
+
+    Drawing runs on the shared render service; each worker process keeps
+    the template and fonts loaded and avatars come from the shared cache
+    already resized, so a card is one paste, a few text draws and a PNG
+    encode.
+    """
+
+    def __init__(self, template_path: str, font_path: str):
+        self.template_path = template_path
+        self.font_path = font_path
+
+    async def render(self, member: discord.Member, level: int, exp: int, progress: int, needed: int,
+                     rank: int) -> discord.File:
+        """Render a member's card; raises RenderBusy when the render queue is full"""
+        avatar = await avatars.get(member)
+        data = await render_service.render(
+            "rank_card", draw_rank_card, self.template_path, self.font_path,
+            avatar, member.display_name, level, exp, progress, needed, rank
+        )
+        return discord.File(BytesIO(data), filename="rank.png")
+
+
+rank_cards = RankCardRenderer(config.RANK_CARD_TEMPLATE, config.RANK_CARD_FONT)
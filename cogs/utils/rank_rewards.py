@@ -0,0 +1,83 @@
+import bisect
+import logging
+from collections import namedtuple
+import discord
+from cogs.utils.db import db
+
+logger = logging.getLogger(__name__)
+
+RankReward = namedtuple("RankReward", "level role_id")
+
+
+class RankRewardCache:
+    """In-memory, level-sorted copy of every guild's rank rewards.
+
+    Loaded in bulk at startup; ``ranks add/remove`` call ``refresh(guild_id)``
+    afterwards, so XP awards never query the ``ranks`` table.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self._rewards = {}     # guild_id → tuple of RankReward sorted by level
+        self._thresholds = {}  # guild_id → list of levels, parallel to _rewards
+
+    @staticmethod
+    def _read(conn, guild_id=None):
+        where, params = ("", ()) if guild_id is None else (" WHERE guild_id = ?", (guild_id,))
+        rows = conn.execute(
+            "SELECT guild_id, role_id, level FROM ranks" + where + " ORDER BY guild_id, level, role_id", params
+        ).fetchall()
+        rewards = {}
+        for r in rows:
+            rewards.setdefault(r["guild_id"], []).append(RankReward(r["level"], r["role_id"]))
+        return rewards
+
+    def _store(self, guild_id: int, rewards):
+        if rewards:
+            self._rewards[guild_id] = tuple(rewards)
+            self._thresholds[guild_id] = [r.level for r in rewards]
+        else:
+            self._rewards.pop(guild_id, None)
+            self._thresholds.pop(guild_id, None)
+
+    async def load(self):
+        """Load rank rewards for every guild"""
+        rewards = await self.db.run(self._read)
+        self._rewards, self._thresholds = {}, {}
+        for guild_id, guild_rewards in rewards.items():
+            self._store(guild_id, guild_rewards)
+        logger.info(f"Loaded rank rewards for {len(self._rewards)} guilds")
+
+    async def refresh(self, guild_id: int):
+        """Re-read one guild's rank rewards after they were written"""
+        rewards = await self.db.run(self._read, guild_id)
+        self._store(guild_id, rewards.get(guild_id))
+
+    def get(self, guild_id: int) -> tuple:
+        """Return a guild's rewards sorted by level (lowest first)"""
+        return self._rewards.get(guild_id, ())
+
+    def earned(self, guild_id: int, level: int) -> tuple:
+        """Return the rewards unlocked at ``level``"""
+        thresholds = self._thresholds.get(guild_id)
+        if not thresholds:
+            return ()
+        return self._rewards[guild_id][:bisect.bisect_right(thresholds, level)]
+
+    def missing_roles(self, member: discord.Member, level: int) -> list:
+        """Return the reward roles ``member`` has earned at ``level`` but does not have"""
+        earned = self.earned(member.guild.id, level)
+        if not earned:
+            return []
+        have = {role.id for role in member.roles}
+        missing = []
+        for reward in earned:
+            if reward.role_id in have:
+                continue
+            role = member.guild.get_role(reward.role_id)
+            if role is not None:
+                missing.append(role)
+        return missing
+
+
+rank_rewards = RankRewardCache(db)
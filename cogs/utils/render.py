@@ -0,0 +1,143 @@
+import asyncio
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class RenderBusy(Exception):
+    """Raised when the render queue is full; callers should degrade or retry later"""
+
+
+def _timed(fn, args):
+    # Runs in a worker process; the render time excludes pickling and queueing
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+class RenderStats:
+    """Timing counters for one kind of render job"""
+
+    def __init__(self):
+        self.count = 0
+        self.failed = 0
+        self.rejected = 0
+        self.render_total = 0.0
+        self.render_max = 0.0
+        self.wait_total = 0.0
+
+    def record(self, wait: float, render: float):
+        self.count += 1
+        self.wait_total += wait
+        self.render_total += render
+        self.render_max = max(self.render_max, render)
+
+    def as_dict(self) -> dict:
+        done = self.count or 1
+        return {
+            "count": self.count,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "avg_render_ms": self.render_total / done * 1000,
+            "max_render_ms": self.render_max * 1000,
+            "avg_wait_ms": self.wait_total / done * 1000,
+        }
+
+
+class RenderService:
+    """Bot-wide process pool for CPU-bound image work (Pillow).
+
+    ``await render_service.render(kind, fn, *args)`` queues ``fn(*args)`` to run
+    in a worker process and returns its result; ``fn`` must be a module-level
+    function and should return ``bytes`` (e.g. an encoded PNG) so results
+    cross the process boundary cheaply. The queue is bounded: when it is
+    full ``RenderBusy`` is raised at once instead of letting work pile up.
+    Workers are spawned rather than forked so they never inherit the
+    event loop or the database threads.
+    """
+
+    def __init__(self, workers: int = 2, max_queue: int = 50):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._pool = None
+        self._queue = None
+        self._dispatchers = []
+        self._stats = {}  # kind → RenderStats
+
+    def _start(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                             mp_context=multiprocessing.get_context("spawn"))
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            # One dispatcher per worker keeps every process busy without over-submitting
+            self._dispatchers = [asyncio.create_task(self._dispatch()) for _ in range(self.workers)]
+
+    def stats(self, kind: str) -> RenderStats:
+        stats = self._stats.get(kind)
+        if stats is None:
+            stats = self._stats[kind] = RenderStats()
+        return stats
+
+    @property
+    def queued(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def render(self, kind: str, fn, *args):
+        """Run ``fn(*args)`` in the pool; raises RenderBusy if the queue is full"""
+        self._start()
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((kind, fn, args, future, time.perf_counter()))
+        except asyncio.QueueFull:
+            self.stats(kind).rejected += 1
+            raise RenderBusy(f"Render queue is full ({self.max_queue} jobs)")
+        return await future
+
+    async def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            kind, fn, args, future, queued_at = await self._queue.get()
+            if future.done():
+                continue  # caller gave up while queued
+            started = time.perf_counter()
+            try:
+                result, render_time = await loop.run_in_executor(self._pool, _timed, fn, args)
+            except BrokenProcessPool as e:
+                logger.error(f"Render worker died during '{kind}', restarting pool")
+                self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+                self.stats(kind).failed += 1
+                if not future.done():
+                    future.set_exception(e)
+            except Exception as e:
+                self.stats(kind).failed += 1
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                self.stats(kind).record(started - queued_at, render_time)
+                if render_time > config.RENDER_SLOW_MS / 1000:
+                    logger.debug(f"Slow '{kind}' render: {render_time * 1000:.0f} ms")
+                if not future.done():
+                    future.set_result(result)
+
+    def metrics(self) -> dict:
+        """Return per-kind timing counters"""
+        return {kind: stats.as_dict() for kind, stats in self._stats.items()}
+
+    async def close(self):
+        for task in self._dispatchers:
+            task.cancel()
+        self._dispatchers = []
+        self._queue = None
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+render_service = RenderService(config.RENDER_WORKERS, config.RENDER_QUEUE_SIZE)
@@ -0,0 +1,188 @@
+import asyncio
+import logging
+import time
+import discord
+from cogs.utils.rank_rewards import rank_rewards
+import config
+
+logger = logging.getLogger(__name__)
+
+
+def level_role_diff(member: discord.Member, level: int):
+    """Return the member's full role list for ``level``, or None if already correct
+
+    Reward roles earned at ``level`` are added and higher ones removed; every
+    other role is kept.
+    """
+    rewards = rank_rewards.get(member.guild.id)
+    if not rewards:
+        return None
+    reward_ids = {r.role_id for r in rewards}
+    earned = {r.role_id for r in rewards if level >= r.level}
+    have = {role.id for role in member.roles if not role.is_default()}
+
+    wanted = (have - reward_ids) | {role_id for role_id in earned if member.guild.get_role(role_id)}
+    if wanted == have:
+        return None
+
+    roles = [role for role in member.roles if role.id in wanted and not role.is_default()]
+    roles.extend(member.guild.get_role(role_id) for role_id in wanted - have)
+    return roles
+
+
+async def apply_level_roles(member: discord.Member, roles, attempts: int = 3) -> bool:
+    """Replace a member's roles in one edit, backing off on leftover 429s"""
+    for attempt in range(attempts):
+        try:
+            await member.edit(roles=roles, reason="Level reward sync")
+            return True
+        except discord.Forbidden:
+            logger.warning(f"Cannot modify level roles for {member} - missing permissions")
+            return False
+        except discord.HTTPException as e:
+            if e.status != 429 or attempt == attempts - 1:
+                logger.error(f"Failed to sync level roles for {member}: {e}")
+                return False
+            # The library already retried; back off before trying again
+            await asyncio.sleep(2 ** attempt)
+    return False
+
+
+class RoleSyncJob:
+    """One queued batch of level-role updates for a guild"""
+
+    def __init__(self, guild: discord.Guild, levels: dict, message: discord.Message = None,
+                 title: str = "Level Roles Synced"):
+        self.guild = guild
+        self.levels = levels  # user_id → level
+        self.message = message
+        self.title = title
+        self.total = len(levels)
+        self.done = 0
+        self.changed = 0
+        self.skipped = 0
+        self.missing = 0  # members no longer in the guild
+        self.failed = 0
+        self.finished = asyncio.Event()
+
+    def progress_text(self) -> str:
+        return (f"Syncing level roles: {self.done:,}/{self.total:,} "
+                f"({self.changed:,} updated, {self.skipped:,} already correct, {self.missing:,} not in server, "
+                f"{self.failed:,} failed)")
+
+    def summary_embed(self) -> discord.Embed:
+        embed = discord.Embed(
+            title=self.title,
+            color=config.COLOR_SUCCESS if not self.failed else config.COLOR_WARNING
+        )
+        embed.add_field(name="Members Updated", value=str(self.changed), inline=True)
+        embed.add_field(name="Already Correct", value=str(self.skipped), inline=True)
+        if self.missing:
+            embed.add_field(name="Not in Server", value=str(self.missing), inline=True)
+        if self.failed:
+            embed.add_field(name="Errors", value=str(self.failed), inline=True)
+        return embed
+
+
+class RoleSyncQueue:
+    """Background queue that applies level roles after bulk XP changes.
+
+    Jobs run one at a time. Each member's target roles are computed in memory
+    from the cached rank rewards, members that already match are skipped, and
+    the remaining edits run on a few workers. Member edits share one
+    per-guild rate-limit bucket, so a handful of workers keeps it saturated
+    without piling up 429s; any that still happen are waited out and retried.
+    """
+
+    def __init__(self, concurrency: int = 4, progress_interval: float = 5):
+        self.concurrency = concurrency
+        self.progress_interval = progress_interval
+        self._queue = asyncio.Queue()
+        self._runner = None
+        self.current = None
+
+    def start(self):
+        if self._runner is None or self._runner.done():
+            self._runner = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._runner is not None:
+            self._runner.cancel()
+            self._runner = None
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def submit(self, guild: discord.Guild, levels: dict, message: discord.Message = None, **kwargs) -> RoleSyncJob:
+        """Queue a role sync for ``{user_id: level}``; progress is edited into ``message``"""
+        job = RoleSyncJob(guild, levels, message, **kwargs)
+        self._queue.put_nowait(job)
+        self.start()
+        return job
+
+    async def _run(self):
+        while True:
+            job = await self._queue.get()
+            self.current = job
+            try:
+                await self._process(job)
+            except Exception as e:
+                logger.error(f"Role sync for guild {job.guild.id} failed: {e}", exc_info=True)
+            finally:
+                self.current = None
+                job.finished.set()
+
+    async def _process(self, job: RoleSyncJob):
+        # Diff every member up front; only members whose roles change reach Discord
+        edits = asyncio.Queue()
+        for user_id, level in job.levels.items():
+            member = job.guild.get_member(user_id)
+            if member is None:
+                job.missing += 1
+                job.done += 1
+                continue
+            roles = level_role_diff(member, level) if not member.bot else None
+            if roles is None:
+                job.skipped += 1
+                job.done += 1
+            else:
+                edits.put_nowait((member, roles))
+
+        logger.info(f"Role sync for guild {job.guild.id}: {edits.qsize()} of {job.total} members need changes")
+        started = time.monotonic()
+        workers = [asyncio.create_task(self._worker(job, edits)) for _ in range(min(self.concurrency, edits.qsize()))]
+        reporter = asyncio.create_task(self._report(job))
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            for worker in workers:
+                worker.cancel()
+            reporter.cancel()
+
+        logger.info(f"Role sync for guild {job.guild.id} finished in {time.monotonic() - started:.1f}s "
+                    f"({job.changed} updated, {job.skipped} skipped, {job.missing} missing, {job.failed} failed)")
+        await self._edit_status(job, content=None, embed=job.summary_embed())
+
+    async def _worker(self, job: RoleSyncJob, edits: asyncio.Queue):
+        while not edits.empty():
+            member, roles = edits.get_nowait()
+            if await apply_level_roles(member, roles):
+                job.changed += 1
+            else:
+                job.failed += 1
+            job.done += 1
+
+    async def _report(self, job: RoleSyncJob):
+        while True:
+            await self._edit_status(job, content=job.progress_text(), embed=None)
+            await asyncio.sleep(self.progress_interval)
+
+    @staticmethod
+    async def _edit_status(job: RoleSyncJob, **kwargs):
+        if job.message is None:
+            return
+        try:
+            await job.message.edit(**kwargs)
+        except discord.HTTPException as e:
+            logger.debug(f"Could not update role sync status: {e}")
@@ -0,0 +1,328 @@
+import logging
+import re
+from collections import namedtuple
+import discord
+from cogs.utils.db import db
+import config
+
+logger = logging.getLogger(__name__)
+
+# Rule names reported by SpamMatcher.scan
+RULE_INVITE = "invite"
+RULE_LINK = "link"
+RULE_MASS_MENTION = "mass_mention"
+RULE_BANNED_WORD = "banned_word"
+RULE_BANNED_DOMAIN = "banned_domain"
+
+TERM_KINDS = ("word", "domain")
+
+_INVITE_RE = re.compile(config.INVITE_PATTERN)
+_LINK_RE = re.compile(config.LINK_PATTERN)
+
+# Literal prefixes where an invite, link or mass mention can start; anchors
+# are confirmed with the full config patterns at the matched position.
+# Every alternative of the combined pattern begins with a plain character so
+# the regex engine can skip straight to candidate positions.
+# Groups are named "<rule>_<n>_<m>" and open after the first character.
+_ANCHORS = [
+    f"h(?P<{RULE_LINK}_0_0>ttps?://)",
+    f"w(?P<{RULE_LINK}_1_0>ww\\.)",
+    f"d(?P<{RULE_INVITE}_0_0>iscord(?:\\.(?:gg|io|me|li)|app\\.com/invite)/)",
+    f"@(?P<{RULE_MASS_MENTION}_0_0>everyone|here)",
+]
+
+
+def normalize_domain(text: str) -> str:
+    """Reduce a URL or hostname to a bare lowercase host ("https://www.x.com/a" → "x.com")"""
+    host = text.strip().lower()
+    host = host.split("://", 1)[-1]
+    host = re.split(r"[/?#:]", host, 1)[0]
+    return host[4:] if host.startswith("www.") else host
+
+
+def _caseless(char: str) -> str:
+    upper = char.upper()
+    return f"[{re.escape(char)}{re.escape(upper)}]" if len(upper) == 1 and upper != char else re.escape(char)
+
+
+def _trie_pattern(terms) -> str:
+    """Case-insensitive regex for ``terms`` as a prefix trie, so shared prefixes are matched once"""
+    trie = {}
+    for term in terms:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[""] = {}  # end of a term
+
+    def build(node) -> str:
+        ends = "" in node
+        branches = [_caseless(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 and not ends else f"(?:{'|'.join(branches)})"
+        return f"{body}?" if ends else body
+
+    return build(trie)
+
+
+def _term_alternatives(rule: str, terms, edge: str):
+    """Case-insensitive alternatives for ``terms``, one per first character so each starts with a literal"""
+    by_first = {}
+    for term in terms:
+        by_first.setdefault(term[0], []).append(term[1:])
+    for i, (first, rests) in enumerate(sorted(by_first.items())):
+        # The start boundary is checked after the first character is consumed
+        body = f"(?<!{edge}.){_trie_pattern(rests)}(?!{edge})"
+        upper = first.upper()
+        variants = (first, upper) if len(upper) == 1 and upper != first else (first,)
+        for j, variant in enumerate(variants):
+            yield f"{re.escape(variant)}(?P<{rule}_{i}_{j}>{body})"
+
+
+class SpamMatcher:
+    """All spam patterns for one guild compiled into a single regex.
+
+    ``scan`` walks a message once with the combined pattern and reports
+    every rule it hits. Links are matched as whole URLs and then classified
+    (invite, banned domain) from the short URL text, so overlapping patterns
+    never need a second pass over the full message. Banned words and domains
+    match case-insensitively on word boundaries; a banned domain also covers
+    its subdomains.
+    """
+
+    def __init__(self, words=(), domains=()):
+        self.words = frozenset(w.lower() for w in words if w)
+        self.domains = frozenset(filter(None, (normalize_domain(d) for d in domains)))
+
+        terms = [*_term_alternatives(RULE_BANNED_DOMAIN, self.domains, "[\\w-]"),
+                 *_term_alternatives(RULE_BANNED_WORD, self.words, "\\w")]
+        self._pattern = re.compile("|".join(_ANCHORS + terms))
+        # Used when a link/invite anchor fails to confirm where a term could also start
+        self._terms = re.compile("|".join(terms)) if terms else None
+
+    def _banned_host(self, url: str) -> bool:
+        host = normalize_domain(url)
+        # Check the host and each parent domain: a.b.evil.com → b.evil.com → evil.com
+        while host:
+            if host in self.domains:
+                return True
+            host = host.partition(".")[2]
+        return False
+
+    def scan(self, content: str) -> dict:
+        """Return {rule: [matched text, ...]} for every rule the content hits"""
+        hits = {}
+        position = 0
+        search = self._pattern.search
+        while True:
+            match = search(content, position)
+            if match is None:
+                return hits
+            start = match.start()
+            rule = match.lastgroup.rsplit("_", 2)[0]
+
+            if rule == RULE_LINK or rule == RULE_INVITE:
+                confirmed = (_LINK_RE if rule == RULE_LINK else _INVITE_RE).match(content, start)
+                if confirmed is None and self._terms is not None:
+                    # Not a real link/invite, but a blocked term may start here
+                    confirmed = self._terms.match(content, start)
+                    if confirmed is not None:
+                        rule = confirmed.lastgroup.rsplit("_", 2)[0]
+                if confirmed is None:
+                    position = start + 1
+                    continue
+                match = confirmed
+
+            text = match.group()
+            hits.setdefault(rule, []).append(text)
+            if rule == RULE_LINK:
+                if _INVITE_RE.search(text):
+                    hits.setdefault(RULE_INVITE, []).append(text)
+                if self.domains and self._banned_host(text):
+                    hits.setdefault(RULE_BANNED_DOMAIN, []).append(text)
+            position = match.end()
+
+
+class SpamMatcherCache:
+    """Compiled spam matchers for every guild.
+
+    Guilds without banned words or domains share one default matcher.
+    Loaded in bulk at startup; the blocklist commands call
+    ``refresh(guild_id)`` after writing ``spam_terms``.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.default = SpamMatcher()
+        self._matchers = {}  # guild_id → SpamMatcher with that guild's terms
+
+    @staticmethod
+    def _read(conn, guild_id=None):
+        where, params = ("", ()) if guild_id is None else (" WHERE guild_id = ?", (guild_id,))
+        rows = conn.execute("SELECT guild_id, kind, term FROM spam_terms" + where, params).fetchall()
+        terms = {}
+        for r in rows:
+            terms.setdefault(r["guild_id"], {"word": [], "domain": []})[r["kind"]].append(r["term"])
+        return terms
+
+    def _store(self, guild_id: int, terms):
+        if terms and (terms["word"] or terms["domain"]):
+            self._matchers[guild_id] = SpamMatcher(terms["word"], terms["domain"])
+        else:
+            self._matchers.pop(guild_id, None)
+
+    async def load(self):
+        """Compile matchers for every guild with blocklist terms"""
+        terms = await self.db.run(self._read)
+        self._matchers = {}
+        for guild_id, guild_terms in terms.items():
+            self._store(guild_id, guild_terms)
+        logger.info(f"Compiled spam blocklists for {len(self._matchers)} guilds")
+
+    async def refresh(self, guild_id: int):
+        """Recompile one guild's matcher after its terms were written"""
+        terms = await self.db.run(self._read, guild_id)
+        self._store(guild_id, terms.get(guild_id))
+
+    def get(self, guild_id: int) -> SpamMatcher:
+        return self._matchers.get(guild_id, self.default)
+
+
+spam_matchers = SpamMatcherCache(db)
+
+
+# === PER-GUILD RULE SETS ===
+# Rule kinds, in the order they are evaluated for a message
+RULE_ORDER = ("invite", "blocklist", "image_only", "mass_mention", "no_links",
+              "cross_channel", "duplicate", "flood", "message_streak")
+ACTIONS = ("ban", "warn_ban", "delete")
+# Rules that need SpamMatcher hits; the others only look at message rates
+SCANNED_RULES = frozenset(("invite", "blocklist", "image_only", "mass_mention", "no_links"))
+# Limits used when a rule has no threshold of its own
+RULE_LIMITS = {
+    "cross_channel": config.SPAM_CROSS_CHANNEL_LIMIT,
+    "duplicate": config.SPAM_DUPLICATE_MESSAGES,
+    "flood": config.SPAM_FLOOD_MESSAGES,
+    "message_streak": config.SPAM_MESSAGE_LIMIT,
+}
+
+SpamRule = namedtuple("SpamRule", "id rule channel_id channel_prefix action threshold")
+
+# The built-in rule set, used by guilds that haven't customised theirs.
+# Rate rules (cross_channel, duplicate, flood) are opt-in through ?spamrules add.
+DEFAULT_SPAM_RULES = (
+    SpamRule(None, "invite", None, None, "ban", None),
+    SpamRule(None, "blocklist", None, None, "delete", None),
+    SpamRule(None, "image_only", None, "nsfw_", "warn_ban", None),
+    SpamRule(None, "mass_mention", None, None, "ban", None),
+    SpamRule(None, "no_links", None, "main", "warn_ban", None),
+    SpamRule(None, "message_streak", None, "main", "warn_ban", config.SPAM_MESSAGE_LIMIT),
+)
+
+ChannelRules = namedtuple("ChannelRules", "rules scan")  # scan: whether any rule needs SpamMatcher hits
+
+
+def rule_limit(rule: SpamRule):
+    return rule.threshold or RULE_LIMITS.get(rule.rule)
+
+
+def _channel_rules(rules) -> ChannelRules:
+    rules = tuple(sorted(rules, key=lambda r: RULE_ORDER.index(r.rule)))
+    return ChannelRules(rules, any(r.rule in SCANNED_RULES for r in rules))
+
+
+def _most_specific(*levels):
+    """Rules from the most specific level that covers each kind: channel, then prefix, then guild-wide"""
+    covered, chosen = set(), []
+    for rules in levels:
+        chosen += [r for r in rules if r.rule not in covered]
+        covered.update(r.rule for r in rules)
+    return chosen
+
+
+class SpamRuleTable:
+    """One guild's rules resolved per channel: evaluation is a dict lookup"""
+
+    def __init__(self, guild: discord.Guild, rules):
+        general = [r for r in rules if r.channel_id is None and r.channel_prefix is None]
+        self.default = _channel_rules(general)
+        self.channels = {}  # channel_id → ChannelRules, only for channels with scoped rules
+        for channel in guild.channels:
+            if isinstance(channel, discord.CategoryChannel):
+                continue
+            name = channel.name.lower()
+            exact = [r for r in rules if r.channel_id == channel.id]
+            prefixed = [r for r in rules if r.channel_prefix and name.startswith(r.channel_prefix)]
+            if exact or prefixed:
+                self.channels[channel.id] = _channel_rules(_most_specific(exact, prefixed, general))
+
+    def lookup(self, channel) -> ChannelRules:
+        entry = self.channels.get(channel.id)
+        if entry is None:
+            # Threads follow their parent channel's rules
+            entry = self.channels.get(getattr(channel, "parent_id", None), self.default)
+        return entry
+
+
+class SpamRuleCache:
+    """Every guild's spam rule set, compiled into per-channel decision tables.
+
+    Rows are loaded in bulk at startup; tables are built on a guild's first
+    message and dropped when its rules or channels change.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self._rules = {}   # guild_id → tuple of SpamRule (only customised guilds)
+        self._tables = {}  # guild_id → SpamRuleTable
+
+    @staticmethod
+    def _read(conn, guild_id=None):
+        where, params = ("", ()) if guild_id is None else (" WHERE guild_id = ?", (guild_id,))
+        rows = conn.execute(
+            "SELECT id, guild_id, rule, channel_id, channel_prefix, action, threshold FROM spam_rules" + where + " ORDER BY id",
+            params
+        ).fetchall()
+        rules = {}
+        for r in rows:
+            rules.setdefault(r["guild_id"], []).append(
+                SpamRule(r["id"], r["rule"], r["channel_id"], r["channel_prefix"], r["action"], r["threshold"])
+            )
+        return rules
+
+    async def load(self):
+        """Load rule sets for every customised guild"""
+        rules = await self.db.run(self._read)
+        self._rules = {guild_id: tuple(guild_rules) for guild_id, guild_rules in rules.items()}
+        self._tables = {}
+        logger.info(f"Loaded custom spam rules for {len(self._rules)} guilds")
+
+    async def refresh(self, guild_id: int):
+        """Re-read one guild's rules after they were written"""
+        rules = await self.db.run(self._read, guild_id)
+        if guild_id in rules:
+            self._rules[guild_id] = tuple(rules[guild_id])
+        else:
+            self._rules.pop(guild_id, None)
+        self.invalidate(guild_id)
+
+    def invalidate(self, guild_id: int):
+        """Drop a guild's compiled table (e.g. after its channels changed)"""
+        self._tables.pop(guild_id, None)
+
+    def is_custom(self, guild_id: int) -> bool:
+        return guild_id in self._rules
+
+    def get(self, guild_id: int) -> tuple:
+        """Return a guild's rules, or the built-in defaults"""
+        return self._rules.get(guild_id, DEFAULT_SPAM_RULES)
+
+    def for_channel(self, channel) -> ChannelRules:
+        """Return the rules that apply to a channel"""
+        table = self._tables.get(channel.guild.id)
+        if table is None:
+            table = self._tables[channel.guild.id] = SpamRuleTable(channel.guild, self.get(channel.guild.id))
+        return table.lookup(channel)
+
+
+spam_rules = SpamRuleCache(db)
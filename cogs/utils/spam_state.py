@@ -0,0 +1,142 @@
+import logging
+import sys
+import time
+from array import array
+import config
+
+logger = logging.getLogger(__name__)
+
+HISTORY_SIZE = 10  # Messages remembered per channel
+
+
+class ChannelHistory:
+    """Fixed-size ring buffer of the latest (author_id, timestamp) pairs in a channel"""
+
+    __slots__ = ("authors", "times", "head", "count")
+
+    def __init__(self, size: int = HISTORY_SIZE):
+        self.authors = array("q", bytes(8 * size))
+        self.times = array("d", bytes(8 * size))
+        self.head = 0   # next slot to write
+        self.count = 0
+
+    def append(self, author_id: int, timestamp: float):
+        self.authors[self.head] = author_id
+        self.times[self.head] = timestamp
+        self.head = (self.head + 1) % len(self.authors)
+        self.count = min(self.count + 1, len(self.authors))
+
+    @property
+    def last_seen(self) -> float:
+        return self.times[self.head - 1] if self.count else 0.0
+
+    def streak(self, author_id: int, limit: int) -> bool:
+        """Whether the latest ``limit`` messages were all sent by ``author_id``"""
+        if limit > self.count:
+            return False
+        size = len(self.authors)
+        return all(self.authors[(self.head - i) % size] == author_id for i in range(1, limit + 1))
+
+    def nbytes(self) -> int:
+        return sys.getsizeof(self) + sys.getsizeof(self.authors) + sys.getsizeof(self.times)
+
+
+class GuildSpamState:
+    """One guild's warnings and channel histories"""
+
+    __slots__ = ("warnings", "channels")
+
+    def __init__(self):
+        self.warnings = {}  # (rule, user_id) → expiry time
+        self.channels = {}  # channel_id → ChannelHistory
+
+
+class SpamState:
+    """Bounded spam filter state for every guild.
+
+    Warnings expire after ``warning_ttl`` seconds and channel histories are
+    dropped after ``history_ttl`` seconds without messages; ``sweep`` is run
+    periodically by the spam filter, and guilds with nothing left are
+    forgotten entirely.
+    """
+
+    def __init__(self, warning_ttl: float = 86400, history_ttl: float = 3600):
+        self.warning_ttl = warning_ttl
+        self.history_ttl = history_ttl
+        self._guilds = {}  # guild_id → GuildSpamState
+
+    def _guild(self, guild_id: int) -> GuildSpamState:
+        state = self._guilds.get(guild_id)
+        if state is None:
+            state = self._guilds[guild_id] = GuildSpamState()
+        return state
+
+    # === WARNINGS ===
+    def is_warned(self, guild_id: int, rule: str, user_id: int) -> bool:
+        state = self._guilds.get(guild_id)
+        if state is None:
+            return False
+        expires = state.warnings.get((rule, user_id))
+        return expires is not None and expires > time.monotonic()
+
+    def warn(self, guild_id: int, rule: str, user_id: int):
+        self._guild(guild_id).warnings[(rule, user_id)] = time.monotonic() + self.warning_ttl
+
+    def clear_warning(self, guild_id: int, rule: str, user_id: int):
+        state = self._guilds.get(guild_id)
+        if state is not None:
+            state.warnings.pop((rule, user_id), None)
+
+    # === CHANNEL HISTORY ===
+    def record(self, guild_id: int, channel_id: int, author_id: int):
+        state = self._guild(guild_id)
+        history = state.channels.get(channel_id)
+        if history is None:
+            history = state.channels[channel_id] = ChannelHistory()
+        history.append(author_id, time.monotonic())
+
+    def streak(self, guild_id: int, channel_id: int, author_id: int, limit: int) -> bool:
+        state = self._guilds.get(guild_id)
+        history = state.channels.get(channel_id) if state else None
+        return history is not None and history.streak(author_id, limit)
+
+    def forget_channel(self, guild_id: int, channel_id: int):
+        state = self._guilds.get(guild_id)
+        if state is not None:
+            state.channels.pop(channel_id, None)
+
+    def forget_guild(self, guild_id: int):
+        self._guilds.pop(guild_id, None)
+
+    # === EXPIRY ===
+    def sweep(self) -> int:
+        """Drop expired warnings, idle channels and empty guilds; returns entries removed"""
+        now = time.monotonic()
+        removed = 0
+        for guild_id, state in list(self._guilds.items()):
+            expired = [key for key, expires in state.warnings.items() if expires <= now]
+            for key in expired:
+                del state.warnings[key]
+            idle = [cid for cid, history in state.channels.items() if now - history.last_seen > self.history_ttl]
+            for channel_id in idle:
+                del state.channels[channel_id]
+            removed += len(expired) + len(idle)
+            if not state.warnings and not state.channels:
+                del self._guilds[guild_id]
+        return removed
+
+    def memory_report(self) -> dict:
+        """Entry counts and an estimate of the bytes held"""
+        warnings = sum(len(s.warnings) for s in self._guilds.values())
+        channels = sum(len(s.channels) for s in self._guilds.values())
+        size = sys.getsizeof(self._guilds)
+        for state in self._guilds.values():
+            size += sys.getsizeof(state) + sys.getsizeof(state.warnings) + sys.getsizeof(state.channels)
+            # Warning keys are (rule, user_id) tuples; rule names are interned constants
+            size += sum(sys.getsizeof(key) + sys.getsizeof(key[1]) + sys.getsizeof(exp)
+                        for key, exp in state.warnings.items())
+            size += sum(history.nbytes() for history in state.channels.values())
+        return {"guilds": len(self._guilds), "warnings": warnings, "channels": channels, "bytes": size}
+
+
+spam_state = SpamState(config.SPAM_WARNING_TTL, config.SPAM_HISTORY_TTL)
@@ -0,0 +1,105 @@
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+PLACEHOLDER_RE = re.compile(r"\{(\w+)\}")
+WELCOME_MAX_LENGTH = 4096   # embed description limit
+JOIN_DM_MAX_LENGTH = 2000   # message content limit
+
+
+def _ordinal(n: int) -> str:
+    suffix = "th" if 10 <= n % 100 <= 20 else {1: "st", 2: "nd", 3: "rd"}.get(n % 10, "th")
+    return f"{n:,}{suffix}"
+
+
+# name → (help text, member → str); aliases share the same function
+PLACEHOLDERS = {
+    "member": ("mention of the new member", lambda m: m.mention),
+    "mention": ("mention of the new member", lambda m: m.mention),
+    "user": ("username with tag", lambda m: str(m)),
+    "name": ("display name", lambda m: m.display_name),
+    "username": ("username", lambda m: m.name),
+    "id": ("user ID", lambda m: str(m.id)),
+    "guild": ("server name", lambda m: m.guild.name),
+    "server": ("server name", lambda m: m.guild.name),
+    "count": ("member count", lambda m: str(m.guild.member_count)),
+    "membercount": ("member count", lambda m: str(m.guild.member_count)),
+    "ordinal": ("member count as 1st, 2nd, ...", lambda m: _ordinal(m.guild.member_count or 0)),
+    "created": ("account age, e.g. '3 years ago'", lambda m: f"<t:{int(m.created_at.timestamp())}:R>"),
+    "avatar": ("avatar URL", lambda m: m.display_avatar.url),
+}
+
+
+class TemplateError(ValueError):
+    """Raised when a template uses unknown placeholders or is too long"""
+
+
+class CompiledTemplate:
+    """A message template split into literal text and placeholder lookups"""
+
+    def __init__(self, source: str, segments):
+        self.source = source
+        self._segments = segments  # str for literal text, callable(member) for a placeholder
+
+    def fill(self, member, max_length: int = None) -> str:
+        """Fill in the placeholders, truncating to ``max_length`` since they can expand past the source"""
+        text = "".join(part if isinstance(part, str) else part(member) for part in self._segments)
+        if max_length is not None and len(text) > max_length:
+            text = text[:max_length - 1] + "…"
+        return text
+
+
+def compile_template(source: str, strict: bool = True, max_length: int = None) -> CompiledTemplate:
+    """Parse a template once; unknown placeholders raise TemplateError, or stay as text when not ``strict``
+
+    ``max_length`` only rejects sources that are already too long; pass it to
+    ``fill`` as well, since placeholders grow when filled.
+    """
+    if max_length is not None and len(source) > max_length:
+        raise TemplateError(f"Message is too long ({len(source):,}/{max_length:,} characters).")
+
+    segments, unknown, position = [], [], 0
+    for match in PLACEHOLDER_RE.finditer(source):
+        name = match.group(1).lower()
+        field = PLACEHOLDERS.get(name)
+        if field is None:
+            unknown.append(match.group(0))
+            continue
+        if match.start() > position:
+            segments.append(source[position:match.start()])
+        segments.append(field[1])
+        position = match.end()
+    if position < len(source):
+        segments.append(source[position:])
+
+    if unknown and strict:
+        raise TemplateError(f"Unknown placeholder{'s' if len(unknown) > 1 else ''}: {', '.join(unknown)}")
+    return CompiledTemplate(source, segments)
+
+
+def placeholder_help() -> str:
+    """One-line list of placeholders for embed footers"""
+    return ", ".join(f"{{{name}}}" for name in PLACEHOLDERS)
+
+
+class TemplateCache:
+    """Compiled welcome and join-DM templates per guild.
+
+    Entries remember the source text they were compiled from, so a template
+    is recompiled only when a settings command changes it; joins just fill
+    the precomputed segments.
+    """
+
+    def __init__(self):
+        self._compiled = {}  # (guild_id, kind) → CompiledTemplate
+
+    def get(self, guild_id: int, kind: str, source: str) -> CompiledTemplate:
+        compiled = self._compiled.get((guild_id, kind))
+        if compiled is None or compiled.source != source:
+            # Stored templates predate validation, so unknown placeholders are kept as text
+            compiled = self._compiled[(guild_id, kind)] = compile_template(source, strict=False)
+        return compiled
+
+
+templates = TemplateCache()
@@ -0,0 +1,105 @@
+import logging
+from collections import OrderedDict
+from io import BytesIO
+import discord
+from PIL import Image, ImageDraw, ImageFont
+from cogs.utils.avatars import AVATAR_SIZE, avatar_image, avatars
+from cogs.utils.render import render_service
+import config
+
+logger = logging.getLogger(__name__)
+
+# Banner layout (same 934x282 canvas as the rank card)
+BANNER_SIZE = (934, 282)
+BACKGROUND = (35, 39, 42, 255)
+PANEL = (47, 47, 53, 255)
+ACCENT = (255, 0, 61, 255)
+TEXT_COLOR = (255, 255, 255, 255)
+MUTED_COLOR = (170, 170, 178, 255)
+AVATAR_POS = (51, 63)
+RING_WIDTH = 6
+TEXT_X = 250
+MAX_LAYERS = 128
+
+
+# Per-process caches: filled once in each render worker
+_layers = OrderedDict()  # (guild_id, guild_name) → static banner layer
+_fonts = {}
+_mask = None
+
+
+def _font(path: str, size: int) -> ImageFont.FreeTypeFont:
+    font = _fonts.get((path, size))
+    if font is None:
+        font = _fonts[(path, size)] = ImageFont.truetype(path, size)
+    return font
+
+
+def _avatar_mask() -> Image.Image:
+    global _mask
+    if _mask is None:
+        _mask = Image.new("L", (AVATAR_SIZE, AVATAR_SIZE), 0)
+        ImageDraw.Draw(_mask).ellipse((0, 0, AVATAR_SIZE - 1, AVATAR_SIZE - 1), fill=255)
+    return _mask
+
+
+def _static_layer(guild_id: int, guild_name: str, font_path: str) -> Image.Image:
+    """Background, accent, avatar ring and guild heading; everything that is the same for every join"""
+    key = (guild_id, guild_name)
+    layer = _layers.get(key)
+    if layer is not None:
+        _layers.move_to_end(key)
+        return layer
+
+    layer = Image.new("RGBA", BANNER_SIZE, BACKGROUND)
+    draw = ImageDraw.Draw(layer)
+    width, height = BANNER_SIZE
+    draw.rounded_rectangle((20, 20, width - 20, height - 20), radius=24, fill=PANEL)
+    draw.rectangle((20, height - 32, width - 20, height - 20), fill=ACCENT)
+    x, y = AVATAR_POS
+    draw.ellipse((x - RING_WIDTH, y - RING_WIDTH, x + AVATAR_SIZE + RING_WIDTH, y + AVATAR_SIZE + RING_WIDTH), fill=ACCENT)
+    draw.ellipse((x, y, x + AVATAR_SIZE, y + AVATAR_SIZE), fill=BACKGROUND)
+    draw.text((TEXT_X, 52), "WELCOME TO", font=_font(font_path, 26), fill=MUTED_COLOR)
+    draw.text((TEXT_X, 82), guild_name[:28], font=_font(font_path, 44), fill=TEXT_COLOR)
+
+    _layers[key] = layer
+    while len(_layers) > MAX_LAYERS:
+        _layers.popitem(last=False)
+    return layer
+
+
+def draw_welcome_banner(guild_id: int, guild_name: str, font_path: str, avatar, name: str, count: int) -> bytes:
+    """Render a banner to PNG bytes (render worker); only the avatar, name and count are drawn per join"""
+    banner = _static_layer(guild_id, guild_name, font_path).copy()
+    if avatar is not None:
+        banner.paste(avatar_image(avatar), AVATAR_POS, _avatar_mask())
+
+    draw = ImageDraw.Draw(banner)
+    draw.text((TEXT_X, 150), name[:24], font=_font(font_path, 36), fill=TEXT_COLOR)
+    draw.text((TEXT_X, 198), f"Member #{count:,}", font=_font(font_path, 26), fill=MUTED_COLOR)
+
+    buffer = BytesIO()
+    banner.save(buffer, format="PNG", compress_level=1)
+    return buffer.getvalue()
+
+
+class WelcomeBannerRenderer:
+    """Draws generated welcome banners on the render service.
+
+    The guild's static layer is drawn once per worker process and reused,
+    so each join only pastes an avatar and draws two lines of text.
+    """
+
+    def __init__(self, font_path: str):
+        self.font_path = font_path
+
+    async def render(self, member: discord.Member) -> bytes:
+        """Render a member's banner as PNG bytes; raises RenderBusy when the render queue is full"""
+        avatar = await avatars.get(member)
+        return await render_service.render(
+            "welcome_banner", draw_welcome_banner, member.guild.id, member.guild.name, self.font_path,
+            avatar, member.display_name, member.guild.member_count or 0
+        )
+
+
+welcome_banners = WelcomeBannerRenderer(config.WELCOME_BANNER_FONT)
@@ -0,0 +1,163 @@
+import asyncio
+import logging
+import time
+from collections import deque
+import discord
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Allows ``rate`` acquisitions per second with bursts of up to ``capacity``"""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        # The lock queues waiters so tokens are handed out first come, first served
+        async with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+
+
+class WelcomeDispatcher:
+    """Queues outgoing welcome messages so join waves can't flood Discord.
+
+    Channel welcomes go through one sender per channel: whatever queued up
+    while the previous message was being sent goes out as a single batched
+    message, and while a guild is in a join burst the sender waits
+    ``WELCOME_BATCH_DELAY`` to let the batch fill. DMs are sent by a small
+    worker pool sharing a token bucket; when the DM queue is full new DMs
+    are dropped, since a late welcome DM is worth less than staying under
+    the global rate limit.
+
+    Messages are passed as zero-argument callables returning ``send()``
+    kwargs, so attachments are only built when the message is actually sent.
+    """
+
+    def __init__(self, dm_workers: int = 2, dm_rate: float = 1.0, dm_burst: int = 5, max_dm_queue: int = 1000):
+        self.dm_workers = dm_workers
+        self.max_dm_queue = max_dm_queue
+        self._bucket = TokenBucket(dm_rate, dm_burst)
+        self._joins = {}    # guild_id → times of the latest joins (WELCOME_BURST_JOINS of them)
+        self._pending = {}  # channel_id → (channel, [(member, make_kwargs)], make_batch)
+        self._senders = {}  # channel_id → sender task
+        self._dm_queue = None
+        self._workers = []
+        self.dropped_dms = 0
+
+    # === JOIN BURSTS ===
+    def record_join(self, guild_id: int) -> bool:
+        """Record a join and tell whether the guild is joining faster than the burst threshold"""
+        now = time.monotonic()
+        joins = self._joins.get(guild_id)
+        if joins is None:
+            joins = self._joins[guild_id] = deque(maxlen=config.WELCOME_BURST_JOINS)
+        joins.append(now)
+        return self.in_burst(guild_id)
+
+    def in_burst(self, guild_id: int) -> bool:
+        joins = self._joins.get(guild_id)
+        if not joins or len(joins) < joins.maxlen:
+            return False
+        # The oldest of the last N joins is recent enough, and joins are still arriving
+        now = time.monotonic()
+        return joins[-1] - joins[0] <= config.WELCOME_BURST_WINDOW and now - joins[-1] <= config.WELCOME_BURST_WINDOW
+
+    # === CHANNEL WELCOMES ===
+    def send_channel(self, channel, member, make_kwargs, make_batch):
+        """Queue a channel welcome; ``make_batch(guild, members)`` builds the kwargs for a combined one"""
+        pending = self._pending.get(channel.id)
+        if pending is None:
+            pending = self._pending[channel.id] = (channel, [], make_batch)
+        pending[1].append((member, make_kwargs))
+        if channel.id not in self._senders:
+            self._senders[channel.id] = asyncio.create_task(self._drain_channel(channel.id))
+
+    async def _drain_channel(self, channel_id: int):
+        try:
+            while True:
+                pending = self._pending.get(channel_id)
+                if pending is None:
+                    return
+                if self.in_burst(pending[0].guild.id):
+                    await asyncio.sleep(config.WELCOME_BATCH_DELAY)
+                channel, items, make_batch = self._pending.pop(channel_id)
+
+                if len(items) == 1:
+                    kwargs = items[0][1]()
+                else:
+                    kwargs = make_batch(channel.guild, [member for member, _ in items])
+                try:
+                    await channel.send(**kwargs)
+                except discord.Forbidden:
+                    logger.warning(f"Cannot send welcome to {channel.id} - missing permissions")
+                except discord.HTTPException as e:
+                    logger.error(f"Failed to send welcome message: {e}")
+        except Exception as e:
+            logger.error(f"Welcome sender for channel {channel_id} failed: {e}", exc_info=True)
+            self._pending.pop(channel_id, None)
+        finally:
+            self._senders.pop(channel_id, None)
+
+    # === DIRECT MESSAGES ===
+    def _start(self):
+        if self._dm_queue is None:
+            self._dm_queue = asyncio.Queue(maxsize=self.max_dm_queue)
+            self._workers = [asyncio.create_task(self._dm_worker()) for _ in range(self.dm_workers)]
+
+    def send_dm(self, member, make_kwargs, on_forbidden=None):
+        """Queue a welcome DM; ``on_forbidden(member)`` is awaited if the member's DMs are closed"""
+        self._start()
+        try:
+            self._dm_queue.put_nowait((member, make_kwargs, on_forbidden))
+        except asyncio.QueueFull:
+            self.dropped_dms += 1
+            logger.warning(f"Welcome DM queue full, dropping DM to {member.id}")
+
+    async def _dm_worker(self):
+        while True:
+            member, make_kwargs, on_forbidden = await self._dm_queue.get()
+            await self._bucket.acquire()
+            try:
+                await member.send(**make_kwargs())
+            except discord.Forbidden:
+                logger.debug(f"Cannot DM {member.id} - DMs are closed")
+                if on_forbidden is not None:
+                    try:
+                        await on_forbidden(member)
+                    except Exception as e:
+                        logger.error(f"DM failure handler failed for {member.id}: {e}")
+            except discord.HTTPException as e:
+                logger.error(f"Failed to send welcome DM to {member.id}: {e}")
+            except Exception as e:
+                logger.error(f"Welcome DM worker error: {e}", exc_info=True)
+
+    @property
+    def queued_dms(self) -> int:
+        return self._dm_queue.qsize() if self._dm_queue is not None else 0
+
+    def stop(self):
+        for task in [*self._workers, *self._senders.values()]:
+            task.cancel()
+        self._workers = []
+        self._senders = {}
+        self._pending = {}
+        self._dm_queue = None
+
+
+welcome_dispatcher = WelcomeDispatcher(config.WELCOME_DM_WORKERS, config.WELCOME_DM_RATE,
+                                       config.WELCOME_DM_BURST, config.WELCOME_DM_QUEUE_SIZE)
@@ -0,0 +1,248 @@
+import asyncio
+import logging
+import math
+import config
+
+logger = logging.getLogger(__name__)
+
+
+def calc_level(exp: int) -> int:
+    """Calculate level from experience"""
+    return int((math.sqrt(1 + 8 * exp / config.LEVEL_DIVISOR) - 1) / 2)
+
+
+def calc_exp_for_level(level: int) -> int:
+    """Calculate required XP for a level"""
+    return int(config.LEVEL_DIVISOR * level * (level + 1) / 2)
+
+
+# === SET-BASED BULK UPDATES ===
+# (exp, level) SQL expressions over a member's current ``old_exp``/``old_level``
+BULK_ADD_XP = ("old_exp + :amount", "calc_level(old_exp + :amount)")
+BULK_SET_XP = (":amount", "calc_level(:amount)")
+BULK_ADD_LEVELS = ("calc_exp_for_level(old_level + :levels)", "old_level + :levels")
+
+
+def bulk_apply(conn, guild_id: int, user_ids, operation, params=None) -> dict:
+    """Apply one XP operation to many members of a guild with a few statements
+
+    Member IDs are staged in a temp table, every row is rewritten by a
+    single upsert, and ``{user_id: (old_level, new_level)}`` is returned.
+    ``operation`` is one of the ``BULK_*`` expression pairs and ``params``
+    supplies its named parameters. Runs on a
+    ``Database.run`` connection, where the level functions are registered.
+    """
+    exp_sql, level_sql = operation
+    params = {**(params or {}), "guild_id": guild_id}
+    conn.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS bulk_members (
+            user_id INTEGER PRIMARY KEY,
+            old_exp INTEGER NOT NULL DEFAULT 0,
+            old_level INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    conn.execute("DELETE FROM temp.bulk_members")
+    try:
+        conn.executemany("INSERT OR IGNORE INTO temp.bulk_members (user_id) VALUES (?)",
+                         ((user_id,) for user_id in user_ids))
+        conn.execute("""
+            UPDATE temp.bulk_members SET (old_exp, old_level) = (
+                SELECT IFNULL(MAX(exp), 0), IFNULL(MAX(level), 0) FROM glevel
+                WHERE guild_id = :guild_id AND user_id = bulk_members.user_id
+            )
+        """, params)
+        conn.execute(f"""
+            INSERT INTO glevel (guild_id, user_id, exp, level)
+            SELECT :guild_id, user_id, {exp_sql}, {level_sql} FROM temp.bulk_members WHERE true
+            ON CONFLICT(guild_id, user_id) DO UPDATE SET exp = excluded.exp, level = excluded.level
+        """, params)
+        rows = conn.execute("""
+            SELECT b.user_id, b.old_level, g.level FROM temp.bulk_members b
+            JOIN glevel g ON g.guild_id = :guild_id AND g.user_id = b.user_id
+        """, params).fetchall()
+    finally:
+        conn.execute("DELETE FROM temp.bulk_members")
+    return {user_id: (old, new) for user_id, old, new in rows}
+
+
+class XPBuffer:
+    """Write-behind accumulator for member XP.
+
+    Increments are applied to an in-memory copy of each member's row right
+    away (so level-ups are detected immediately) and written back to
+    ``glevel`` in one batch by ``flush()``.
+    """
+
+    def __init__(self, db, max_entries: int = 50000, ranking=None):
+        self.db = db
+        self.max_entries = max_entries
+        self.ranking = ranking  # optional LeaderboardIndex kept in step with every award
+        self._entries = {}   # (guild_id, user_id) → [exp, level]
+        self._dirty = set()
+        self._flush_lock = asyncio.Lock()
+        self._held = {}      # guild_id → Event set when that guild's write_through finishes
+        self._writes = 0     # write_through calls started, to spot rows loaded across one
+
+    @staticmethod
+    def _load(conn, guild_id: int, user_id: int):
+        row = conn.execute("SELECT exp, level FROM glevel WHERE guild_id = ? AND user_id = ?",
+                           (guild_id, user_id)).fetchone()
+        if not row:
+            return [0, 0]
+        return [row["exp"], row["level"]]
+
+    async def _wait_for_write(self, guild_id: int):
+        while (held := self._held.get(guild_id)) is not None:
+            await held.wait()
+
+    async def get(self, guild_id: int, user_id: int):
+        """Return the buffered [exp, level] entry, loading it on first use
+
+        Waits while a write_through covers the guild, so awards always land
+        on rows that include its result.
+        """
+        key = (guild_id, user_id)
+        while True:
+            await self._wait_for_write(guild_id)
+            entry = self._entries.get(key)
+            if entry is not None:
+                return entry
+            writes = self._writes
+            loaded = await self.db.run(self._load, guild_id, user_id)
+            if self._writes == writes:
+                # Another caller may have loaded the row while we were waiting
+                return self._entries.setdefault(key, loaded)
+
+    @staticmethod
+    def _load_many(conn, guild_id: int, user_ids):
+        found = {}
+        for i in range(0, len(user_ids), 500):
+            chunk = user_ids[i:i + 500]
+            rows = conn.execute(
+                f"SELECT user_id, exp, level FROM glevel WHERE guild_id = ? AND user_id IN ({','.join('?' * len(chunk))})",
+                (guild_id, *chunk)
+            ).fetchall()
+            found.update({r["user_id"]: [r["exp"], r["level"]] for r in rows})
+        return {uid: found.get(uid, [0, 0]) for uid in user_ids}
+
+    async def add_many(self, guild_id: int, awards: dict) -> dict:
+        """Add XP to several members of one guild, loading any missing rows in one query
+
+        ``awards`` maps user_id → xp; returns user_id → (old_level, new_level).
+        """
+        while True:
+            await self._wait_for_write(guild_id)
+            missing = [uid for uid in awards if (guild_id, uid) not in self._entries]
+            if not missing:
+                break
+            writes = self._writes
+            loaded = await self.db.run(self._load_many, guild_id, missing)
+            if self._writes == writes:
+                for uid, entry in loaded.items():
+                    self._entries.setdefault((guild_id, uid), entry)
+                break
+
+        results = {}
+        for uid, xp in awards.items():
+            entry = self._entries[(guild_id, uid)]
+            old_level = entry[1]
+            entry[0] += xp
+            entry[1] = calc_level(entry[0])
+            self._dirty.add((guild_id, uid))
+            results[uid] = (old_level, entry[1])
+            if self.ranking is not None:
+                self.ranking.update(guild_id, uid, entry[0])
+        return results
+
+    async def add(self, guild_id: int, user_id: int, xp: int):
+        """Add XP and return (old_level, new_level)"""
+        entry = await self.get(guild_id, user_id)
+        old_level = entry[1]
+        entry[0] += xp
+        entry[1] = calc_level(entry[0])
+        self._dirty.add((guild_id, user_id))
+        if self.ranking is not None:
+            self.ranking.update(guild_id, user_id, entry[0])
+        return old_level, entry[1]
+
+    def invalidate(self, guild_id: int, user_ids=None):
+        """Drop buffered rows so they are re-read after an external write"""
+        if user_ids is None:
+            keys = [k for k in self._entries if k[0] == guild_id]
+        else:
+            keys = [(guild_id, uid) for uid in user_ids]
+        for key in keys:
+            self._entries.pop(key, None)
+            self._dirty.discard(key)
+        if self.ranking is not None:
+            self.ranking.invalidate(guild_id)
+
+    @staticmethod
+    def _write(conn, rows, also=None):
+        if rows:
+            conn.executemany("""
+                INSERT INTO glevel (guild_id, user_id, exp, level) VALUES (?, ?, ?, ?)
+                ON CONFLICT(guild_id, user_id) DO UPDATE SET exp = excluded.exp, level = excluded.level
+            """, rows)
+        if also is not None:
+            also(conn)
+
+    async def flush(self, also=None) -> int:
+        """Write every dirty row in a single transaction, returning the row count
+
+        ``also`` is an optional ``fn(conn)`` run in the same transaction, for
+        state that must be committed atomically with the XP it accounts for.
+        """
+        async with self._flush_lock:
+            if not self._dirty and also is None:
+                return 0
+            keys, self._dirty = self._dirty, set()
+            rows = [(*k, *self._entries[k]) for k in keys if k in self._entries]
+            try:
+                await self.db.run(self._write, rows, also)
+            except Exception:
+                # Keep the rows so the next flush retries them
+                self._dirty |= {k for k in keys if k in self._entries}
+                raise
+            if rows:
+                logger.debug(f"Flushed {len(rows)} XP rows")
+            self._evict()
+            return len(rows)
+
+    async def write_through(self, guild_id: int, user_ids, fn, *args):
+        """Run ``fn(conn, *args)`` against glevel with the buffer held still
+
+        Dirty rows are written in the same transaction as ``fn``, and the
+        affected members are evicted before the flush lock is released, so
+        a periodic flush can't write a stale buffered total over ``fn``'s
+        result. Awards in the guild wait until then. Returns what ``fn``
+        returns.
+        """
+        async with self._flush_lock:
+            held = self._held[guild_id] = asyncio.Event()
+            self._writes += 1
+            keys, self._dirty = self._dirty, set()
+            rows = [(*k, *self._entries[k]) for k in keys if k in self._entries]
+
+            def apply(conn):
+                self._write(conn, rows)
+                return fn(conn, *args)
+
+            try:
+                try:
+                    result = await self.db.run(apply)
+                except Exception:
+                    self._dirty |= {k for k in keys if k in self._entries}
+                    raise
+                self.invalidate(guild_id, user_ids)
+            finally:
+                del self._held[guild_id]
+                held.set()
+            return result
+
+    def _evict(self):
+        # Clean rows can always be re-read, so drop them once the buffer grows too large
+        if len(self._entries) <= self.max_entries:
+            return
+        for key in [k for k in self._entries if k not in self._dirty]:
+            del self._entries[key]
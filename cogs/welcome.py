@@ -1,101 +1,141 @@
 import discord
 from discord.ext import commands
-import sqlite3
 import logging
+from io import BytesIO
+from cogs.utils.db import db
+from cogs.utils.guild_config import guild_configs
+from cogs.utils.raid import raid_monitor
+from cogs.utils.render import RenderBusy
+from cogs.utils.templates import (templates, compile_template, placeholder_help, TemplateError, WELCOME_MAX_LENGTH,
+                                  JOIN_DM_MAX_LENGTH)
+from cogs.utils.welcome_banner import welcome_banners
+from cogs.utils.welcome_dispatch import welcome_dispatcher
 import config
 
 logger = logging.getLogger(__name__)
 
-DB_PATH = config.DB_PATH
-
 class Welcome(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.create_table()
-
-    def create_table(self):
-        conn = sqlite3.connect(DB_PATH)
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS welcome (
-                guild_id INTEGER PRIMARY KEY,
-                channel_id INTEGER,
-                dm_enabled INTEGER DEFAULT 0,
-                channel_enabled INTEGER DEFAULT 1,
-                message TEXT DEFAULT 'Welcome {member} to {guild}!',
-                embed_color INTEGER DEFAULT 16761035,
-                image_url TEXT,
-                enabled INTEGER DEFAULT 1
-            )
-        """)
-        conn.commit()
-        conn.close()
+
+    async def cog_unload(self):
+        welcome_dispatcher.stop()
+
+    # === BATCHED WELCOME ===
+    @staticmethod
+    def build_batch(guild, members, color):
+        """Send kwargs greeting several members in one message"""
+        shown = members[:config.WELCOME_BATCH_MAX_MENTIONS]
+        names = ", ".join(m.mention for m in shown)
+        if len(members) > len(shown):
+            names += f" and **{len(members) - len(shown):,}** more"
+        embed = discord.Embed(
+            title=f"Welcome to {guild.name}!",
+            description=f"Please welcome our {len(members):,} newest members:\n{names}",
+            color=color or 0xff003d
+        )
+        embed.set_footer(text=f"Member #{guild.member_count}")
+        return {"embed": embed}
+
+    # === WELCOME ===
+    def build_embed(self, member, row):
+        message = templates.get(member.guild.id, "welcome", row["message"]).fill(member, WELCOME_MAX_LENGTH)
+
+        embed = discord.Embed(description=message, color=row["embed_color"] or 0xff003d)
+        embed.set_author(name=f"Welcome {member}!", icon_url=member.display_avatar.url)
+        embed.set_footer(text=f"Member #{member.guild.member_count}")
+        if row["image_url"]:
+            embed.set_image(url=row["image_url"])
+        return embed
+
+    async def render_banner(self, member):
+        """Return the member's banner PNG, or None to fall back to the plain embed"""
+        try:
+            return await welcome_banners.render(member)
+        except RenderBusy:
+            logger.debug(f"Render queue full, welcoming {member.id} without a banner")
+        except Exception as e:
+            logger.error(f"Failed to render welcome banner for {member.id}: {e}")
+        return None
+
+    @staticmethod
+    def with_banner(embed, banner):
+        """Return send() kwargs for the embed, attaching the banner if there is one"""
+        if banner is None:
+            return {"embed": embed}
+        embed.set_image(url="attachment://welcome.png")
+        return {"embed": embed, "file": discord.File(BytesIO(banner), filename="welcome.png")}
 
     @commands.Cog.listener()
     async def on_member_join(self, member):
         if member.bot:
             return
 
-        conn = sqlite3.connect(DB_PATH)
-        row = conn.execute(
-            "SELECT channel_id, dm_enabled, channel_enabled, message, embed_color, image_url, enabled FROM welcome WHERE guild_id = ?",
-            (member.guild.id,)
-        ).fetchone()
-        conn.close()
+        # Raiders get no join DM or welcome; the raid summary counts them instead
+        if raid_monitor.record_join(member):
+            raid_monitor.suppress_welcome(member.guild.id)
+            return
+
+        cfg = guild_configs.get(member.guild.id)
+        if cfg["join_dm_enabled"] and cfg["join_dm_message"]:
+            join_dm = templates.get(member.guild.id, "join_dm", cfg["join_dm_message"])
+            welcome_dispatcher.send_dm(member, lambda: {"content": join_dm.fill(member, JOIN_DM_MAX_LENGTH)})
+
+        row = guild_configs.welcome(member.guild.id)
 
-        if not row or not row[6]:  # enabled == 0
+        if not row or not row["enabled"]:
             return
 
-        channel_id, dm_on, chan_on, raw_msg, color, image_url, _ = row
+        channel_id = row["channel_id"]
+        dm_on, chan_on = row["dm_enabled"], row["channel_enabled"]
         channel = member.guild.get_channel(channel_id) if channel_id else None
+        chan_on = chan_on and channel is not None
+        if not chan_on and not dm_on:
+            return
 
-        # Replace placeholders
-        message = raw_msg.replace("{member}", member.mention) \
-                         .replace("{user}", str(member)) \
-                         .replace("{guild}", member.guild.name) \
-                         .replace("{count}", str(member.guild.member_count))
+        # Banners are skipped during join bursts, when welcomes are batched anyway
+        burst = welcome_dispatcher.record_join(member.guild.id)
+        banner = None
+        if row["banner_enabled"] and not burst:
+            banner = await self.render_banner(member)
 
-        embed = discord.Embed(description=message, color=color or 0xff003d)
-        embed.set_author(name=f"Welcome {member}!", icon_url=member.display_avatar.url)
-        embed.set_footer(text=f"Member #{member.guild.member_count}")
-        if image_url:
-            embed.set_image(url=image_url)
+        def make_kwargs():
+            return self.with_banner(self.build_embed(member, row), banner)
 
         # === SEND TO CHANNEL ===
-        if chan_on and channel:
-            try:
-                await channel.send(embed=embed)
-            except discord.Forbidden:
-                logger.warning(f"Cannot send welcome to {channel.id} - missing permissions")
-            except discord.HTTPException as e:
-                logger.error(f"Failed to send welcome message: {e}")
+        if chan_on:
+            welcome_dispatcher.send_channel(
+                channel, member, make_kwargs,
+                lambda guild, members: self.build_batch(guild, members, row["embed_color"])
+            )
 
         # === SEND TO DM ===
         if dm_on:
-            try:
-                await member.send(embed=embed)
-            except discord.Forbidden:
-                logger.debug(f"Cannot DM {member.id} - DMs are closed")
-                # Optional: notify in channel that DM failed
-                if chan_on and channel:
-                    try:
-                        await channel.send(f"{member.mention} I tried to DM you a welcome, but your privacy settings block it!")
-                    except discord.HTTPException as e:
-                        logger.error(f"Failed to notify about DM failure: {e}")
+            async def notify_closed_dms(member):
+                # Optional: notify in channel that DM failed (skipped during bursts)
+                if chan_on and not welcome_dispatcher.in_burst(member.guild.id):
+                    await channel.send(f"{member.mention} I tried to DM you a welcome, but your privacy settings block it!")
+
+            welcome_dispatcher.send_dm(member, make_kwargs, notify_closed_dms)
 
     # === SET WELCOME CHANNEL ===
     @commands.command(name="setwelcome")
     @commands.has_permissions(manage_guild=True)
     async def set_channel(self, ctx, channel: discord.TextChannel = None):
         channel = channel or ctx.channel
-        conn = sqlite3.connect(DB_PATH)
-        conn.execute(
-            "INSERT OR REPLACE INTO welcome (guild_id, channel_id, channel_enabled) VALUES (?, ?, 1)",
-            (ctx.guild.id, channel.id)
-        )
-        conn.commit()
-        conn.close()
+        await db.execute("""
+            INSERT INTO welcome (guild_id, channel_id, channel_enabled) VALUES (?, ?, 1)
+            ON CONFLICT(guild_id) DO UPDATE SET channel_id = excluded.channel_id, channel_enabled = 1
+        """, (ctx.guild.id, channel.id))
+        await guild_configs.refresh(ctx.guild.id)
         await ctx.send(f"Welcome channel set to {channel.mention}")
 
+        row = guild_configs.welcome(ctx.guild.id)
+        try:
+            compile_template(row["message"], max_length=WELCOME_MAX_LENGTH)
+        except TemplateError as e:
+            await ctx.send(f"Heads up, the current welcome message has a problem: {e}\nFix it with `?welcomemsg`.")
+
     # === TOGGLE DM / CHANNEL / BOTH ===
     @commands.command(name="welcomemode")
     @commands.has_permissions(manage_guild=True)
@@ -104,16 +144,15 @@ class Welcome(commands.Cog):
         if mode not in ["dm", "channel", "both"]:
             return await ctx.send("Usage: `?welcomemode dm` | `channel` | `both`")
 
-        conn = sqlite3.connect(DB_PATH)
         dm = 1 if mode in ["dm", "both"] else 0
         chan = 1 if mode in ["channel", "both"] else 0
 
-        conn.execute(
-            "INSERT OR REPLACE INTO welcome (guild_id, dm_enabled, channel_enabled) VALUES (?, ?, ?)",
-            (ctx.guild.id, dm, chan)
-        )
-        conn.commit()
-        conn.close()
+        await db.execute("""
+            INSERT INTO welcome (guild_id, dm_enabled, channel_enabled) VALUES (?, ?, ?)
+            ON CONFLICT(guild_id) DO UPDATE SET dm_enabled = excluded.dm_enabled,
+                                                channel_enabled = excluded.channel_enabled
+        """, (ctx.guild.id, dm, chan))
+        await guild_configs.refresh(ctx.guild.id)
 
         status = "DMs only" if mode == "dm" else "Channel only" if mode == "channel" else "Both DM + Channel"
         await ctx.send(f"Welcome delivery mode: **{status}**")
@@ -122,26 +161,25 @@ class Welcome(commands.Cog):
     @commands.command(name="welcomemsg")
     @commands.has_permissions(manage_guild=True)
     async def set_message(self, ctx, *, text: str):
-        conn = sqlite3.connect(DB_PATH)
-        conn.execute(
+        try:
+            template = compile_template(text, max_length=WELCOME_MAX_LENGTH)
+        except TemplateError as e:
+            return await ctx.send(f"{e}\nAvailable placeholders: {placeholder_help()}")
+
+        updated = await db.execute(
             "UPDATE welcome SET message = ? WHERE guild_id = ?",
             (text, ctx.guild.id)
         )
-        if conn.rowcount == 0:
-            conn.execute(
+        if updated == 0:
+            await db.execute(
                 "INSERT INTO welcome (guild_id, message, enabled) VALUES (?, ?, 1)",
                 (ctx.guild.id, text)
             )
-        conn.commit()
-        conn.close()
 
-        preview = text.replace("{member}", ctx.author.mention) \
-                     .replace("{user}", str(ctx.author)) \
-                     .replace("{guild}", ctx.guild.name) \
-                     .replace("{count}", "1234")
+        await guild_configs.refresh(ctx.guild.id)
 
-        embed = discord.Embed(title="Welcome message updated!", description=preview, color=0xff003d)
-        embed.set_footer(text="Placeholders: {member}, {user}, {guild}, {count}")
+        embed = discord.Embed(title="Welcome message updated!", description=template.fill(ctx.author, WELCOME_MAX_LENGTH), color=0xff003d)
+        embed.set_footer(text=f"Placeholders: {placeholder_help()}")
         await ctx.send(embed=embed)
 
     # === SET IMAGE ===
@@ -153,20 +191,41 @@ class Welcome(commands.Cog):
 
         url = ctx.message.attachments[0].url if ctx.message.attachments else ctx.message.content.split()[1]
 
-        conn = sqlite3.connect(DB_PATH)
-        conn.execute(
+        updated = await db.execute(
             "UPDATE welcome SET image_url = ? WHERE guild_id = ?",
             (url, ctx.guild.id)
         )
-        if conn.rowcount == 0:
-            conn.execute("INSERT INTO welcome (guild_id, image_url) VALUES (?, ?)", (ctx.guild.id, url))
-        conn.commit()
-        conn.close()
+        if updated == 0:
+            await db.execute("INSERT INTO welcome (guild_id, image_url) VALUES (?, ?)", (ctx.guild.id, url))
+
+        await guild_configs.refresh(ctx.guild.id)
 
         embed = discord.Embed(title="Welcome image updated!", color=0xff003d)
         embed.set_image(url=url)
         await ctx.send(embed=embed)
 
+    # === GENERATED BANNER ===
+    @commands.command(name="welcomebanner")
+    @commands.has_permissions(manage_guild=True)
+    async def set_banner(self, ctx, state: str = None):
+        """Attach a generated banner (avatar, name, member count) to welcomes"""
+        if not state or state.lower() not in ["on", "off"]:
+            return await ctx.send("Usage: `?welcomebanner on` | `off`")
+
+        enabled = 1 if state.lower() == "on" else 0
+        await db.execute("""
+            INSERT INTO welcome (guild_id, banner_enabled) VALUES (?, ?)
+            ON CONFLICT(guild_id) DO UPDATE SET banner_enabled = excluded.banner_enabled
+        """, (ctx.guild.id, enabled))
+        await guild_configs.refresh(ctx.guild.id)
+
+        if not enabled:
+            return await ctx.send("Welcome banners disabled.")
+        banner = await self.render_banner(ctx.author)
+        embed = discord.Embed(title="Welcome banners enabled!", color=0xff003d)
+        embed.set_footer(text="Replaces the welcome image; skipped while members join in bursts")
+        await ctx.send(**self.with_banner(embed, banner))
+
     # === MASTER TOGGLE ===
     @commands.command(name="welcome")
     @commands.has_permissions(manage_guild=True)
@@ -174,16 +233,17 @@ class Welcome(commands.Cog):
         if state and state.lower() not in ["on", "off"]:
             return await ctx.send("Usage: `?welcome on` | `off`")
 
-        conn = sqlite3.connect(DB_PATH)
         if state:
             enabled = 1 if state.lower() == "on" else 0
-            conn.execute("INSERT OR REPLACE INTO welcome (guild_id, enabled) VALUES (?, ?)", (ctx.guild.id, enabled))
+            await db.execute("""
+                INSERT INTO welcome (guild_id, enabled) VALUES (?, ?)
+                ON CONFLICT(guild_id) DO UPDATE SET enabled = excluded.enabled
+            """, (ctx.guild.id, enabled))
+            await guild_configs.refresh(ctx.guild.id)
             status = "enabled" if enabled else "disabled"
         else:
-            row = conn.execute("SELECT enabled FROM welcome WHERE guild_id = ?", (ctx.guild.id,)).fetchone()
-            status = "currently ON" if row and row[0] else "currently OFF"
-        conn.commit()
-        conn.close()
+            row = guild_configs.welcome(ctx.guild.id)
+            status = "currently ON" if row and row["enabled"] else "currently OFF"
         await ctx.send(f"Welcome system {status}")
 
 async def setup(bot):
@@ -18,10 +18,49 @@ VOICE_XP_MAX = 30
 # Voice XP award interval (seconds)
 VOICE_XP_INTERVAL = 60
 
+# Buffered XP is written to the database every this many seconds
+XP_FLUSH_INTERVAL = 5
+
+# Maximum members kept in the in-memory XP buffer before clean rows are evicted
+XP_BUFFER_MAX_ENTRIES = 50000
+
+# Guilds whose XP ranking is kept in memory for rank/leaderboard lookups
+LEADERBOARD_CACHE_GUILDS = 50
+
+# Rank card images (?rankcard)
+RANK_CARD_TEMPLATE = "Leveling/rank.png"
+RANK_CARD_FONT = "Leveling/Quotable.otf"
+
+# Image rendering process pool (rank cards, welcome banners, ban images)
+RENDER_WORKERS = 2         # Worker processes
+RENDER_QUEUE_SIZE = 50     # Queued renders before new ones are rejected
+RENDER_SLOW_MS = 200       # Renders slower than this are logged at debug level
+BAN_IMAGE_MAX_SIZE = 1024  # Uploaded ban images are shrunk to fit this many pixels
+AVATAR_CACHE_SIZE = 256    # Resized avatars kept in memory for cards and banners
+
+# Background level-role sync after bulk XP changes
+ROLE_SYNC_CONCURRENCY = 4          # Member edits in flight at once
+ROLE_SYNC_PROGRESS_INTERVAL = 5    # Seconds between status message updates
+
 # Level calculation formula parameters
 # Formula: level = int((sqrt(1 + 8 * exp / LEVEL_DIVISOR) - 1) / 2)
 LEVEL_DIVISOR = 50
 
+# ===== WELCOME =====
+WELCOME_BANNER_FONT = "Leveling/Quotable.otf"
+# Welcomes queued while a channel is busy are sent as one message; during a burst
+# (WELCOME_BURST_JOINS joins within WELCOME_BURST_WINDOW seconds) the channel waits
+# WELCOME_BATCH_DELAY seconds between messages so batches fill up
+WELCOME_BURST_JOINS = 5
+WELCOME_BURST_WINDOW = 10
+WELCOME_BATCH_DELAY = 5
+WELCOME_BATCH_MAX_MENTIONS = 30   # Members named in one batched welcome; the rest are counted
+# Welcome DMs are sent by a worker pool sharing one rate limit
+WELCOME_DM_WORKERS = 2
+WELCOME_DM_RATE = 1.0          # DMs per second
+WELCOME_DM_BURST = 5           # DMs that may go out at once after a quiet period
+WELCOME_DM_QUEUE_SIZE = 1000   # Queued DMs before new ones are dropped
+
 # ===== SPAM FILTER =====
 # Consecutive message limit in main chat before warning
 SPAM_MESSAGE_LIMIT = 4
@@ -29,12 +68,53 @@ SPAM_MESSAGE_LIMIT = 4
 # Warning timeout (seconds) - how long warning messages stay visible
 WARNING_TIMEOUT = 15
 
+# Message rate detection (flood, duplicate and cross-channel rules)
+SPAM_FLOOD_MESSAGES = 6           # Messages by one member within SPAM_FLOOD_WINDOW seconds
+SPAM_FLOOD_WINDOW = 8
+SPAM_DUPLICATE_MESSAGES = 3       # Copies of the same message within SPAM_DUPLICATE_WINDOW seconds
+SPAM_DUPLICATE_WINDOW = 30
+SPAM_CROSS_CHANNEL_LIMIT = 4      # Distinct channels posted in within SPAM_CROSS_CHANNEL_WINDOW seconds
+SPAM_CROSS_CHANNEL_WINDOW = 15
+SPAM_CHANNEL_WINDOW = 10          # Window for per-channel message rates
+SPAM_GUILD_WINDOW = 10            # Window for per-guild message rates
+
+# Spam filter memory: warnings age out, idle channel histories are dropped
+SPAM_WARNING_TTL = 86400          # Seconds a first-offense warning is remembered
+SPAM_HISTORY_TTL = 3600           # Seconds without messages before a channel's history is dropped
+SPAM_STATE_SWEEP_INTERVAL = 300   # Seconds between expiry sweeps
+
 # Auto-ban message deletion period (seconds) - 86400 = 24 hours
 BAN_DELETE_MESSAGES_SECONDS = 86400
 
+# ===== RAID MODE =====
+# Raid mode starts on a join burst, or a message burst alongside new joins or spam
+# offenders; welcomes pause and bans are batched
+RAID_JOIN_LIMIT = 10              # Joins within RAID_JOIN_WINDOW seconds
+RAID_JOIN_WINDOW = 10
+RAID_MESSAGE_LIMIT = 50           # Guild messages within SPAM_GUILD_WINDOW seconds...
+RAID_DENSITY_WINDOW = 60          # ...counts only with recent joins or offenders in this many seconds:
+RAID_DENSITY_JOINS = 5            # joins
+RAID_DENSITY_OFFENDERS = 5        # distinct members actioned by the spam filter
+RAID_QUIET_SECONDS = 120          # Seconds without a join burst or new ban before raid mode ends
+RAID_BAN_INTERVAL = 5             # Seconds between bulk ban batches and summary updates
+
 # ===== DATABASE =====
 DB_PATH = "Leveling/main.db"
 
+# Number of long-lived connections (one per worker thread) in the shared pool
+DB_POOL_SIZE = 4
+
+# SQLite tuning applied to every pooled connection (WAL is enabled at startup)
+DB_SYNCHRONOUS = "NORMAL"        # NORMAL is durable enough under WAL and avoids an fsync per commit
+DB_CACHE_SIZE_KB = 16384         # Page cache per connection
+DB_MMAP_SIZE = 64 * 1024 * 1024  # Bytes of the database file to memory-map
+
+# ===== BACKGROUND JOBS =====
+# Long admin operations (role/XP syncs, ban imports) run as resumable jobs
+JOB_CHECKPOINT_EVERY = 50      # Items processed between saved checkpoints
+JOB_PROGRESS_INTERVAL = 10     # Seconds between status message updates
+BAN_JOB_DELAY = 0.5            # Pause between bans in import/mass-ban jobs
+
 # ===== LOGGING =====
 LOG_LEVEL = "INFO"  # DEBUG, INFO, WARNING, ERROR, CRITICAL
 LOG_FILE = "yuno.log"
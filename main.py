@@ -5,6 +5,13 @@ import asyncio
 import logging
 from dotenv import load_dotenv
 import config
+from cogs.utils.db import db
+from cogs.utils.migrations import migrate
+from cogs.utils.guild_config import guild_configs
+from cogs.utils.rank_rewards import rank_rewards
+from cogs.utils.spam_rules import spam_matchers, spam_rules
+from cogs.utils.pipeline import pipeline
+from cogs.utils.render import render_service
 
 # Configure logging
 logging.basicConfig(
@@ -32,8 +39,14 @@ intents.members = True
 intents.voice_states = True
 intents.guilds = True
 
+def get_prefix(bot, message):
+    """Resolve the per-guild prefix from the in-memory guild config cache"""
+    if message.guild is None:
+        return config.BOT_PREFIX
+    return guild_configs.prefix(message.guild.id)
+
 bot = commands.Bot(
-    command_prefix=config.BOT_PREFIX,
+    command_prefix=get_prefix,
     intents=intents,
     case_insensitive=config.BOT_CASE_INSENSITIVE,
     help_command=None,
@@ -49,6 +62,12 @@ async def load_cogs():
             except Exception as e:
                 logger.error(f"Failed to load cog {filename}: {e}", exc_info=True)
 
+@bot.event
+async def on_message(message):
+    # Single entry point: spam filter → XP → mention responses → commands (exactly once)
+    if await pipeline.process(message):
+        await bot.process_commands(message)
+
 @bot.event
 async def on_ready():
     logger.info(f"→ {bot.user} is online | discord.py {discord.__version__}")
@@ -56,9 +75,18 @@ async def on_ready():
     logger.info("→ Slash commands synced")
 
 async def main():
-    async with bot:
-        await load_cogs()
-        await bot.start(TOKEN)
+    try:
+        async with bot:
+            await migrate(db)
+            await guild_configs.load()
+            await rank_rewards.load()
+            await spam_matchers.load()
+            await spam_rules.load()
+            await load_cogs()
+            await bot.start(TOKEN)
+    finally:
+        await render_service.close()
+        await db.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
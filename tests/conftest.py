@@ -0,0 +1,11 @@
+import pytest
+from cogs.utils.db import Database
+from tests.helpers import run
+
+
+@pytest.fixture
+def database():
+    # One worker thread, so every call shares the same in-memory connection
+    database = Database(":memory:", pool_size=1)
+    yield database
+    run(database.close())
@@ -0,0 +1,12 @@
+import asyncio
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def members(database, guild_id) -> dict:
+    """{user_id: (exp, level)} for one guild's glevel rows"""
+    rows = run(database.fetchall("SELECT user_id, exp, level FROM glevel WHERE guild_id = ? ORDER BY user_id",
+                                 (guild_id,)))
+    return {r["user_id"]: (r["exp"], r["level"]) for r in rows}
@@ -0,0 +1,71 @@
+import asyncio
+from cogs.utils.migrations import migrate
+from cogs.utils.xp import XPBuffer, bulk_apply, calc_exp_for_level, calc_level, BULK_ADD_XP, BULK_SET_XP, BULK_ADD_LEVELS
+from tests.helpers import run, members
+
+
+def seed(database, rows):
+    async def go():
+        await migrate(database)
+        await database.executemany("INSERT INTO glevel (guild_id, user_id, exp, level) VALUES (?, ?, ?, ?)", rows)
+    run(go())
+
+
+def test_bulk_add_xp_reports_level_pairs(database):
+    exp = calc_exp_for_level(3)
+    seed(database, [(1, 10, exp, 3), (1, 11, 0, 0), (2, 10, 999, calc_level(999))])
+
+    amount = calc_exp_for_level(5)
+    results = run(database.run(bulk_apply, 1, [10, 11, 12], BULK_ADD_XP, {"amount": amount}))
+
+    assert results == {
+        10: (3, calc_level(exp + amount)),
+        11: (0, calc_level(amount)),
+        12: (0, calc_level(amount)),  # members without a row are created
+    }
+    assert members(database, 1) == {
+        10: (exp + amount, calc_level(exp + amount)),
+        11: (amount, calc_level(amount)),
+        12: (amount, calc_level(amount)),
+    }
+    # Other guilds are untouched
+    assert members(database, 2) == {10: (999, calc_level(999))}
+
+
+def test_bulk_set_xp_and_add_levels(database):
+    seed(database, [(1, 10, calc_exp_for_level(7), 7), (1, 11, calc_exp_for_level(2), 2)])
+
+    results = run(database.run(bulk_apply, 1, [10, 11], BULK_SET_XP, {"amount": 0}))
+    assert results == {10: (7, 0), 11: (2, 0)}
+    assert members(database, 1) == {10: (0, 0), 11: (0, 0)}
+
+    results = run(database.run(bulk_apply, 1, [10, 10, 11], BULK_ADD_LEVELS, {"levels": 4}))
+    assert results == {10: (0, 4), 11: (0, 4)}
+    assert members(database, 1) == {10: (calc_exp_for_level(4), 4), 11: (calc_exp_for_level(4), 4)}
+
+
+def test_bulk_apply_leaves_no_staged_members(database):
+    seed(database, [])
+    run(database.run(bulk_apply, 1, [10], BULK_ADD_XP, {"amount": 5}))
+    staged = run(database.fetchone("SELECT COUNT(*) FROM temp.bulk_members"))
+    assert staged[0] == 0
+
+
+def test_write_through_keeps_awards_made_during_the_write(database):
+    async def go():
+        buffer = XPBuffer(database)
+        await buffer.add(1, 10, 100)
+
+        async def award():
+            await asyncio.sleep(0)
+            await buffer.add(1, 10, 5)
+            await buffer.add_many(1, {11: 3})
+
+        task = asyncio.create_task(award())
+        await buffer.write_through(1, [10, 11], bulk_apply, 1, [10, 11], BULK_SET_XP, {"amount": 1000})
+        await task
+        await buffer.flush()
+
+    seed(database, [])
+    run(go())
+    assert members(database, 1) == {10: (1005, calc_level(1005)), 11: (1003, calc_level(1003))}
@@ -0,0 +1,47 @@
+from cogs.utils.migrations import MIGRATIONS, migrate, _apply
+from tests.helpers import run, members
+
+
+def test_migrations_reach_latest_version(database):
+    run(migrate(database))
+    version = run(database.fetchone("PRAGMA user_version"))[0]
+    assert version == MIGRATIONS[-1][0]
+    # Running again is a no-op
+    run(migrate(database))
+    assert run(database.fetchone("PRAGMA user_version"))[0] == version
+
+
+def test_glevel_split_merges_legacy_rows(database):
+    async def go():
+        # Build the untyped version 2 schema and fill it like the old bot did
+        for version, _, statements in MIGRATIONS[:2]:
+            await database.run(_apply, version, statements)
+        await database.executemany("INSERT INTO glevel (enabled, user_id, exp, level, guild_id) VALUES (?, ?, ?, ?, ?)", [
+            ("enabled", None, None, None, "1"),
+            ("disabled", None, None, None, "1"),    # later rows win
+            ("enabled", None, None, None, "2"),
+            (None, "10", "150", "2", "1"),
+            (None, "10", "400", "3", "1"),           # duplicate member rows keep the one with the most XP
+            (None, "10", "90", "5", "1"),
+            (None, "11", None, None, "1"),
+            (None, "10", "70", "1", "2"),
+        ])
+        await database.executemany("INSERT INTO ranks (role_id, guild_id, level) VALUES (?, ?, ?)", [
+            ("100", "1", "5"),
+            ("100", "1", "10"),                      # re-adding a role replaces its level
+            ("101", "1", "20"),
+        ])
+        await migrate(database)
+
+    run(go())
+    assert members(database, 1) == {10: (400, 3), 11: (0, 0)}
+    assert members(database, 2) == {10: (70, 1)}
+
+    settings = run(database.fetchall("SELECT guild_id, enabled FROM leveling_settings ORDER BY guild_id"))
+    assert [tuple(r) for r in settings] == [(1, 0), (2, 1)]
+
+    ranks = run(database.fetchall("SELECT guild_id, role_id, level FROM ranks ORDER BY role_id"))
+    assert [tuple(r) for r in ranks] == [(1, 100, 10), (1, 101, 20)]
+
+    types = run(database.fetchone("SELECT typeof(guild_id), typeof(user_id), typeof(exp) FROM glevel LIMIT 1"))
+    assert tuple(types) == ("integer", "integer", "integer")
@@ -0,0 +1,25 @@
+from types import SimpleNamespace
+from cogs.utils.spam_rules import SpamRule, SpamRuleTable
+
+
+def channel(channel_id, name):
+    return SimpleNamespace(id=channel_id, name=name)
+
+
+def actions(table, chan):
+    return {r.rule: (r.action, r.channel_id, r.channel_prefix) for r in table.lookup(chan).rules}
+
+
+def test_scoped_rules_override_guild_wide_rules_of_the_same_kind():
+    memes, main, general = channel(1, "memes"), channel(2, "main-chat"), channel(3, "general")
+    table = SpamRuleTable(SimpleNamespace(channels=[memes, main, general]), [
+        SpamRule(1, "invite", None, None, "ban", None),
+        SpamRule(2, "no_links", None, "main", "warn_ban", None),
+        SpamRule(3, "invite", 1, None, "delete", None),
+        SpamRule(4, "no_links", 2, None, "delete", None),
+    ])
+
+    assert actions(table, memes) == {"invite": ("delete", 1, None)}
+    # A channel rule beats a prefix rule, which beats a guild-wide rule
+    assert actions(table, main) == {"invite": ("ban", None, None), "no_links": ("delete", 2, None)}
+    assert actions(table, general) == {"invite": ("ban", None, None)}